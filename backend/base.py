@@ -0,0 +1,120 @@
+import abc
+import typing
+
+import numpy as np
+import scipy.sparse
+
+LessEqual = "<"
+GreaterEqual = ">"
+Equal = "="
+Minimize = 1
+Maximize = -1
+
+
+class Model(abc.ABC):
+    """
+    solver independent model built from sparse matrices, variables and constraints are referred to by their column and row indices in the order they are added
+    the matrix of a constraint block may have fewer columns than the model, the missing columns are zero
+    """
+
+    @property
+    @abc.abstractmethod
+    def column_count(self) -> int:
+        pass
+
+    @property
+    @abc.abstractmethod
+    def row_count(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def add_variables(self, count: int, lb: float | np.ndarray = 0.0, ub: float | np.ndarray = np.inf, integer: bool = False, name: str = "") -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def add_constraints(self, matrix: scipy.sparse.csr_array, sense: str, rhs: float | np.ndarray, name: str = "") -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def add_indicator_constraints(self, binaries: np.ndarray, matrix: scipy.sparse.csr_array, bounds: np.ndarray, name: str = "") -> np.ndarray:
+        """
+        force every row of matrix @ x, which is between 0 and the bound whenever feasible, to be 0 when the binary variable of the row is 0
+        :param binaries: the column of the binary variable of every row
+        :param matrix:
+        :param bounds: an upper bound of every row, used by the solvers without indicator constraints as the big-M
+        :param name:
+        :return: the row indices of the added constraints
+        """
+        pass
+
+    @abc.abstractmethod
+    def set_rhs(self, rows: int | np.ndarray, rhs: float | np.ndarray) -> None:
+        pass
+
+    @abc.abstractmethod
+    def set_bounds(self, columns: np.ndarray, lb: float | np.ndarray, ub: float | np.ndarray) -> None:
+        pass
+
+    @abc.abstractmethod
+    def set_objective(self, columns: np.ndarray, coefficients: float | np.ndarray, sense: int = Minimize) -> None:
+        pass
+
+    @abc.abstractmethod
+    def set_mip_gap(self, mip_gap: float) -> None:
+        pass
+
+    @abc.abstractmethod
+    def set_threads(self, thread_count: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    def optimize(self) -> str:
+        """
+        :return: the status, one of the values of util.Status
+        """
+        pass
+
+    @abc.abstractmethod
+    def objective_value(self) -> float:
+        pass
+
+    @abc.abstractmethod
+    def values(self, columns: np.ndarray) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def iteration_count(self) -> float:
+        """
+        the simplex iterations of the last solve
+        """
+        pass
+
+    def set_variable_names(self, columns: np.ndarray, names: typing.Sequence[str]) -> None:
+        """
+        name every variable one by one, replacing the names derived from the name given to add_variables, the solvers without names ignore them
+        """
+        pass
+
+    def set_constraint_names(self, rows: np.ndarray, names: typing.Sequence[str]) -> None:
+        pass
+
+    def variable_handles(self, columns: np.ndarray) -> typing.Sequence[typing.Any]:
+        """
+        the objects exposed by the compiled network for the variables, the column indices unless the solver has its own variable objects
+        """
+        return columns.tolist()
+
+    def constraint_handles(self, rows: np.ndarray) -> typing.Sequence[typing.Any]:
+        return rows.tolist()
+
+    def native(self) -> typing.Any:
+        """
+        the object exposed by the compiled network as the model, the model itself unless the solver has its own model object
+        """
+        return self
+
+
+class Backend(abc.ABC):
+    @abc.abstractmethod
+    def create_model(self) -> Model:
+        pass
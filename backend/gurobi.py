@@ -0,0 +1,136 @@
+import typing
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse
+
+import backend.base
+
+Status = {
+    gp.GRB.LOADED: "loaded",
+    gp.GRB.OPTIMAL: "optimal",
+    gp.GRB.INFEASIBLE: "infeasible",
+    gp.GRB.INF_OR_UNBD: "infeasible/unbounded",
+    gp.GRB.UNBOUNDED: "unbounded",
+    gp.GRB.CUTOFF: "cutoff",
+    gp.GRB.ITERATION_LIMIT: "iteration limit",
+    gp.GRB.NODE_LIMIT: "node limit",
+    gp.GRB.TIME_LIMIT: "time limit",
+    gp.GRB.SOLUTION_LIMIT: "solution limit",
+    gp.GRB.INTERRUPTED: "interrupted",
+    gp.GRB.NUMERIC: "numeric",
+    gp.GRB.SUBOPTIMAL: "suboptimal",
+    gp.GRB.INPROGRESS: "in progress",
+    gp.GRB.USER_OBJ_LIMIT: "user objective limit",
+}
+
+
+class GurobiModel(backend.base.Model):
+    """
+    the variables and constraints are emitted in bulk through the matrix api of gurobi, the compiled network exposes the gurobi model, variables and constraints
+    """
+
+    def __init__(self, env: gp.Env | None = None) -> None:
+        self.model = gp.Model(env=env)
+        self.columns: list[gp.Var] = []
+        self.rows: list[gp.Constr | gp.GenConstr] = []
+
+    @property
+    def column_count(self) -> int:
+        return len(self.columns)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def add_variables(self, count: int, lb: float | np.ndarray = 0.0, ub: float | np.ndarray = np.inf, integer: bool = False, name: str = "") -> np.ndarray:
+        start = len(self.columns)
+        if not integer:
+            variable_type = gp.GRB.CONTINUOUS
+        elif np.all(np.asarray(lb) >= 0) and np.all(np.asarray(ub) <= 1):
+            variable_type = gp.GRB.BINARY
+        else:
+            variable_type = gp.GRB.INTEGER
+        variables = self.model.addMVar(count, lb=lb, ub=np.minimum(ub, gp.GRB.INFINITY), vtype=variable_type, name=name or None)
+        self.columns.extend(variables.tolist())
+        return np.arange(start, start + count)
+
+    def add_constraints(self, matrix: scipy.sparse.csr_array, sense: str, rhs: float | np.ndarray, name: str = "") -> np.ndarray:
+        start = len(self.rows)
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=np.float64), (matrix.shape[0],))
+        constraints = self.model.addMConstr(matrix, self.columns[:matrix.shape[1]], sense, rhs, name=name or None)
+        self.rows.extend(constraints.tolist())
+        return np.arange(start, start + matrix.shape[0])
+
+    def add_indicator_constraints(self, binaries: np.ndarray, matrix: scipy.sparse.csr_array, bounds: np.ndarray, name: str = "") -> np.ndarray:
+        start = len(self.rows)
+        matrix = scipy.sparse.csr_array(matrix)
+        for i, binary in enumerate(binaries):
+            row = slice(matrix.indptr[i], matrix.indptr[i + 1])
+            expression = gp.LinExpr(matrix.data[row].tolist(), [self.columns[column] for column in matrix.indices[row]])
+            self.rows.append(self.model.addGenConstrIndicator(self.columns[binary], False, expression, gp.GRB.EQUAL, 0.0, name=f"{name}[{i}]" if name else ""))
+        return np.arange(start, start + len(binaries))
+
+    def set_rhs(self, rows: int | np.ndarray, rhs: float | np.ndarray) -> None:
+        rows = np.atleast_1d(rows)
+        self.model.setAttr(gp.GRB.Attr.RHS, [self.rows[row] for row in rows], np.broadcast_to(np.asarray(rhs, dtype=np.float64), rows.shape).tolist())
+
+    def set_bounds(self, columns: np.ndarray, lb: float | np.ndarray, ub: float | np.ndarray) -> None:
+        columns = np.atleast_1d(columns)
+        variables = [self.columns[column] for column in columns]
+        self.model.setAttr(gp.GRB.Attr.LB, variables, np.broadcast_to(np.asarray(lb, dtype=np.float64), columns.shape).tolist())
+        self.model.setAttr(gp.GRB.Attr.UB, variables, np.broadcast_to(np.asarray(ub, dtype=np.float64), columns.shape).tolist())
+
+    def set_variable_names(self, columns: np.ndarray, names: typing.Sequence[str]) -> None:
+        self.model.update()
+        self.model.setAttr(gp.GRB.Attr.VarName, [self.columns[column] for column in columns], list(names))
+
+    def set_constraint_names(self, rows: np.ndarray, names: typing.Sequence[str]) -> None:
+        self.model.update()
+        constraints = [(self.rows[row], name) for row, name in zip(np.asarray(rows).tolist(), names)]
+        linear = [(constraint, name) for constraint, name in constraints if isinstance(constraint, gp.Constr)]
+        general = [(constraint, name) for constraint, name in constraints if not isinstance(constraint, gp.Constr)]
+        if len(linear) > 0:
+            self.model.setAttr(gp.GRB.Attr.ConstrName, *map(list, zip(*linear)))
+        if len(general) > 0:
+            self.model.setAttr(gp.GRB.Attr.GenConstrName, *map(list, zip(*general)))
+
+    def set_objective(self, columns: np.ndarray, coefficients: float | np.ndarray, sense: int = backend.base.Minimize) -> None:
+        coefficients = np.broadcast_to(np.asarray(coefficients, dtype=np.float64), np.shape(columns))
+        self.model.setObjective(gp.LinExpr(coefficients.tolist(), [self.columns[column] for column in columns]), gp.GRB.MINIMIZE if sense == backend.base.Minimize else gp.GRB.MAXIMIZE)
+
+    def set_mip_gap(self, mip_gap: float) -> None:
+        self.model.setParam(gp.GRB.Param.MIPGap, mip_gap)
+
+    def set_threads(self, thread_count: int) -> None:
+        self.model.setParam(gp.GRB.Param.Threads, thread_count)
+
+    def optimize(self) -> str:
+        self.model.optimize()
+        return Status[self.model.getAttr(gp.GRB.Attr.Status)]
+
+    def objective_value(self) -> float:
+        return self.model.getAttr(gp.GRB.Attr.ObjVal)
+
+    def values(self, columns: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.getAttr(gp.GRB.Attr.X, [self.columns[column] for column in columns]))
+
+    def iteration_count(self) -> float:
+        return self.model.getAttr(gp.GRB.Attr.IterCount)
+
+    def variable_handles(self, columns: np.ndarray) -> typing.Sequence[gp.Var]:
+        return [self.columns[column] for column in columns]
+
+    def constraint_handles(self, rows: np.ndarray) -> typing.Sequence[gp.Constr | gp.GenConstr]:
+        return [self.rows[row] for row in rows]
+
+    def native(self) -> gp.Model:
+        return self.model
+
+
+class GurobiBackend(backend.base.Backend):
+    def __init__(self, env: gp.Env | None = None) -> None:
+        self.env = env
+
+    def create_model(self) -> GurobiModel:
+        return GurobiModel(self.env)
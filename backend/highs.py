@@ -0,0 +1,135 @@
+import numpy as np
+import scipy.optimize
+import scipy.sparse
+
+import backend.base
+
+Status = {
+    0: "optimal",
+    1: "iteration limit",
+    2: "infeasible",
+    3: "unbounded",
+    4: "numeric",
+}
+
+
+class HighsModel(backend.base.Model):
+    """
+    the model is kept as sparse csr blocks and solved by HiGHS through scipy.optimize.linprog, or scipy.optimize.milp when any variable is integer
+    indicator constraints are expressed as big-M linear constraints, so the reconfigurable model runs here too
+    """
+
+    def __init__(self, time_limit: float | None = None) -> None:
+        self.lower = np.zeros(0)
+        self.upper = np.zeros(0)
+        self.integrality = np.zeros(0, dtype=np.int8)
+        self.blocks: list[scipy.sparse.csr_array] = []
+        self.senses = np.zeros(0, dtype="<U1")
+        self.rhs = np.zeros(0)
+        self.matrix: scipy.sparse.csr_array | None = None
+        self.objective_columns = np.zeros(0, dtype=np.int64)
+        self.objective_coefficients = np.zeros(0)
+        self.objective_sense = backend.base.Minimize
+        self.mip_gap: float | None = None
+        self.time_limit = time_limit
+        self.iterations = 0
+        self.solution: np.ndarray | None = None
+        self.objective: float | None = None
+
+    @property
+    def column_count(self) -> int:
+        return len(self.lower)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rhs)
+
+    def add_variables(self, count: int, lb: float | np.ndarray = 0.0, ub: float | np.ndarray = np.inf, integer: bool = False, name: str = "") -> np.ndarray:
+        start = self.column_count
+        self.lower = np.concatenate((self.lower, np.broadcast_to(np.asarray(lb, dtype=np.float64), (count,))))
+        self.upper = np.concatenate((self.upper, np.broadcast_to(np.asarray(ub, dtype=np.float64), (count,))))
+        self.integrality = np.concatenate((self.integrality, np.full(count, 1 if integer else 0, dtype=np.int8)))
+        self.matrix = None
+        return np.arange(start, start + count)
+
+    def add_constraints(self, matrix: scipy.sparse.csr_array, sense: str, rhs: float | np.ndarray, name: str = "") -> np.ndarray:
+        start = self.row_count
+        self.blocks.append(scipy.sparse.csr_array(matrix))
+        self.senses = np.concatenate((self.senses, np.full(matrix.shape[0], sense)))
+        self.rhs = np.concatenate((self.rhs, np.broadcast_to(np.asarray(rhs, dtype=np.float64), (matrix.shape[0],))))
+        self.matrix = None
+        return np.arange(start, start + matrix.shape[0])
+
+    def add_indicator_constraints(self, binaries: np.ndarray, matrix: scipy.sparse.csr_array, bounds: np.ndarray, name: str = "") -> np.ndarray:
+        matrix = scipy.sparse.csr_array(matrix)
+        matrix.resize((matrix.shape[0], self.column_count))
+        switches = scipy.sparse.csr_array((-np.asarray(bounds, dtype=np.float64), (np.arange(len(binaries)), binaries)), shape=(len(binaries), self.column_count))
+        return self.add_constraints(matrix + switches, backend.base.LessEqual, 0.0, name)
+
+    def set_rhs(self, rows: int | np.ndarray, rhs: float | np.ndarray) -> None:
+        self.rhs[rows] = rhs
+
+    def set_bounds(self, columns: np.ndarray, lb: float | np.ndarray, ub: float | np.ndarray) -> None:
+        self.lower[columns] = lb
+        self.upper[columns] = ub
+
+    def set_objective(self, columns: np.ndarray, coefficients: float | np.ndarray, sense: int = backend.base.Minimize) -> None:
+        self.objective_columns = np.asarray(columns)
+        self.objective_coefficients = np.broadcast_to(np.asarray(coefficients, dtype=np.float64), self.objective_columns.shape)
+        self.objective_sense = sense
+
+    def set_mip_gap(self, mip_gap: float) -> None:
+        self.mip_gap = mip_gap
+
+    def set_threads(self, thread_count: int) -> None:
+        pass
+
+    def compile_matrix(self) -> scipy.sparse.csr_array:
+        if self.matrix is None:
+            for block in self.blocks:
+                block.resize((block.shape[0], self.column_count))
+            self.matrix = scipy.sparse.vstack(self.blocks, format="csr") if len(self.blocks) > 0 else scipy.sparse.csr_array((0, self.column_count))
+        return self.matrix
+
+    def optimize(self) -> str:
+        matrix = self.compile_matrix()
+        objective = np.zeros(self.column_count)
+        np.add.at(objective, self.objective_columns, self.objective_sense * self.objective_coefficients)
+        options = {}
+        if self.time_limit is not None:
+            options["time_limit"] = self.time_limit
+        if np.any(self.integrality):
+            if self.mip_gap is not None:
+                options["mip_rel_gap"] = self.mip_gap
+            lower = np.where(self.senses == backend.base.LessEqual, -np.inf, self.rhs)
+            upper = np.where(self.senses == backend.base.GreaterEqual, np.inf, self.rhs)
+            result = scipy.optimize.milp(objective, integrality=self.integrality, bounds=scipy.optimize.Bounds(self.lower, self.upper),
+                                         constraints=scipy.optimize.LinearConstraint(matrix, lower, upper), options=options)
+        else:
+            equal = self.senses == backend.base.Equal
+            inequal = ~equal
+            sign = np.where(self.senses == backend.base.GreaterEqual, -1.0, 1.0)[inequal]
+            result = scipy.optimize.linprog(objective, A_ub=matrix[inequal].multiply(sign[:, np.newaxis]).tocsr() if np.any(inequal) else None, b_ub=sign * self.rhs[inequal] if np.any(inequal) else None,
+                                            A_eq=matrix[equal] if np.any(equal) else None, b_eq=self.rhs[equal] if np.any(equal) else None,
+                                            bounds=np.column_stack((self.lower, self.upper)), method="highs", options=options)
+        self.solution = result.x
+        self.iterations = getattr(result, "nit", 0)
+        self.objective = self.objective_sense * result.fun if result.x is not None else None
+        return Status.get(result.status, "numeric")
+
+    def objective_value(self) -> float:
+        return self.objective
+
+    def values(self, columns: np.ndarray) -> np.ndarray:
+        return self.solution[columns]
+
+    def iteration_count(self) -> float:
+        return self.iterations
+
+
+class HighsBackend(backend.base.Backend):
+    def __init__(self, time_limit: float | None = None) -> None:
+        self.time_limit = time_limit
+
+    def create_model(self) -> HighsModel:
+        return HighsModel(self.time_limit)
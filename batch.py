@@ -0,0 +1,102 @@
+import itertools
+import json
+import sys
+import typing
+
+import executor
+import instrumentation
+import results
+import util
+
+Scenario = typing.Dict[str, typing.Any]
+DefaultResultsPath = "batch-results.csv"
+ScenarioDefaults: Scenario = {
+    "ocs_layer_count": 0,
+    "background_layer": True,
+    "fixed_ocs_layer": False,
+    "random_seed": 0,
+    "mip_gap": 0.0001,
+    "aggregate": None,
+    "backend": "gurobi",
+    "symmetry": False,
+    "model_cache": False,
+    "bounds": True,
+    "ocs": util.OcsStart,
+}
+
+
+def load_scenarios(path: str) -> typing.List[Scenario]:
+    """
+    the scenario file is a json list of scenario objects, or yaml when the name ends with .yaml or .yml, which needs pyyaml
+    """
+    with open(path) as file:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as error:
+                raise ImportError("pyyaml is required to read a yaml scenario file, use a json scenario file otherwise") from error
+            scenarios = yaml.safe_load(file)
+        else:
+            scenarios = json.load(file)
+    return scenarios if isinstance(scenarios, list) else [scenarios]
+
+
+def expand_scenario(scenario: Scenario) -> typing.List[executor.SweepConfiguration]:
+    """
+    every field of a scenario is a value or a list of values, and the scenario stands for every combination of them
+    the dataset field holds the datasets, the topology field the [p, a, h] triples, or else the p, a and h fields are combined as the other fields, the seed field is short for random_seed
+    the other fields and their defaults are given by ScenarioDefaults
+    """
+    scenario = dict(scenario)
+    if "seed" in scenario:
+        scenario["random_seed"] = scenario.pop("seed")
+    if "topology" in scenario:
+        topologies = scenario.pop("topology")
+        topologies = topologies if isinstance(topologies[0], list) else [topologies]
+    else:
+        topologies = list(itertools.product(*(as_list(scenario.pop(name)) for name in ("p", "a", "h"))))
+    datasets = as_list(scenario.pop("dataset"))
+    unknown = set(scenario.keys()) - set(ScenarioDefaults.keys())
+    if len(unknown) > 0:
+        raise ValueError(f"unknown scenario fields: {', '.join(sorted(unknown))}")
+    names = list(ScenarioDefaults.keys())
+    values = [as_list(scenario.get(name, ScenarioDefaults[name])) for name in names]
+    configurations = []
+    for dataset, (p, a, h) in itertools.product(datasets, topologies):
+        for combination in itertools.product(*values):
+            fields = dict(zip(names, combination))
+            if fields["ocs"] not in (util.OcsOptimize, util.OcsStart, util.OcsHeuristic):
+                raise ValueError("the ocs configuration is not one of optimize, start and heuristic")
+            configurations.append(executor.SweepConfiguration(dataset, int(p), int(a), int(h), int(fields["ocs_layer_count"]), bool(fields["background_layer"]), bool(fields["fixed_ocs_layer"]),
+                                                              int(fields["random_seed"]), float(fields["mip_gap"]), fields["aggregate"], fields["backend"], bool(fields["symmetry"]),
+                                                              bool(fields["model_cache"]), bool(fields["bounds"]), fields["ocs"]))
+    return configurations
+
+
+def as_list(value: typing.Any) -> typing.List[typing.Any]:
+    return value if isinstance(value, list) else [value]
+
+
+def main():
+    arguments, options = util.split_options(sys.argv)
+    if len(arguments) < 2:
+        print("usage: python batch.py scenarios.json|scenarios.yaml [--parallel=balanced] [--sweep=step] [--results=batch-results.csv] [--resume] [--trace=file.jsonl]")
+        sys.exit(2)
+    if "trace" in options:
+        instrumentation.configure(options["trace"], options.get("trace-memory", instrumentation.MemoryRss))
+    configurations = list(dict.fromkeys(configuration for scenario in load_scenarios(arguments[1]) for configuration in expand_scenario(scenario)))
+    sweep = options.get("sweep", "step")
+    if sweep not in ("step", "adaptive", "bisection"):
+        raise ValueError("the sweep strategy is not one of step, adaptive and bisection")
+    sink = results.ResultSink(options.get("results", DefaultResultsPath), options.get("resume", "false").lower() == "true")
+    histories = executor.solve_scenarios(configurations, 0.0, 1.0, 0.01, sweep, options.get("parallel", executor.ThreadPolicyBalanced), sink=sink)
+    for configuration in configurations:
+        status_history, objective_history = histories[configuration]
+        print(executor.sweep_name(configuration))
+        print(status_history)
+        print(objective_history)
+    print(f"results of {len(configurations)} scenarios written to {sink.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import concurrent.futures
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+import typing
+
+import gurobipy as gp
+import numpy as np
+import scipy
+
+import backend.highs
+import topology.dragonfly
+import topology.network
+import util
+
+BenchmarkCase = typing.Dict[str, typing.Any]
+PhaseResult = typing.Dict[str, typing.Any]
+DefaultCases: typing.List[BenchmarkCase] = [
+    {"p": 1, "a": 2, "h": 1, "ocs_layer_count": 0, "background_layer": True, "dataset": "all-to-all"},
+    {"p": 2, "a": 2, "h": 1, "ocs_layer_count": 0, "background_layer": True, "dataset": "adversarial"},
+    {"p": 1, "a": 2, "h": 1, "ocs_layer_count": 1, "background_layer": True, "dataset": "group-neighbor"},
+    {"p": 1, "a": 2, "h": 1, "ocs_layer_count": 2, "background_layer": False, "dataset": "random-node-to-node"},
+    {"p": 2, "a": 4, "h": 2, "ocs_layer_count": 0, "background_layer": True, "dataset": "datasets/HILO.txt"},
+]
+DefaultRates = [0.1, 0.3, 0.5, 0.7, 0.9]
+DefaultThreshold = 0.2
+MinimumTimeDifference = 0.05
+MinimumMemoryDifference = 16 << 20
+TimedMetrics = ("wall_time", "peak_rss")
+ExactMetrics = ("node_count", "edge_count", "flow_count", "variable_count", "constraint_count")
+
+
+def peak_rss() -> int:
+    """
+    the peak resident set size of this process in bytes, every case runs in a fresh process so the peak after a phase covers the phases of the case up to it
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def timed(phase: typing.Callable[[], typing.Any]) -> typing.Tuple[typing.Any, PhaseResult]:
+    start = time.perf_counter()
+    result = phase()
+    return result, {"wall_time": time.perf_counter() - start, "peak_rss": peak_rss()}
+
+
+def run_case(case: BenchmarkCase, rates: typing.List[float], solve: bool) -> typing.Dict[str, PhaseResult]:
+    """
+    run the phases of a case, the models are compiled through the highs backend in the no solve profile, so no gurobi license is needed
+    """
+    parameters = util.dragonfly_parameters(case["p"], case["a"], case["h"], case["ocs_layer_count"], case["background_layer"], case.get("fixed_ocs_layer", False), case.get("random_seed", 0))
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    phases = {}
+    network, phases["build"] = timed(lambda: topology.dragonfly.dragonfly(p, a, h, link_capacity, ocs_layer_count=ocs_layer_count, background_layer=background_layer,
+                                                                          fixed_ocs_layers=fixed_ocs_layer, random_generator=random_generator))
+    phases["build"].update(node_count=network.node_count(), edge_count=network.edge_count())
+    traffic_pattern, phases["traffic"] = timed(lambda: util.load_dragonfly_dataset(case["dataset"], network, group_count, p, a, link_capacity, random_generator))
+    phases["traffic"]["flow_count"] = len(traffic_pattern)
+    solver = None if solve else backend.highs.HighsBackend()
+    (model, variables, constraints), phases["compile"] = timed(lambda: network.compile(traffic_pattern, matrix=True, aggregate=case.get("aggregate"), solver=solver))
+    if isinstance(model, gp.Model):
+        model.update()
+        phases["compile"].update(variable_count=model.getAttr(gp.GRB.Attr.NumVars), constraint_count=model.getAttr(gp.GRB.Attr.NumConstrs) + model.getAttr(gp.GRB.Attr.NumGenConstrs))
+    else:
+        phases["compile"].update(variable_count=model.column_count, constraint_count=model.row_count)
+    if not solve:
+        return phases
+    _, _, rates_of_flows = topology.network.traffic_arrays(traffic_pattern)
+    total_traffic = float(np.sum(rates_of_flows))
+    util.set_dragonfly_objective((model, variables, constraints), total_traffic, case.get("mip_gap", 0.0001))
+    model.setParam(gp.GRB.Param.OutputFlag, 0)
+    warm_start = util.WarmStart(model, variables)
+    history, phases["solve"] = timed(lambda: [util.step_model(model, constraints.inject_rate_constraint, rate, warm_start) for rate in rates])
+    phases["solve"].update(iteration_count=sum(statistics.iteration_count for statistics in warm_start.statistics), node_count=sum(statistics.node_count for statistics in warm_start.statistics),
+                           statuses=[status for status, _ in history], objectives=[objective if np.isfinite(objective) else None for _, objective in history])
+    return phases
+
+
+def run_isolated(case: BenchmarkCase, rates: typing.List[float], solve: bool) -> typing.Dict[str, PhaseResult]:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, case, rates, solve).result()
+
+
+def environment() -> typing.Dict[str, typing.Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "gurobi": ".".join(map(str, gp.gurobi.version())),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+    }
+
+
+def case_key(case: BenchmarkCase) -> str:
+    return json.dumps(case, sort_keys=True)
+
+
+def compare(result: typing.Dict[str, typing.Any], baseline: typing.Dict[str, typing.Any], threshold: float) -> typing.List[str]:
+    """
+    flag the phases slower or larger than the baseline by more than the threshold (and by more than a minimal absolute difference), the changed model sizes and the changed solutions
+    :return: the regressions found
+    """
+    regressions = []
+    baseline_cases = {case_key(entry["case"]): entry["phases"] for entry in baseline["cases"]}
+    for entry in result["cases"]:
+        name = case_key(entry["case"])
+        if name not in baseline_cases:
+            print(f"no baseline for case {name}")
+            continue
+        for phase, metrics in entry["phases"].items():
+            baseline_metrics = baseline_cases[name].get(phase)
+            if baseline_metrics is None:
+                continue
+            for metric, minimum in zip(TimedMetrics, (MinimumTimeDifference, MinimumMemoryDifference)):
+                current, previous = metrics[metric], baseline_metrics[metric]
+                ratio = current / previous if previous > 0 else float("inf")
+                print(f"{name} {phase} {metric}: {previous:.6g} -> {current:.6g} ({ratio:.2f}x)")
+                if current > previous * (1 + threshold) and current - previous > minimum:
+                    regressions.append(f"{name} {phase} {metric} regressed from {previous:.6g} to {current:.6g}")
+            for metric in ExactMetrics:
+                if metric in metrics and metric in baseline_metrics and metrics[metric] != baseline_metrics[metric]:
+                    regressions.append(f"{name} {phase} {metric} changed from {baseline_metrics[metric]} to {metrics[metric]}")
+            if "objectives" in metrics and "objectives" in baseline_metrics:
+                if metrics["statuses"] != baseline_metrics["statuses"] or not all(
+                        (current is None and previous is None) or (current is not None and previous is not None and abs(current - previous) <= 1e-6 * max(1.0, abs(previous)))
+                        for current, previous in zip(metrics["objectives"], baseline_metrics["objectives"])):
+                    regressions.append(f"{name} {phase} solutions changed from {baseline_metrics['objectives']} to {metrics['objectives']}")
+    return regressions
+
+
+def main(arguments: typing.List[str]) -> int:
+    """
+    python benchmark.py [--cases=cases.json] [--rates=0.1,0.5,0.9] [--no-solve] [--output=result.json] [--compare=baseline.json] [--threshold=0.2]
+    the cases file is a json list of objects with p, a, h, ocs_layer_count, background_layer and dataset, and optionally fixed_ocs_layer, random_seed, aggregate and mip_gap
+    :return: the exit code, 1 when a regression against the baseline is found
+    """
+    _, options = util.split_options(arguments)
+    cases = DefaultCases
+    if "cases" in options:
+        with open(options["cases"]) as file:
+            cases = json.load(file)
+    rates = [float(rate) for rate in options["rates"].split(",")] if "rates" in options else DefaultRates
+    solve = options.get("no-solve", "false").lower() != "true"
+    result = {"environment": environment(), "profile": "solve" if solve else "no-solve", "rates": rates, "cases": []}
+    for case in cases:
+        print(f"benchmarking {case_key(case)}")
+        phases = run_isolated(case, rates, solve)
+        for phase, metrics in phases.items():
+            print(f"    {phase}: {metrics['wall_time']:.3f}s, peak rss {metrics['peak_rss'] / (1 << 20):.1f}MiB")
+        result["cases"].append({"case": case, "phases": phases})
+    output = json.dumps(result, indent=2)
+    if "output" in options:
+        with open(options["output"], "w") as file:
+            file.write(output)
+    else:
+        print(output)
+    if "compare" in options:
+        with open(options["compare"]) as file:
+            baseline = json.load(file)
+        if baseline.get("profile") != result["profile"]:
+            print(f"the baseline profile {baseline.get('profile')} differs from {result['profile']}")
+        regressions = compare(result, baseline, float(options.get("threshold", DefaultThreshold)))
+        for regression in regressions:
+            print(f"regression: {regression}")
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import sys
+import tempfile
+import typing
+
+import numpy as np
+import scipy.sparse
+
+CacheDirectoryVariable = "DATASET_CACHE"
+DefaultCacheDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".dataset-cache")
+DenseThreshold = 0.5
+DatasetExtension = ".txt"
+Dataset = np.ndarray | scipy.sparse.csr_array
+
+
+def cache_directory(directory: str | None = None) -> str:
+    if directory is not None:
+        return directory
+    return os.environ.get(CacheDirectoryVariable, DefaultCacheDirectory)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cached_paths(path: str, directory: str | None = None) -> typing.Tuple[str, str]:
+    """
+    :return: the path of the sparse and of the dense cached file of a text dataset, keyed by the hash of its content
+    """
+    name = f"{os.path.splitext(os.path.basename(path))[0]}-{file_hash(path)[:32]}"
+    directory = cache_directory(directory)
+    return os.path.join(directory, name + ".npz"), os.path.join(directory, name + ".npy")
+
+
+def save_atomically(path: str, save: typing.Callable[[typing.BinaryIO], None]) -> None:
+    """
+    write to a temporary file in the same directory then rename it, so concurrent sweep workers never read a partial file
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            save(file)
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def convert_dataset(path: str, directory: str | None = None) -> str:
+    """
+    parse a text traffic matrix and store it as a sparse csr .npz, or as a dense .npy when most of the entries are non-zero
+    :return: the path of the cached file
+    """
+    sparse_path, dense_path = cached_paths(path, directory)
+    for cached_path in (sparse_path, dense_path):
+        if os.path.isfile(cached_path):
+            return cached_path
+    traffic = np.atleast_2d(np.loadtxt(path))
+    if np.count_nonzero(traffic) > DenseThreshold * traffic.size:
+        save_atomically(dense_path, lambda file: np.save(file, traffic))
+        return dense_path
+    save_atomically(sparse_path, lambda file: scipy.sparse.save_npz(file, scipy.sparse.csr_matrix(traffic)))
+    return sparse_path
+
+
+def load_dataset(path: str, directory: str | None = None) -> Dataset:
+    """
+    load a text traffic matrix through the cache, converting it on the first use, an already converted .npz or .npy is loaded directly, the dense files are memory mapped
+    """
+    cached_path = path if path.endswith((".npy", ".npz")) else convert_dataset(path, directory)
+    if cached_path.endswith(".npy"):
+        return np.load(cached_path, mmap_mode="r")
+    return scipy.sparse.csr_array(scipy.sparse.load_npz(cached_path))
+
+
+def main(arguments: typing.List[str]) -> None:
+    """
+    python dataset_cache.py [datasets...] [--cache=directory]
+    convert the text datasets, or every text dataset of the given directories, into the cache
+    """
+    import util
+    positional_arguments, options = util.split_options(arguments)
+    directory = options.get("cache")
+    for argument in positional_arguments or ["datasets"]:
+        if os.path.isdir(argument):
+            paths = [os.path.join(argument, name) for name in sorted(os.listdir(argument)) if name.endswith(DatasetExtension)]
+        else:
+            paths = [argument]
+        for path in paths:
+            print(f"{path} -> {convert_dataset(path, directory)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,55 +1,137 @@
-import math
 import sys
-import typing
 
 import gurobipy as gp
 
-import topology.dragonfly
+import executor
+import instrumentation
+import model_cache
+import results
+import solution
+import topology.concurrent
 import topology.network
 import util
 
 
-def step_model(model: gp.Model, inject_rate_constraint: gp.Constr, rate: float) -> typing.Tuple[str, float]:
-    print(f"solving start: injection rate: {rate}")
-    inject_rate_constraint.setAttr(gp.GRB.Attr.RHS, rate)
-    model.update()
-    model.optimize()
-    status = model.getAttr(gp.GRB.Attr.Status)
-    objective = model.getObjective().getValue() / rate if status == gp.GRB.OPTIMAL else math.inf
-    print(f"solving end: injection rate: {rate}, status: {util.Status[status]}, objective:{objective}")
-    print()
-    return util.Status[status], objective
-
-
 def main():
-    parameter_reader = util.parameter_reader(sys.argv)
+    arguments, options = util.split_options(sys.argv)
+    if "trace" in options:
+        instrumentation.configure(options["trace"], options.get("trace-memory", instrumentation.MemoryRss))
+    parameter_reader = util.parameter_reader(arguments)
     next(parameter_reader)
     dataset_name = next(parameter_reader)
-    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = util.parse_dragonfly_parameter(parameter_reader)
+    parameters = util.parse_dragonfly_parameter(parameter_reader)
     mip_gap = float(t) if (t := next(parameter_reader)) is not None else 0.0001
-    network = topology.dragonfly.dragonfly(p, a, h, link_capacity, ocs_layer_count=ocs_layer_count,
-                                           background_layer=background_layer, fixed_ocs_layers=fixed_ocs_layer,
-                                           random_generator=random_generator)
-    traffic_pattern = util.load_dragonfly_dataset(dataset_name, network, group_count, p, a, link_capacity, random_generator)
-    total_traffic = sum(flow.rate for flow in traffic_pattern)
-    print("compiling network model")
-    model, variables, constraints = network.compile(traffic_pattern)
-    model.setParam(gp.GRB.Param.MIPGap, mip_gap)
-    model.setObjective(
-        gp.quicksum((
-            flow_rate
-            for flow_rates_at_edge in variables.flow_status.values()
-            for flow_rate in flow_rates_at_edge.values()
-        )) / total_traffic,
-        gp.GRB.MINIMIZE)
-    inject_rate_constraint = constraints.inject_rate_constraint
     start = 0.0
     stop = 1.0
     precision = 0.01
+    symmetry = options.get("symmetry", "false").lower() == "true"
+    cache = options.get("model-cache", "false").lower() == "true"
+    bounded = options.get("bounds", "true").lower() == "true"
+    ocs = options.get("ocs", util.OcsStart)
+    if ocs not in (util.OcsOptimize, util.OcsStart, util.OcsHeuristic):
+        raise ValueError("the ocs configuration is not one of optimize, start and heuristic")
+    sink = results.ResultSink(options["results"], options.get("resume", "false").lower() == "true") if "results" in options else None
+    record_configuration = options.get("record-configuration", "false").lower() == "true"
+    naming = options.get("naming")
+    coarsen = options.get("coarsen", "false").lower() == "true"
+    coarse = None
+    rotation = None
+    if naming not in (None, topology.network.NamingReadable, topology.network.NamingShort, topology.network.NamingNone):
+        raise ValueError("the naming is not one of readable, short and none")
+
+    def recorded(step, details=None):
+        return sink.wrap(step, details) if sink is not None else step
+
+    if "parallel" in options:
+        p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, _, _, _ = parameters
+        random_seeds = [int(seed) for seed in options["seeds"].split(",")] if "seeds" in options else [int(arguments[8]) if len(arguments) > 8 else 0]
+        configurations = [
+            executor.SweepConfiguration(dataset, p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_seed, mip_gap, options.get("aggregate"), options.get("backend", "gurobi"), symmetry, cache, bounded, ocs)
+            for dataset in dataset_name.split(",")
+            for random_seed in random_seeds
+        ]
+        print("begin model solving")
+        histories = executor.solve_sweeps_in_parallel(configurations, start, stop, precision, policy=options["parallel"], sink=sink)
+        for configuration, (status_history, objective_history) in histories.items():
+            print(configuration)
+            print(status_history)
+            print(objective_history)
+        return
+    if options.get("formulation", "arc") == "approximate":
+        flow = util.approximate_dragonfly_throughput(dataset_name, parameters, float(options.get("epsilon", topology.concurrent.DefaultEpsilon)))
+        print(f"saturation rate: lower bound: {flow.lower}, upper bound: {flow.upper}, average hop count at the lower bound: {flow.hop_count}, phases: {flow.phase_count}, shortest path trees: {flow.tree_count}")
+        return
+    bounds = util.dragonfly_rate_bounds(dataset_name, parameters) if bounded else None
+    if options.get("formulation", "arc") in ("path", "benders"):
+        if options["formulation"] == "path":
+            decomposed_model = util.compile_dragonfly_path_model(dataset_name, parameters, mip_gap, ocs)
+            step = recorded(decomposed_model.step, lambda: util.step_details(decomposed_model.model))
+        else:
+            decomposed_model = util.compile_dragonfly_benders_model(dataset_name, parameters, mip_gap, options.get("aggregate"), ocs)
+            step = recorded(decomposed_model.step, lambda: util.step_details(decomposed_model.master, decomposed_model.enabled_edges if record_configuration else None))
+        print("begin model solving")
+        match options.get("sweep", "step"):
+            case "step":
+                status_history, objective_history = util.solve_models_by_step(start, stop, precision, step, bounds=bounds)
+            case "adaptive" | "bisection":
+                status_history, objective_history = util.solve_models_by_bisection(start, stop, precision, step, bounds=bounds)
+            case _:
+                raise ValueError("the sweep strategy is not one of step, adaptive and bisection")
+        print(status_history)
+        print(objective_history)
+        return
+    elif options.get("formulation", "arc") != "arc":
+        raise ValueError("the formulation is not one of arc, path, benders and approximate")
+    if options.get("backend", "gurobi") != "gurobi":
+        if coarsen:
+            _, (model, variables, constraints) = util.compile_dragonfly_coarse_model(dataset_name, parameters, mip_gap, options.get("aggregate"), util.Backends[options["backend"]](), ocs, naming)
+        else:
+            model, variables, constraints = util.compile_dragonfly_model(dataset_name, parameters, mip_gap, options.get("aggregate"), util.Backends[options["backend"]](), symmetry, cache, ocs, naming=naming)
+        step = recorded(lambda rate: util.step_backend_model(model, constraints.inject_rate_constraint, rate))
+        print("begin model solving")
+        match options.get("sweep", "step"):
+            case "step":
+                status_history, objective_history = util.solve_models_by_step(start, stop, precision, step, bounds=bounds)
+            case "bisection":
+                status_history, objective_history = util.solve_models_by_bisection(start, stop, precision, step, bounds=bounds)
+            case _:
+                raise ValueError("the sweep strategy is not one of step and bisection")
+        print(status_history)
+        print(objective_history)
+        return
+    if coarsen:
+        coarse, (model, variables, constraints) = util.compile_dragonfly_coarse_model(dataset_name, parameters, mip_gap, options.get("aggregate"), ocs=ocs, naming=naming)
+    else:
+        rotation, (model, variables, constraints) = util.compile_dragonfly_symmetric_model(dataset_name, parameters, mip_gap, options.get("aggregate"), symmetry=symmetry, cache=cache, ocs=ocs, naming=naming)
+    if options.get("sweep") == "parametric":
+        model.update()
+        if model.getAttr(gp.GRB.Attr.IsMIP):
+            raise ValueError("the parametric sweep needs a linear model, the ocs layers make the model mixed integer")
+    if "index" in options:
+        model_cache.save_index(options["index"], (model, variables, constraints))
+    inject_rate_constraint = constraints.inject_rate_constraint
+    warm_start = util.WarmStart(model, variables, enabled=options.get("warm-start", "true").lower() == "true")
+    enabled_edges = util.ocs_enabled_edges((model, variables, constraints)) if record_configuration else None
+    step = lambda rate: util.step_model(model, inject_rate_constraint, rate, warm_start)
+    if "solutions" in options:
+        step = solution.SolutionExport(options["solutions"], (model, variables, constraints), options.get("solution-flows", "false").lower() == "true", coarse, rotation).wrap(step)
+    step = recorded(step, lambda: util.step_details(model, enabled_edges))
     print("begin model solving")
-    status_history, objective_history = util.solve_models_by_step(start, stop, precision, lambda rate: step_model(model, inject_rate_constraint, rate))
+    match options.get("sweep", "step"):
+        case "step":
+            status_history, objective_history = util.solve_models_by_step(start, stop, precision, step, bounds=bounds)
+        case "adaptive":
+            status_history, objective_history = util.solve_models_by_bisection(start, stop, precision, step, saturation=lambda: util.find_saturation_rate(model, variables.inject_rate, inject_rate_constraint), bounds=bounds)
+        case "bisection":
+            status_history, objective_history = util.solve_models_by_bisection(start, stop, precision, step, bounds=bounds)
+        case "parametric":
+            status_history, objective_history = util.solve_models_parametrically(start, stop, precision, model, inject_rate_constraint, bounds, sink)
+        case _:
+            raise ValueError("the sweep strategy is not one of step, adaptive, bisection and parametric")
     print(status_history)
     print(objective_history)
+    print([statistics.iteration_count for statistics in warm_start.statistics])
+    print([statistics.node_count for statistics in warm_start.statistics])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,259 @@
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import time
+import typing
+
+import gurobipy as gp
+import numpy as np
+
+import backend.gurobi
+import results
+import topology.bounds
+import topology.network
+import util
+
+ThreadPolicyWorkers = "workers"
+ThreadPolicySolver = "solver"
+ThreadPolicyBalanced = "balanced"
+SweepConfiguration = typing.NamedTuple("SweepConfiguration", dataset_name=str, p=int, a=int, h=int, ocs_layer_count=int, background_layer=bool, fixed_ocs_layer=bool, random_seed=int, mip_gap=float, aggregate=str | None, backend=str, symmetry=bool, model_cache=bool, bounds=bool, ocs=str)
+SweepTask = typing.NamedTuple("SweepTask", configuration=SweepConfiguration, rates=typing.List[float])
+SweepResult = typing.List[typing.Tuple[float, str, float, results.Record | None]]
+ScenarioTask = typing.NamedTuple("ScenarioTask", configuration=SweepConfiguration, start=float, stop=float, precision=float, sweep=str)
+
+compiled_models: dict[SweepConfiguration, typing.Tuple[topology.network.CompiledNetwork, util.WarmStart | None, topology.bounds.RateBounds | None]] = {}
+solver_thread_count = 0
+worker_env: gp.Env | None = None
+worker_topologies: util.Topologies = {}
+worker_sink: results.ResultSink | None = None
+
+
+def split_threads(core_count: int, task_count: int, policy: str) -> typing.Tuple[int, int]:
+    """
+    split the cores between the count of worker processes and the solver threads of each worker
+    :param core_count:
+    :param task_count:
+    :param policy: ThreadPolicyWorkers for one thread per worker, ThreadPolicySolver for a single worker with all the threads,
+    ThreadPolicyBalanced for about sqrt(core_count) threads per worker, or an integer for a fixed count of threads per worker
+    :return: the count of workers and the count of solver threads per worker
+    """
+    match policy:
+        case "workers":
+            thread_count = 1
+        case "solver":
+            thread_count = core_count
+        case "balanced":
+            thread_count = max(1, math.isqrt(core_count))
+        case _:
+            thread_count = int(policy)
+            if thread_count <= 0:
+                raise ValueError("the thread count per worker must be positive")
+    thread_count = min(thread_count, core_count)
+    worker_count = max(1, min(task_count, core_count // thread_count))
+    return worker_count, thread_count
+
+
+def initialize_worker(thread_count: int) -> None:
+    global solver_thread_count
+    solver_thread_count = thread_count
+
+
+def solve_sweep_task(task: SweepTask) -> SweepResult:
+    """
+    solve the rates of a task in a worker process, the model of a configuration is compiled once per worker and reused by the later tasks, the rates above its upper bound are not solved
+    """
+    configuration = task.configuration
+    if configuration not in compiled_models:
+        parameters = util.dragonfly_parameters(configuration.p, configuration.a, configuration.h, configuration.ocs_layer_count, configuration.background_layer, configuration.fixed_ocs_layer, configuration.random_seed)
+        bounds = util.dragonfly_rate_bounds(configuration.dataset_name, parameters) if configuration.bounds else None
+        model, variables, constraints = util.compile_dragonfly_model(configuration.dataset_name, parameters, configuration.mip_gap, configuration.aggregate, util.Backends[configuration.backend](), configuration.symmetry, configuration.model_cache, configuration.ocs)
+        if not isinstance(model, gp.Model):
+            warm_start = None
+            if solver_thread_count > 0:
+                model.set_threads(solver_thread_count)
+        else:
+            warm_start = util.WarmStart(model, variables)
+            if solver_thread_count > 0:
+                model.setParam(gp.GRB.Param.Threads, solver_thread_count)
+        compiled_models[configuration] = (model, variables, constraints), warm_start, bounds
+    (model, variables, constraints), warm_start, bounds = compiled_models[configuration]
+    result = []
+    for rate in task.rates:
+        begin = time.perf_counter()
+        if util.exceeds_bound(rate, bounds):
+            status, objective, details = util.BoundStatus, math.inf, None
+        elif warm_start is None:
+            status, objective = util.step_backend_model(model, constraints.inject_rate_constraint, rate)
+            details = {"solve_time": time.perf_counter() - begin}
+        else:
+            status, objective = util.step_model(model, constraints.inject_rate_constraint, rate, warm_start)
+            details = util.step_details(model)
+        result.append((rate, status, objective, details))
+    return result
+
+
+def split_sweep(configurations: typing.Iterable[SweepConfiguration], rates: np.ndarray | typing.Mapping[SweepConfiguration, np.ndarray], chunk_count: int) -> list[SweepTask]:
+    """
+    split the rates of every configuration into contiguous chunks, so the warm start still applies within a chunk
+    :param rates: the rates of all the configurations, or the rates of every configuration
+    """
+    return [
+        SweepTask(configuration, [float(rate) for rate in chunk])
+        for configuration in configurations
+        for configuration_rates in (rates[configuration] if isinstance(rates, typing.Mapping) else rates,)
+        for chunk in np.array_split(configuration_rates, max(1, min(chunk_count, len(configuration_rates))))
+        if len(chunk) > 0
+    ]
+
+
+def sweep_name(configuration: SweepConfiguration) -> str:
+    """
+    the name of the sweep of a configuration in a result sink
+    """
+    return ",".join(f"{name}={value}" for name, value in configuration._asdict().items())
+
+
+def solve_sweeps_in_parallel(configurations: typing.Sequence[SweepConfiguration], start: float, stop: float, precision: float, policy: str = ThreadPolicyBalanced, core_count: int | None = None,
+                             chunk_count: int | None = None, sink: results.ResultSink | None = None) -> dict[SweepConfiguration, util.ModelHistory]:
+    """
+    solve the rate sweeps of the configurations across a process pool, every worker compiles its own models
+    :param configurations:
+    :param start:
+    :param stop:
+    :param precision:
+    :param policy: see split_threads
+    :param core_count: the cores available, all the cores usable by this process by default
+    :param chunk_count: the count of chunks the rates of a configuration are split into, the count of workers by default
+    :param sink: every task is recorded as soon as it finishes, and the rates it has recorded for a configuration are not solved again
+    :return: the status and objective histories of every configuration, in rate order
+    """
+    if core_count is None:
+        core_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    rates = util.sweep_rates(start, stop, precision)
+    sweep_results: dict[SweepConfiguration, SweepResult] = {configuration: [] for configuration in configurations}
+    remaining_rates = {configuration: rates for configuration in configurations}
+    if sink is not None:
+        for configuration in configurations:
+            completed = sink.completed(sweep_name(configuration))
+            sweep_results[configuration] = [(rate, *completed[results.rate_key(rate)], None) for rate in rates if results.rate_key(rate) in completed]
+            remaining_rates[configuration] = np.asarray([rate for rate in rates if results.rate_key(rate) not in completed])
+        print(f"skipping {sum(len(result) for result in sweep_results.values())} completed rates")
+    worker_count, thread_count = split_threads(core_count, max(1, sum(len(remaining) for remaining in remaining_rates.values())), policy)
+    tasks = split_sweep(configurations, remaining_rates, chunk_count if chunk_count is not None else max(1, worker_count // len(configurations)))
+    print(f"solving {len(tasks)} tasks with {worker_count} workers of {thread_count} threads")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("spawn"), initializer=initialize_worker, initargs=(thread_count,)) as pool:
+        futures = {pool.submit(solve_sweep_task, task): task for task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            task, result = futures[future], future.result()
+            sweep_results[task.configuration].extend(result)
+            if sink is not None:
+                for rate, status, objective, details in result:
+                    if details is not None:
+                        sink.append(rate, status, objective, sweep=sweep_name(task.configuration), **details)
+    histories = {}
+    for configuration, result in sweep_results.items():
+        result.sort(key=lambda item: item[0])
+        histories[configuration] = [status for _, status, _, _ in result], [objective for _, _, objective, _ in result]
+    return histories
+
+
+def initialize_scenario_worker(thread_count: int, results_path: str | None) -> None:
+    """
+    the result sink of a worker appends to the file of the main process, which has created or truncated it already
+    """
+    global worker_sink
+    initialize_worker(thread_count)
+    worker_sink = results.ResultSink(results_path, resume=True) if results_path is not None else None
+
+
+def shared_env() -> gp.Env:
+    """
+    the gurobi environment shared by every model of this process, created on first use, so a sweep of the other backends needs no gurobi license
+    """
+    global worker_env
+    if worker_env is None:
+        worker_env = gp.Env()
+        if solver_thread_count > 0:
+            worker_env.setParam(gp.GRB.Param.Threads, solver_thread_count)
+    return worker_env
+
+
+def scenario_size(configuration: SweepConfiguration) -> float:
+    """
+    an estimate of the count of flow variables of a scenario, the edge count times the flow count of a dense traffic, to schedule the largest scenarios first
+    """
+    group_count = configuration.a * configuration.h + 1
+    switch_count = group_count * configuration.a
+    endpoint_count = switch_count * configuration.p
+    links_per_switch = configuration.a - 1 + configuration.h * configuration.background_layer + configuration.ocs_layer_count * (group_count - 1)
+    edge_count = 2 * endpoint_count + switch_count * links_per_switch
+    flow_count = endpoint_count if configuration.aggregate is not None else endpoint_count * endpoint_count
+    return float(edge_count * flow_count)
+
+
+def solve_scenario(task: ScenarioTask) -> util.ModelHistory:
+    """
+    compile and sweep a scenario in this process, the gurobi models share the environment of the process, and the networks built are reused by the later scenarios of the same topology
+    """
+    configuration = task.configuration
+    parameters = util.dragonfly_parameters(configuration.p, configuration.a, configuration.h, configuration.ocs_layer_count, configuration.background_layer, configuration.fixed_ocs_layer, configuration.random_seed)
+    bounds = util.dragonfly_rate_bounds(configuration.dataset_name, parameters, worker_topologies) if configuration.bounds else None
+    solver = backend.gurobi.GurobiBackend(shared_env()) if configuration.backend == "gurobi" else util.Backends[configuration.backend]()
+    model, variables, constraints = util.compile_dragonfly_model(configuration.dataset_name, parameters, configuration.mip_gap, configuration.aggregate, solver, configuration.symmetry, configuration.model_cache,
+                                                                 configuration.ocs, worker_topologies)
+    saturation = None
+    if isinstance(model, gp.Model):
+        warm_start = util.WarmStart(model, variables)
+        step = lambda rate: util.step_model(model, constraints.inject_rate_constraint, rate, warm_start)
+        details = lambda: util.step_details(model)
+        if task.sweep == "adaptive":
+            saturation = lambda: util.find_saturation_rate(model, variables.inject_rate, constraints.inject_rate_constraint)
+    else:
+        if solver_thread_count > 0:
+            model.set_threads(solver_thread_count)
+        step = lambda rate: util.step_backend_model(model, constraints.inject_rate_constraint, rate)
+        details = None
+    if worker_sink is not None:
+        step = worker_sink.wrap(step, details, sweep_name(configuration))
+    if task.sweep == "step":
+        history = util.solve_models_by_step(task.start, task.stop, task.precision, step, bounds=bounds)
+    else:
+        history = util.solve_models_by_bisection(task.start, task.stop, task.precision, step, saturation=saturation, bounds=bounds)
+    if isinstance(model, gp.Model):
+        model.dispose()
+    return history
+
+
+def solve_scenarios(configurations: typing.Sequence[SweepConfiguration], start: float, stop: float, precision: float, sweep: str = "step", policy: str = ThreadPolicyBalanced, core_count: int | None = None,
+                    sink: results.ResultSink | None = None) -> dict[SweepConfiguration, util.ModelHistory]:
+    """
+    sweep every scenario as a whole, the largest first by scenario_size, across a process pool, or in this process with a single worker
+    unlike solve_sweeps_in_parallel, a scenario is not split by rate, so the warm start and the adaptive and bisection sweeps apply, and every worker compiles a model once per scenario
+    :param sweep: step, adaptive (falls back to bisection with the other backends) or bisection
+    :param policy: see split_threads
+    :param sink: every rate is recorded by the worker solving it, and the rates recorded for a scenario are not solved again
+    :return: the status and objective histories of every scenario
+    """
+    if core_count is None:
+        core_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    order = sorted(configurations, key=lambda configuration: (-scenario_size(configuration), configuration.p, configuration.a, configuration.h, configuration.ocs_layer_count, configuration.random_seed))
+    tasks = [ScenarioTask(configuration, start, stop, precision, sweep) for configuration in order]
+    worker_count, thread_count = split_threads(core_count, len(tasks), policy)
+    print(f"solving {len(tasks)} scenarios with {worker_count} workers of {thread_count} threads")
+    histories = {}
+    if worker_count == 1:
+        global worker_sink
+        initialize_worker(thread_count)
+        worker_sink = sink
+        for i, task in enumerate(tasks):
+            histories[task.configuration] = solve_scenario(task)
+            print(f"solved scenario {i + 1} of {len(tasks)}: {sweep_name(task.configuration)}")
+        return histories
+    with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("spawn"), initializer=initialize_scenario_worker,
+                                                initargs=(thread_count, sink.path if sink is not None else None)) as pool:
+        futures = {pool.submit(solve_scenario, task): task for task in tasks}
+        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+            histories[futures[future].configuration] = future.result()
+            print(f"solved scenario {i + 1} of {len(tasks)}: {sweep_name(futures[future].configuration)}")
+    return histories
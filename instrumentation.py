@@ -0,0 +1,139 @@
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import typing
+
+TraceVariable = "TRACE"
+TraceMemoryVariable = "TRACE_MEMORY"
+MemoryRss = "rss"
+MemoryTracemalloc = "tracemalloc"
+PageSize = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+Record = typing.Dict[str, typing.Any]
+
+
+def resident_memory() -> int:
+    """
+    the current resident set size in bytes, the peak is used where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * PageSize
+    except OSError:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+class Tracer:
+    """
+    records the duration and memory of nested phases as json lines, one object per phase, written when the phase ends
+    the memory is the rss delta of the phase, or with tracemalloc the bytes allocated and the peak allocation within the phase, which is precise but slows down every allocation
+    the fields of a phase, such as the counts of the objects it creates, are given when it starts or set on the yielded record before it ends
+    when disabled, the phases only print their messages and nothing is measured
+    """
+
+    def __init__(self, path: str | None = None, memory: str = MemoryRss) -> None:
+        self.path = path
+        self.memory = memory
+        self.file: typing.TextIO | None = None
+        self.stack: typing.List[str] = []
+        self.peaks: typing.List[int] = []
+        if path is not None:
+            self.file = sys.stdout if path == "-" else open(path, "a", buffering=1)
+            if memory == MemoryTracemalloc and not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.file is not None
+
+    def close(self) -> None:
+        if self.file is not None and self.file is not sys.stdout:
+            self.file.close()
+        self.file = None
+
+    def fold_peak(self) -> None:
+        """
+        fold the peak traced since the last reset into the peak of every open phase, so a nested phase resetting the peak keeps the peak of the enclosing phases
+        """
+        _, peak = tracemalloc.get_traced_memory()
+        self.peaks = [max(open_peak, peak) for open_peak in self.peaks]
+
+    def write(self, record: Record) -> None:
+        """
+        every record is written with a single call on a line buffered file opened for appending, so the workers of a parallel sweep can share the trace
+        """
+        self.file.write(json.dumps(record, default=float) + "\n")
+
+    @contextlib.contextmanager
+    def phase(self, name: str, message: str | None = None, **fields: typing.Any) -> typing.Iterator[Record]:
+        """
+        :param name: the name of the phase, prefixed by the names of the enclosing phases
+        :param message: the progress message printed when the phase starts
+        :param fields: fields recorded with the phase
+        :return: the record of the phase, more fields can be set on it
+        """
+        if message is not None:
+            print(message)
+        record: Record = dict(fields)
+        if self.file is None:
+            yield record
+            return
+        self.stack.append(name)
+        record = {"event": "phase", "name": "/".join(self.stack), "pid": os.getpid(), **record}
+        if self.memory == MemoryTracemalloc:
+            self.fold_peak()
+            tracemalloc.reset_peak()
+            allocated, _ = tracemalloc.get_traced_memory()
+            self.peaks.append(allocated)
+        else:
+            rss = resident_memory()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["duration"] = time.perf_counter() - start
+            if self.memory == MemoryTracemalloc:
+                self.fold_peak()
+                current, _ = tracemalloc.get_traced_memory()
+                record["allocated"] = current - allocated
+                record["peak_allocated"] = self.peaks.pop() - allocated
+            else:
+                record["rss_delta"] = resident_memory() - rss
+            self.stack.pop()
+            self.write(record)
+
+    def event(self, name: str, **fields: typing.Any) -> None:
+        if self.file is not None:
+            self.write({"event": name, "name": "/".join(self.stack), "pid": os.getpid(), **fields})
+
+
+tracer = Tracer(os.environ.get(TraceVariable) or None, os.environ.get(TraceMemoryVariable, MemoryRss))
+
+
+def configure(path: str | None, memory: str = MemoryRss) -> Tracer:
+    """
+    replace the global tracer, the configuration is also exported to the environment so the spawned sweep workers trace into the same file
+    :param path: the json lines file to append to, - for the standard output, or None to disable tracing
+    :param memory: MemoryRss or MemoryTracemalloc
+    """
+    global tracer
+    tracer.close()
+    tracer = Tracer(path, memory)
+    if path is None:
+        os.environ.pop(TraceVariable, None)
+    else:
+        os.environ[TraceVariable] = path
+        os.environ[TraceMemoryVariable] = memory
+    return tracer
+
+
+def phase(name: str, message: str | None = None, **fields: typing.Any) -> typing.ContextManager[Record]:
+    return tracer.phase(name, message, **fields)
+
+
+def event(name: str, **fields: typing.Any) -> None:
+    tracer.event(name, **fields)
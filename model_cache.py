@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import typing
+
+import gurobipy as gp
+import numpy as np
+
+import dataset_cache
+import topology.network
+
+CacheDirectoryVariable = "MODEL_CACHE"
+CacheSizeVariable = "MODEL_CACHE_SIZE"
+DefaultCacheDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model-cache")
+DefaultCacheSize = 4 << 30
+CacheVersion = 1
+ModelExtension = ".mps"
+IndexExtension = ".npz"
+
+
+def cache_directory() -> str:
+    return os.environ.get(CacheDirectoryVariable, DefaultCacheDirectory)
+
+
+def cache_size() -> int:
+    return int(os.environ.get(CacheSizeVariable, DefaultCacheSize))
+
+
+def fingerprint(**fields: typing.Any) -> str:
+    """
+    content hash of the fields that determine a compiled model, the fields must be json serializable
+    """
+    return hashlib.sha256(json.dumps({"version": CacheVersion, **fields}, sort_keys=True).encode()).hexdigest()
+
+
+def dataset_fingerprint(dataset_name: str) -> str:
+    return f"file:{dataset_cache.file_hash(dataset_name)}" if os.path.isfile(dataset_name) else f"pattern:{dataset_name}"
+
+
+def random_state_fingerprint(random_generator: typing.Any) -> str:
+    return hashlib.sha256(repr(random_generator.getstate()).encode()).hexdigest()
+
+
+def encode_keys(keys: typing.Sequence[typing.Any]) -> typing.Tuple[str, np.ndarray]:
+    keys = list(keys)
+    if all(isinstance(key, topology.network.Edge) for key in keys):
+        return "edge", np.fromiter((key.id for key in keys), dtype=np.int64, count=len(keys))
+    if all(isinstance(key, topology.network.Node) for key in keys):
+        return "node", np.fromiter((key.id for key in keys), dtype=np.int64, count=len(keys))
+    if all(isinstance(key, (int, np.integer)) for key in keys):
+        return "int", np.asarray(keys, dtype=np.int64)
+    if all(isinstance(key, str) for key in keys):
+        return "str", np.asarray(keys, dtype=str)
+    raise TypeError("the keys of a cached mapping must be edges, nodes, integers or strings")
+
+
+def decode_keys(kind: str, keys: np.ndarray, network: topology.network.Network) -> typing.List[typing.Any]:
+    match kind:
+        case "edge":
+            return [network.edges[key] for key in keys.tolist()]
+        case "node":
+            return [network.nodes[key] for key in keys.tolist()]
+        case _:
+            return keys.tolist()
+
+
+def decode_mapping(kind: str, keys: np.ndarray, values: typing.Sequence[typing.Any], network: topology.network.Network) -> typing.Mapping[typing.Any, typing.Any]:
+    """
+    the mappings covering every edge or every node in id order are restored as id mappings, same to the compiled ones
+    """
+    if kind in ("edge", "node") and np.array_equal(keys, np.arange(len(network.edges if kind == "edge" else network.nodes))):
+        return topology.network.IdMapping(network.edges if kind == "edge" else network.nodes, values)
+    return dict(zip(decode_keys(kind, keys, network), values))
+
+
+def encode_flows(flows: typing.Sequence[topology.network.Flow | topology.network.Commodity]) -> dict[str, np.ndarray]:
+    if all(isinstance(flow, topology.network.Commodity) for flow in flows) and len(flows) > 0:
+        return {
+            "flow_kind": np.asarray("commodity"),
+            "flow_aggregate": np.asarray(flows[0].aggregate),
+            "flow_starts": np.fromiter((flow.node.id for flow in flows), dtype=np.int64, count=len(flows)),
+            "flow_rates": np.fromiter((flow.rate for flow in flows), dtype=np.float64, count=len(flows)),
+        }
+    return {
+        "flow_kind": np.asarray("flow"),
+        "flow_starts": np.fromiter((flow.start.id for flow in flows), dtype=np.int64, count=len(flows)),
+        "flow_ends": np.fromiter((flow.end.id for flow in flows), dtype=np.int64, count=len(flows)),
+        "flow_rates": np.fromiter((flow.rate for flow in flows), dtype=np.float64, count=len(flows)),
+    }
+
+
+def decode_flows(index: typing.Mapping[str, np.ndarray], network: topology.network.Network) -> typing.List[topology.network.Flow | topology.network.Commodity]:
+    nodes = network.nodes
+    if str(index["flow_kind"]) == "commodity":
+        aggregate = str(index["flow_aggregate"])
+        commodities = []
+        for node, rate in zip(index["flow_starts"].tolist(), index["flow_rates"].tolist()):
+            commodity = topology.network.Commodity(nodes[node], aggregate)
+            commodity.rate = rate
+            commodities.append(commodity)
+        return commodities
+    return [topology.network.Flow(nodes[start], nodes[end], rate) for start, end, rate in zip(index["flow_starts"].tolist(), index["flow_ends"].tolist(), index["flow_rates"].tolist())]
+
+
+def paths(key: str) -> typing.Tuple[str, str]:
+    directory = cache_directory()
+    return os.path.join(directory, key + ModelExtension), os.path.join(directory, key + IndexExtension)
+
+
+def model_index(compiled_network: topology.network.CompiledNetwork) -> dict[str, np.ndarray]:
+    """
+    the positions of the variables and constraints of the flows, edges and nodes in a compiled gurobi model
+    the flow mappings must share the same flows at every edge and node, as compiled by Network.compile_matrix
+    """
+    model, variables, constraints = compiled_network
+    model.update()
+    general_constraints = {constraint: i for i, constraint in enumerate(model.getGenConstrs())}
+    flow_status = list(variables.flow_status.values())
+    flows = list(flow_status[0].keys()) if len(flow_status) > 0 else []
+    edge_kind, edge_keys = encode_keys(list(variables.flow_status.keys()))
+    capacity_kind, capacity_keys = encode_keys(list(constraints.edge_capacity_constraints.keys()))
+    node_kind, node_keys = encode_keys(list(constraints.net_flow_rate_at_each_node_constraints.keys()))
+    index = {
+        **encode_flows(flows),
+        "edge_kind": np.asarray(edge_kind), "edge_keys": edge_keys,
+        "flow_columns": np.asarray([[flow_rates_at_edge[flow].index for flow in flows] for flow_rates_at_edge in flow_status], dtype=np.int64).reshape(len(flow_status), len(flows)),
+        "inject_rate_column": np.asarray(variables.inject_rate.index),
+        "inject_rate_row": np.asarray(constraints.inject_rate_constraint.index),
+        "capacity_kind": np.asarray(capacity_kind), "capacity_keys": capacity_keys,
+        "capacity_rows": np.fromiter((constraint.index for constraint in constraints.edge_capacity_constraints.values()), dtype=np.int64),
+        "node_kind": np.asarray(node_kind), "node_keys": node_keys,
+        "net_flow_rows": np.asarray([[constraints_at_node[flow].index for flow in flows] for constraints_at_node in constraints.net_flow_rate_at_each_node_constraints.values()], dtype=np.int64).reshape(-1, len(flows)),
+    }
+    if variables.enabled_edges is not None:
+        enabled_kind, enabled_keys = encode_keys(list(variables.enabled_edges.keys()))
+        index.update({
+            "enabled_kind": np.asarray(enabled_kind), "enabled_keys": enabled_keys,
+            "enabled_columns": np.fromiter((variable.index for variable in variables.enabled_edges.values()), dtype=np.int64),
+            "enabled_general_constraints": np.fromiter((general_constraints[constraint] for constraint in constraints.enabled_edges_constraints.values()), dtype=np.int64),
+        })
+    if constraints.conflict_edges_constraints is not None:
+        index.update({
+            "conflict_names": np.asarray(list(constraints.conflict_edges_constraints.keys()), dtype=str),
+            "conflict_rows": np.fromiter((constraint.index for constraint in constraints.conflict_edges_constraints.values()), dtype=np.int64),
+        })
+    if constraints.synchronous_edges_constraints is not None:
+        synchronous_rows = list(constraints.synchronous_edges_constraints.values())
+        index.update({
+            "synchronous_names": np.asarray(list(constraints.synchronous_edges_constraints.keys()), dtype=str),
+            "synchronous_offsets": np.cumsum([0] + [len(rows) for rows in synchronous_rows]),
+            "synchronous_rows": np.asarray([constraint.index for rows in synchronous_rows for constraint in rows], dtype=np.int64),
+        })
+    return index
+
+
+def save_index(path: str, compiled_network: topology.network.CompiledNetwork) -> None:
+    """
+    side-car index of a model compiled with short or no names, mapping the columns and rows back to the edges, nodes and flows, see lookup_column and lookup_row
+    """
+    index = model_index(compiled_network)
+    dataset_cache.save_atomically(path, lambda file: np.savez(file, **index))
+
+
+def load_index(path: str) -> dict[str, np.ndarray]:
+    with np.load(path) as index:
+        return dict(index)
+
+
+def lookup_column(index: typing.Mapping[str, np.ndarray], network: topology.network.Network, column: int) -> typing.Tuple[str, typing.Any, topology.network.Flow | topology.network.Commodity | None]:
+    """
+    :return: the kind of the variable at the column, flow_rate, inject_rate or enabled, with its edge and flow when it has them
+    """
+    positions = np.argwhere(index["flow_columns"] == column)
+    if len(positions) > 0:
+        edge, flow = positions[0].tolist()
+        return "flow_rate", decode_keys(str(index["edge_kind"]), index["edge_keys"][edge:edge + 1], network)[0], decode_flows(index, network)[flow]
+    if column == int(index["inject_rate_column"]):
+        return "inject_rate", None, None
+    if "enabled_columns" in index and column in index["enabled_columns"]:
+        position = int(np.flatnonzero(index["enabled_columns"] == column)[0])
+        return "enabled", decode_keys(str(index["enabled_kind"]), index["enabled_keys"][position:position + 1], network)[0], None
+    raise KeyError(f"column {column} is not in the index")
+
+
+def lookup_row(index: typing.Mapping[str, np.ndarray], network: topology.network.Network, row: int) -> typing.Tuple[str, typing.Any, topology.network.Flow | topology.network.Commodity | None]:
+    """
+    :return: the kind of the linear constraint at the row, capacity, net_rate, inject_rate, conflict or synchronous, with its edge, node or name, and its flow when it has them
+    """
+    positions = np.argwhere(index["net_flow_rows"] == row)
+    if len(positions) > 0:
+        node, flow = positions[0].tolist()
+        return "net_rate", decode_keys(str(index["node_kind"]), index["node_keys"][node:node + 1], network)[0], decode_flows(index, network)[flow]
+    if row in index["capacity_rows"]:
+        position = int(np.flatnonzero(index["capacity_rows"] == row)[0])
+        return "capacity", decode_keys(str(index["capacity_kind"]), index["capacity_keys"][position:position + 1], network)[0], None
+    if row == int(index["inject_rate_row"]):
+        return "inject_rate", None, None
+    if "conflict_rows" in index and row in index["conflict_rows"]:
+        return "conflict", str(index["conflict_names"][int(np.flatnonzero(index["conflict_rows"] == row)[0])]), None
+    if "synchronous_rows" in index and row in index["synchronous_rows"]:
+        position = int(np.flatnonzero(index["synchronous_rows"] == row)[0])
+        return "synchronous", str(index["synchronous_names"][int(np.searchsorted(index["synchronous_offsets"], position, side="right")) - 1]), None
+    raise KeyError(f"row {row} is not in the index")
+
+
+def save(key: str, compiled_network: topology.network.CompiledNetwork) -> None:
+    """
+    store a compiled gurobi model with its objective, and the index of its variables and constraints, then evict the least recently used models above the size cap
+    """
+    model, _, _ = compiled_network
+    index = model_index(compiled_network)
+    model_path, index_path = paths(key)
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    temporary_model_path = f"{model_path}.{os.getpid()}{ModelExtension}"
+    model.write(temporary_model_path)
+    os.replace(temporary_model_path, model_path)
+    dataset_cache.save_atomically(index_path, lambda file: np.savez(file, **index))
+    evict(keep=key)
+
+
+def load(key: str, network: topology.network.Network, env: gp.Env | None = None) -> topology.network.CompiledNetwork | None:
+    """
+    :return: the cached model with the variables and constraints mapped onto the given network, or None on a cache miss
+    """
+    model_path, index_path = paths(key)
+    if not (os.path.isfile(model_path) and os.path.isfile(index_path)):
+        return None
+    model = gp.read(model_path, env=env) if env is not None else gp.read(model_path)
+    model.update()
+    columns = model.getVars()
+    rows = model.getConstrs()
+    general_constraints = model.getGenConstrs()
+    with np.load(index_path) as index:
+        flows = decode_flows(index, network)
+        flow_index = {flow: i for i, flow in enumerate(flows)}
+        flow_status = decode_mapping(str(index["edge_kind"]), index["edge_keys"], [topology.network.IndexedMapping(flow_index, [columns[column] for column in row]) for row in index["flow_columns"].tolist()], network)
+        inject_rate = columns[int(index["inject_rate_column"])]
+        inject_rate_constraint = rows[int(index["inject_rate_row"])]
+        edge_capacity_constraints = decode_mapping(str(index["capacity_kind"]), index["capacity_keys"], [rows[row] for row in index["capacity_rows"].tolist()], network)
+        net_flow_rate_at_each_node_constraints = decode_mapping(str(index["node_kind"]), index["node_keys"], [topology.network.IndexedMapping(flow_index, [rows[row] for row in node_rows]) for node_rows in index["net_flow_rows"].tolist()], network)
+        enabled_edges = None
+        enabled_edges_constraints = None
+        conflict_edges_constraints = None
+        synchronous_edges_constraints = None
+        if "enabled_columns" in index:
+            enabled_edges = decode_mapping(str(index["enabled_kind"]), index["enabled_keys"], [columns[column] for column in index["enabled_columns"].tolist()], network)
+            enabled_edges_constraints = decode_mapping(str(index["enabled_kind"]), index["enabled_keys"], [general_constraints[i] for i in index["enabled_general_constraints"].tolist()], network)
+        if "conflict_rows" in index:
+            conflict_edges_constraints = dict(zip(index["conflict_names"].tolist(), [rows[row] for row in index["conflict_rows"].tolist()]))
+        if "synchronous_rows" in index:
+            offsets = index["synchronous_offsets"].tolist()
+            synchronous_rows = index["synchronous_rows"].tolist()
+            synchronous_edges_constraints = {name: [rows[row] for row in synchronous_rows[offsets[i]:offsets[i + 1]]] for i, name in enumerate(index["synchronous_names"].tolist())}
+    for path in (model_path, index_path):
+        os.utime(path)
+    variables = topology.network.Variables(flow_status, inject_rate, enabled_edges)
+    constraints = topology.network.Constraints(inject_rate_constraint, edge_capacity_constraints, net_flow_rate_at_each_node_constraints, enabled_edges_constraints, conflict_edges_constraints, synchronous_edges_constraints)
+    return model, variables, constraints
+
+
+def evict(keep: str | None = None) -> None:
+    """
+    delete the least recently used models until the cache fits in the size cap, the use time is the modification time of the index
+    """
+    directory = cache_directory()
+    entries = {}
+    for name in os.listdir(directory):
+        key, extension = os.path.splitext(name)
+        if extension not in (ModelExtension, IndexExtension) or "." in key:
+            continue
+        path = os.path.join(directory, name)
+        size, used = entries.get(key, (0, 0.0))
+        entries[key] = size + os.path.getsize(path), max(used, os.path.getmtime(path))
+    total = sum(size for size, _ in entries.values())
+    for key, (size, _) in sorted(entries.items(), key=lambda entry: entry[1][1]):
+        if total <= cache_size():
+            break
+        if key == keep:
+            continue
+        for path in paths(key):
+            if os.path.isfile(path):
+                os.remove(path)
+        total -= size
@@ -0,0 +1,152 @@
+import csv
+import json
+import math
+import os
+import time
+import typing
+
+Record = typing.Dict[str, typing.Any]
+Details = typing.Callable[[], Record]
+StepResult = typing.Tuple[str, float]
+Fields = ("sweep", "rate", "status", "objective", "solve_time", "mip_gap", "configuration")
+RateDigits = 12
+ConfigurationSeparator = ";"
+
+
+def rate_key(rate: float) -> float:
+    """
+    the rates of a sweep are computed in floating point, so they are matched after rounding
+    """
+    return round(float(rate), RateDigits)
+
+
+class ResultSink:
+    """
+    appends the result of every solved rate to a json lines file, or a csv file when the path ends with .csv, as soon as the rate is solved
+    every record is flushed and synced before the sweep moves on, so a sweep killed or preempted loses at most the rate being solved
+    with resume, the rates recorded by an earlier run of the same sweep are read back and returned without solving them again
+    the records of several sweeps, such as the configurations of a parallel sweep, can share a file, distinguished by the sweep name
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.path = path
+        self.csv = path.endswith(".csv")
+        self.records: typing.Dict[typing.Tuple[str | None, float], Record] = {}
+        if resume and os.path.exists(path):
+            for record in self.read():
+                self.records[record["sweep"], rate_key(record["rate"])] = record
+        elif os.path.exists(path):
+            os.remove(path)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        truncated = not new and not self.ends_with_newline()
+        self.file = open(path, "a", newline="" if self.csv else None)
+        if truncated:
+            self.file.write("\n")
+        self.writer = csv.DictWriter(self.file, Fields) if self.csv else None
+        if self.writer is not None and new:
+            self.writer.writeheader()
+        self.file.flush()
+
+    def read(self) -> typing.Iterator[Record]:
+        """
+        a truncated last line, left by a run killed while writing it, is skipped
+        """
+        with open(self.path, newline="" if self.csv else None) as file:
+            if self.csv:
+                for row in csv.DictReader(file):
+                    if row.get("objective") is None or row.get("configuration") is None:
+                        continue
+                    yield {
+                        "sweep": row["sweep"] or None,
+                        "rate": float(row["rate"]),
+                        "status": row["status"],
+                        "objective": float(row["objective"]) if row["objective"] != "" else None,
+                        "solve_time": float(row["solve_time"]) if row["solve_time"] != "" else None,
+                        "mip_gap": float(row["mip_gap"]) if row["mip_gap"] != "" else None,
+                        "configuration": row["configuration"].split(ConfigurationSeparator) if row["configuration"] != "" else None,
+                    }
+            else:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def close(self) -> None:
+        self.file.close()
+
+    def completed(self, sweep: str | None = None) -> typing.Dict[float, StepResult]:
+        """
+        :return: the status and objective of every rate of the sweep recorded by an earlier run
+        """
+        return {
+            rate: (record["status"], record["objective"] if record["objective"] is not None else math.inf)
+            for (name, rate), record in self.records.items()
+            if name == sweep
+        }
+
+    def append(self, rate: float, status: str, objective: float, solve_time: float | None = None, mip_gap: float | None = None, configuration: typing.Sequence[str] | None = None,
+               sweep: str | None = None) -> None:
+        record = {
+            "sweep": sweep,
+            "rate": float(rate),
+            "status": status,
+            "objective": float(objective) if math.isfinite(objective) else None,
+            "solve_time": solve_time,
+            "mip_gap": mip_gap,
+            "configuration": list(configuration) if configuration is not None else None,
+        }
+        self.records[sweep, rate_key(rate)] = record
+        if self.writer is not None:
+            self.writer.writerow({
+                name: (ConfigurationSeparator.join(value) if name == "configuration" else value) if value is not None else ""
+                for name, value in record.items()
+            })
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record_history(self, rates: typing.Iterable[float], status_history: typing.Sequence[str], objective_history: typing.Sequence[float], sweep: str | None = None) -> typing.Tuple[list[str], list[float]]:
+        """
+        append the results of a sweep computed without solving every rate through the sink, such as a parametric sweep, the rates recorded by an earlier run are not appended again
+        :return: the history with the recorded result of the rates completed by an earlier run
+        """
+        completed = self.completed(sweep)
+        recorded_status_history, recorded_objective_history = [], []
+        for rate, status, objective in zip(rates, status_history, objective_history):
+            if rate_key(rate) in completed:
+                status, objective = completed[rate_key(rate)]
+            else:
+                self.append(rate, status, objective, sweep=sweep)
+            recorded_status_history.append(status)
+            recorded_objective_history.append(objective)
+        return recorded_status_history, recorded_objective_history
+
+    def wrap(self, model: typing.Callable[[float], StepResult], details: Details | None = None, sweep: str | None = None) -> typing.Callable[[float], StepResult]:
+        """
+        :param model: the model step, see util.ModelStep
+        :param details: the solve_time, mip_gap and configuration of the last solve, the solve time is measured around the step when not given
+        :return: the model step recording every rate solved, and returning the recorded result of the rates completed by an earlier run
+        """
+        completed = self.completed(sweep)
+
+        def step(rate: float) -> StepResult:
+            if rate_key(rate) in completed:
+                status, objective = completed[rate_key(rate)]
+                print(f"skipping completed rate: injection rate: {rate}, status: {status}, objective:{objective}")
+                return status, objective
+            begin = time.perf_counter()
+            status, objective = model(rate)
+            fields = {"solve_time": time.perf_counter() - begin}
+            if details is not None:
+                fields.update(details())
+            self.append(rate, status, objective, sweep=sweep, **fields)
+            return status, objective
+
+        return step
@@ -0,0 +1,118 @@
+import math
+import os
+import typing
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse
+
+import dataset_cache
+import instrumentation
+import model_cache
+import results
+import topology.coarsen
+import topology.network
+import topology.symmetry
+import util
+
+SolutionExtension = ".npz"
+
+
+class SolutionExport:
+    """
+    the link loads, link utilizations and ocs configuration of every rate solved by a compiled gurobi model, written to a compressed npz per rate
+    the values of every variable are fetched in one call and reduced with the column index of the model, see model_cache.model_index
+    the arrays are indexed the same to edge_ids, the ids of the edges of the model, and the load of an edge is the sum of the rates of its flows
+    with flows, the rate of every flow at every edge is also written as a sparse edge by flow matrix, see load_solution
+    with coarse, the model is compiled on its switch fabric and the arrays are mapped back onto every edge and every endpoint flow of the full network
+    with symmetry, the model is the quotient model routing only the representative flows, and the loads are expanded to all the flows, see topology.symmetry.Symmetry.expand_edge_loads,
+    the rates of the flows are not expanded, so flows is not supported
+    """
+
+    def __init__(self, directory: str, compiled_network: topology.network.CompiledNetwork, flows: bool = False, coarse: topology.coarsen.CoarseNetwork | None = None,
+                 symmetry: topology.symmetry.Symmetry | None = None) -> None:
+        if flows and symmetry is not None:
+            raise ValueError("the flow rates of a quotient model cannot be exported, solve the full model")
+        model, variables, _ = compiled_network
+        index = model_cache.model_index(compiled_network)
+        if str(index["edge_kind"]) != "edge":
+            raise TypeError("the flow variables of the model are not indexed by edges")
+        self.directory = directory
+        self.model = model
+        self.columns = model.getVars()
+        self.flows = flows
+        self.edge_ids = index["edge_keys"]
+        self.flow_columns = index["flow_columns"]
+        self.inject_rate_column = int(index["inject_rate_column"])
+        self.coarse = coarse
+        self.symmetry = symmetry
+        self.capacities = np.fromiter((edge.capacity for edge in variables.flow_status.keys()), dtype=np.float64, count=len(self.edge_ids))
+        enabled_edges = util.ocs_enabled_edges(compiled_network)
+        self.ocs_edge_ids = np.fromiter((edge.id for edge in enabled_edges.keys()), dtype=np.int64) if enabled_edges is not None else np.zeros(0, dtype=np.int64)
+        self.ocs_columns = np.fromiter((variable.index for variable in enabled_edges.values()), dtype=np.int64) if enabled_edges is not None else np.zeros(0, dtype=np.int64)
+        if coarse is not None:
+            self.edge_ids, self.capacities, self.ocs_edge_ids = np.arange(len(coarse.capacities)), coarse.capacities, coarse.edge_ids[self.ocs_edge_ids]
+
+    def extract(self) -> dict[str, np.ndarray]:
+        """
+        :return: the arrays of the last solution, the model must have one
+        """
+        values = np.asarray(self.model.getAttr(gp.GRB.Attr.X, self.columns))
+        flow_rates = values[self.flow_columns]
+        load = flow_rates.sum(axis=1)
+        if self.symmetry is not None:
+            load = self.symmetry.expand_edge_loads(load)
+        if self.coarse is not None:
+            rate = values[self.inject_rate_column]
+            load = self.coarse.expand_edge_loads(load, rate)
+            flow_rates = self.coarse.expand_flow_rates(flow_rates, rate) if self.flows else None
+        arrays = {
+            "edge_ids": self.edge_ids,
+            "load": load,
+            "utilization": np.divide(load, self.capacities, out=np.zeros_like(load), where=self.capacities > 0),
+            "ocs_edge_ids": self.ocs_edge_ids,
+            "ocs_enabled": values[self.ocs_columns] > 0.5,
+        }
+        if self.flows:
+            matrix = flow_rates if scipy.sparse.issparse(flow_rates) else scipy.sparse.csr_array(np.where(flow_rates > 0, flow_rates, 0.0))
+            arrays.update(flow_rate_data=matrix.data, flow_rate_indices=matrix.indices, flow_rate_indptr=matrix.indptr, flow_rate_shape=np.asarray(matrix.shape))
+        return arrays
+
+    def path(self, rate: float, sweep: str | None = None) -> str:
+        return os.path.join(self.directory, f"{sweep or 'sweep'}-{results.rate_key(rate):.6f}{SolutionExtension}")
+
+    def save(self, rate: float, status: str, objective: float, sweep: str | None = None) -> str | None:
+        """
+        :return: the path of the arrays of the last solve, or None when it has no solution
+        """
+        if self.model.getAttr(gp.GRB.Attr.SolCount) == 0:
+            return None
+        path = self.path(rate, sweep)
+        with instrumentation.phase("solution_export", rate=rate, path=path):
+            arrays = self.extract()
+            dataset_cache.save_atomically(path, lambda file: np.savez_compressed(file, rate=np.asarray(rate), status=np.asarray(status), objective=np.asarray(objective if math.isfinite(objective) else np.nan), **arrays))
+        return path
+
+    def wrap(self, model: util.ModelStep, sweep: str | None = None) -> util.ModelStep:
+        """
+        :param model: the model step solving the compiled model
+        :return: the model step writing the arrays of every rate solved
+        """
+
+        def step(rate: float) -> typing.Tuple[str, float]:
+            status, objective = model(rate)
+            self.save(rate, status, objective, sweep)
+            return status, objective
+
+        return step
+
+
+def load_solution(path: str) -> dict[str, typing.Any]:
+    """
+    :return: the arrays written by SolutionExport, with the edge by flow matrix restored as flow_rates when it was written
+    """
+    with np.load(path) as file:
+        arrays = dict(file)
+    if "flow_rate_data" in arrays:
+        arrays["flow_rates"] = scipy.sparse.csr_array((arrays.pop("flow_rate_data"), arrays.pop("flow_rate_indices"), arrays.pop("flow_rate_indptr")), shape=tuple(arrays.pop("flow_rate_shape")))
+    return arrays
@@ -0,0 +1,166 @@
+import math
+import typing
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse
+
+import backend.gurobi
+import instrumentation
+import topology.bounds
+import topology.network
+
+CutTolerance = 1e-7
+OptimalityCut = "optimality"
+FeasibilityCut = "feasibility"
+Cut = typing.NamedTuple("Cut", kind=str, rate_coefficient=float, constant=float, coefficients=np.ndarray)
+
+
+class BendersModel:
+    """
+    benders decomposition of the same model as Network.compile with reconfigurable edges
+    the master problem holds the enabled state of the reconfigurable edges, the conflict and synchronous constraints, and the estimated routing cost eta
+    the subproblem is the routing linear model for a fixed configuration, the capacity of a reconfigurable edge is its capacity times its enabled state
+    every integer solution of the master is checked by the subproblem in a lazy constraint callback, which cuts it off with
+    a feasibility cut from the farkas dual when the configuration cannot route the traffic, or an optimality cut from the duals when eta underestimates the routing cost
+    the duals do not depend on the right hand side, so a cut is kept for the later rates with its right hand side rescaled by the inject rate
+    """
+
+    def __init__(self, network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, total_traffic: float, aggregate: str | None = None, optimize_empty_flows: bool = True,
+                 env: gp.Env | None = None) -> None:
+        with instrumentation.phase("subproblem", "compiling routing subproblem") as record:
+            _, _, capacities = network.edge_arrays()
+            self.capacities = capacities
+            reconfigurable = topology.bounds.reconfigurable_edges(network)
+            self.reconfigurable_edges, self.fixed_edges = np.flatnonzero(reconfigurable), np.flatnonzero(~reconfigurable)
+            flows = [flow for flow in topology.network.aggregate_traffic(traffic_pattern, aggregate) if not optimize_empty_flows or flow.rate != 0]
+            node_count, edge_count, flow_count = network.node_count(), network.edge_count(), len(flows)
+            demand_rows, demand_values = [], []
+            for f, flow in enumerate(flows):
+                for node, net_rate in flow.net_rates().items():
+                    demand_rows.append(node.id * flow_count + f)
+                    demand_values.append(net_rate)
+            self.demands = np.zeros(node_count * flow_count)
+            np.add.at(self.demands, np.asarray(demand_rows, dtype=np.int64), demand_values)
+            self.subproblem = gp.Model(env=env) if env is not None else gp.Model()
+            self.subproblem.setParam(gp.GRB.Param.OutputFlag, 0)
+            self.subproblem.setParam(gp.GRB.Param.InfUnbdInfo, 1)
+            self.subproblem.setParam(gp.GRB.Param.DualReductions, 0)
+            self.subproblem.setParam(gp.GRB.Param.Method, 1)
+            flow_rates = self.subproblem.addMVar(edge_count * flow_count, lb=0.0, obj=1.0 / total_traffic, name="flow_rate")
+            capacity_matrix = scipy.sparse.kron(scipy.sparse.identity(edge_count), np.ones((1, flow_count)), format="csr")
+            self.capacity_constraints = self.subproblem.addMConstr(capacity_matrix, flow_rates, gp.GRB.LESS_EQUAL, capacities, name="capacity_constraint").tolist()
+            net_flow_matrix = scipy.sparse.kron(network.incidence_matrix(), scipy.sparse.identity(flow_count), format="csr")
+            self.net_flow_constraints = self.subproblem.addMConstr(net_flow_matrix, flow_rates, gp.GRB.EQUAL, self.demands, name="net_rate_constraint").tolist()
+            self.flow_rates = flow_rates.tolist()
+            record.update(variable_count=edge_count * flow_count, constraint_count=edge_count + node_count * flow_count)
+        with instrumentation.phase("master", "compiling master problem") as record:
+            self.master = gp.Model(env=env) if env is not None else gp.Model()
+            self.master.setParam(gp.GRB.Param.LazyConstraints, 1)
+            self.enabled = self.master.addMVar(len(self.reconfigurable_edges), vtype=gp.GRB.BINARY, name="enabled").tolist()
+            self.enabled_edges: dict[topology.network.Edge, gp.Var] = {network.edges[edge]: enabled for edge, enabled in zip(self.reconfigurable_edges.tolist(), self.enabled)}
+            self.cost = self.master.addVar(lb=0.0, obj=1.0, name="cost")
+            enabled_index = {edge: i for i, edge in enumerate(self.reconfigurable_edges.tolist())}
+            for conflict_edges_name, conflict_edges in network.conflict_edges.items():
+                self.master.addConstr(gp.quicksum(self.enabled[enabled_index[edge.id]] for edge in conflict_edges) <= 1, name=topology.network.conflict_edges_constraint_name(conflict_edges_name))
+            for synchronous_edges_name, synchronous_edges in network.synchronous_edges.items():
+                columns = [self.enabled[enabled_index[edge.id]] for edge in synchronous_edges]
+                for i in range(len(columns) - 1):
+                    self.master.addConstr(columns[i] == columns[i + 1], name=topology.network.synchronous_edges_constraint_name(synchronous_edges_name))
+            record["variable_count"] = len(self.enabled) + 1
+        self.cuts: list[Cut] = []
+        self.cut_constraints: list[gp.Constr] = []
+        self.pending_cuts: list[Cut] = []
+        self.rate = 1.0
+        self.solutions: dict[bytes, typing.Tuple[int, float, Cut | None]] = {}
+        self.configuration: np.ndarray | None = None
+
+    def set_start(self, configuration: np.ndarray) -> None:
+        """
+        :param configuration: whether every edge is enabled, indexed by edge id, such as topology.ocs.dragonfly_ocs_configuration
+        """
+        self.master.setAttr(gp.GRB.Attr.Start, self.enabled, configuration[self.reconfigurable_edges].tolist())
+
+    def solve_subproblem(self, enabled: np.ndarray) -> typing.Tuple[int, float, Cut | None]:
+        """
+        route the traffic at the current rate with the reconfigurable edges enabled or not
+        :return: the status, the routing cost, and the cut derived from the duals, or from the farkas dual when infeasible
+        """
+        rhs = self.capacities.copy()
+        rhs[self.reconfigurable_edges] *= enabled
+        self.subproblem.setAttr(gp.GRB.Attr.RHS, self.capacity_constraints, rhs.tolist())
+        self.subproblem.setAttr(gp.GRB.Attr.RHS, self.net_flow_constraints, (self.demands * self.rate).tolist())
+        self.subproblem.optimize()
+        status = self.subproblem.getAttr(gp.GRB.Attr.Status)
+        if status == gp.GRB.OPTIMAL:
+            duals, kind = gp.GRB.Attr.Pi, OptimalityCut
+        elif status == gp.GRB.INFEASIBLE:
+            duals, kind = gp.GRB.Attr.FarkasDual, FeasibilityCut
+        else:
+            return status, math.inf, None
+        capacity_duals = np.asarray(self.subproblem.getAttr(duals, self.capacity_constraints))
+        net_flow_duals = np.asarray(self.subproblem.getAttr(duals, self.net_flow_constraints))
+        cut = Cut(kind, float(net_flow_duals @ self.demands), float(capacity_duals[self.fixed_edges] @ self.capacities[self.fixed_edges]),
+                  capacity_duals[self.reconfigurable_edges] * self.capacities[self.reconfigurable_edges])
+        cost = self.subproblem.getAttr(gp.GRB.Attr.ObjVal) if status == gp.GRB.OPTIMAL else math.inf
+        return status, cost, cut
+
+    def cut_expression(self, cut: Cut) -> typing.Tuple[gp.LinExpr, float]:
+        """
+        an optimality cut reads cost - coefficients * enabled >= rate_coefficient * rate + constant, the dual bound of the routing cost
+        a feasibility cut reads coefficients * enabled >= -(rate_coefficient * rate + constant), the farkas proof is violated for every feasible configuration
+        """
+        coefficients = gp.LinExpr(cut.coefficients.tolist(), self.enabled)
+        if cut.kind == OptimalityCut:
+            return self.cost - coefficients, cut.rate_coefficient * self.rate + cut.constant
+        return coefficients, -(cut.rate_coefficient * self.rate + cut.constant)
+
+    def callback(self, model: gp.Model, where: int) -> None:
+        if where != gp.GRB.Callback.MIPSOL:
+            return
+        enabled = np.round(model.cbGetSolution(self.enabled)) if len(self.enabled) > 0 else np.zeros(0)
+        key = enabled.astype(np.int8).tobytes()
+        if key not in self.solutions:
+            status, cost, cut = self.solve_subproblem(enabled)
+            self.solutions[key] = status, cost, cut
+            if cut is not None:
+                self.pending_cuts.append(cut)
+            instrumentation.event("benders_subproblem", status=backend.gurobi.Status[status], cost=cost if math.isfinite(cost) else None, cut=cut.kind if cut is not None else None)
+        status, cost, cut = self.solutions[key]
+        if cut is None or (status == gp.GRB.OPTIMAL and model.cbGetSolution(self.cost) >= cost - CutTolerance * max(1.0, cost)):
+            return
+        expression, rhs = self.cut_expression(cut)
+        model.cbLazy(expression >= rhs)
+
+    def keep_cuts(self) -> None:
+        """
+        add the cuts found by the last solve to the master as constraints, so the next rates start from them
+        """
+        for cut in self.pending_cuts:
+            expression, rhs = self.cut_expression(cut)
+            self.cut_constraints.append(self.master.addConstr(expression >= rhs, name=f"{cut.kind}_cut"))
+            self.cuts.append(cut)
+        self.pending_cuts = []
+
+    def step(self, rate: float) -> typing.Tuple[str, float]:
+        with instrumentation.phase("solve", f"solving start: injection rate: {rate}", rate=rate) as record:
+            self.rate = rate
+            self.solutions = {}
+            self.master.setAttr(gp.GRB.Attr.RHS, self.cut_constraints, [self.cut_expression(cut)[1] for cut in self.cuts])
+            status, cost, cut = self.solve_subproblem(np.ones(len(self.reconfigurable_edges)))
+            if status == gp.GRB.OPTIMAL:
+                self.pending_cuts.append(cut)
+                self.keep_cuts()
+                self.master.optimize(self.callback)
+                self.keep_cuts()
+                status = self.master.getAttr(gp.GRB.Attr.Status)
+                if self.master.getAttr(gp.GRB.Attr.SolCount) > 0:
+                    enabled = np.round(self.master.getAttr(gp.GRB.Attr.X, self.enabled)) if len(self.enabled) > 0 else np.zeros(0)
+                    status, cost, _ = self.solve_subproblem(enabled)
+                    self.configuration = enabled
+            objective = cost / rate if status == gp.GRB.OPTIMAL else math.inf
+            record.update(status=backend.gurobi.Status[status], objective=objective if math.isfinite(objective) else None, cut_count=len(self.cuts),
+                          node_count=self.master.getAttr(gp.GRB.Attr.NodeCount) if self.master.getAttr(gp.GRB.Attr.IsMIP) else 0.0)
+        print(f"solving end: injection rate: {rate}, status: {backend.gurobi.Status[status]}, objective:{objective}, cuts: {len(self.cuts)}")
+        print()
+        return backend.gurobi.Status[status], objective
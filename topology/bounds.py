@@ -0,0 +1,174 @@
+import math
+import typing
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+import topology.dragonfly
+import topology.network
+import topology.path
+import topology.torus
+
+RateBounds = typing.NamedTuple("RateBounds", lower=float, upper=float, upper_cut=str)
+ShortestPathChunkSize = 256
+
+
+def conflict_sets(network: topology.network.Network) -> np.ndarray:
+    """
+    :return: the conflict set of every edge, -1 for an edge without conflict, an edge in several conflict sets is kept in the first one only, which can only loosen the bounds
+    """
+    sets = np.full(network.edge_count(), -1)
+    for i, edges in enumerate(network.conflict_edges.values()):
+        ids = np.fromiter((edge.id for edge in edges), dtype=np.int64, count=len(edges))
+        sets[ids[sets[ids] < 0]] = i
+    return sets
+
+
+def reconfigurable_edges(network: topology.network.Network) -> np.ndarray:
+    reconfigurable = np.zeros(network.edge_count(), dtype=bool)
+    for edges in list(network.conflict_edges.values()) + list(network.synchronous_edges.values()):
+        reconfigurable[[edge.id for edge in edges]] = True
+    return reconfigurable
+
+
+def cut_capacities(network: topology.network.Network, labels: np.ndarray, part_count: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    the largest capacity leaving and entering every part of a partition of the nodes over any configuration of the reconfigurable edges
+    at most one edge of a conflict set is enabled, so a conflict set adds the largest capacity of its edges crossing the cut, the synchronous edges are counted as always enabled
+    :param labels: the part of every node
+    :return: the capacity leaving and the capacity entering every part
+    """
+    starts, ends, capacities = network.edge_arrays()
+    sets = conflict_sets(network)
+    crossing = labels[starts] != labels[ends]
+    free = crossing & (sets < 0)
+    conflicting = np.flatnonzero(crossing & (sets >= 0))
+    result = []
+    for side in (labels[starts], labels[ends]):
+        capacity = np.bincount(side[free], weights=capacities[free], minlength=part_count).astype(np.float64)
+        if len(conflicting) > 0:
+            keys = sets[conflicting] * part_count + side[conflicting]
+            order = np.argsort(keys, kind="stable")
+            unique_keys, first = np.unique(keys[order], return_index=True)
+            largest = np.maximum.reduceat(capacities[conflicting][order], first)
+            capacity += np.bincount(unique_keys % part_count, weights=largest, minlength=part_count)
+        result.append(capacity)
+    return result[0], result[1]
+
+
+def cut_demands(traffic_pattern: topology.network.TrafficPattern, labels: np.ndarray, part_count: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: the traffic leaving and the traffic entering every part, at inject rate 1
+    """
+    sources, destinations, rates = topology.network.traffic_arrays(traffic_pattern)
+    crossing = labels[sources] != labels[destinations]
+    return (np.bincount(labels[sources][crossing], weights=rates[crossing], minlength=part_count),
+            np.bincount(labels[destinations][crossing], weights=rates[crossing], minlength=part_count))
+
+
+def cut_upper_bound(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, labels: np.ndarray) -> float:
+    """
+    the traffic crossing a cut scaled by the inject rate cannot exceed the capacity crossing it, in either direction
+    :param labels: the part of every node, the cuts are every part against the rest
+    :return: the smallest ratio of the capacity to the traffic over the cuts, inf when no traffic crosses them
+    """
+    part_count = int(labels.max()) + 1
+    out_capacity, in_capacity = cut_capacities(network, labels, part_count)
+    out_demand, in_demand = cut_demands(traffic_pattern, labels, part_count)
+    capacity = np.concatenate((out_capacity, in_capacity))
+    demand = np.concatenate((out_demand, in_demand))
+    loaded = demand > 0
+    return float(np.min(capacity[loaded] / demand[loaded])) if np.any(loaded) else math.inf
+
+
+def minimal_routing_lower_bound(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern) -> float:
+    """
+    route every flow over one minimal path of the edges which are always enabled, the parallel edges share the load in proportion to their capacities
+    the routing is feasible up to the inject rate at which the most utilized link saturates
+    the flows through the terminals (see topology.path.terminal_attachments) are merged into the traffic between the switches they hang on, and their forced hops are loaded directly
+    :return: the inject rate, 0 when some flow has no path without the reconfigurable edges
+    """
+    starts, ends, capacities = network.edge_arrays()
+    node_count = network.node_count()
+    sources, destinations, rates = topology.network.traffic_arrays(traffic_pattern)
+    routed = (rates != 0) & (sources != destinations)
+    sources, destinations, rates = sources[routed], destinations[routed], rates[routed]
+    if len(rates) == 0:
+        return math.inf
+    fixed = ~reconfigurable_edges(network)
+    pair_keys, pair_index = np.unique(starts[fixed] * node_count + ends[fixed], return_inverse=True)
+    pair_capacities = np.bincount(pair_index, weights=capacities[fixed], minlength=len(pair_keys))
+    pair_loads = np.zeros(len(pair_keys))
+    terminals, attachments = topology.path.terminal_attachments(network)
+    hops = [(sources, attachments[sources], terminals[sources]), (attachments[destinations], destinations, terminals[destinations])]
+    for hop_starts, hop_ends, forced in hops:
+        keys = hop_starts[forced] * node_count + hop_ends[forced]
+        positions = np.minimum(np.searchsorted(pair_keys, keys), len(pair_keys) - 1)
+        if np.any(pair_keys[positions] != keys):
+            return 0.0
+        pair_loads += np.bincount(positions, weights=rates[forced], minlength=len(pair_keys))
+    commodity_keys, inverse = np.unique(attachments[sources] * node_count + attachments[destinations], return_inverse=True)
+    demands = np.bincount(inverse, weights=rates, minlength=len(commodity_keys))
+    commodity_sources, commodity_destinations = np.divmod(commodity_keys, node_count)
+    switched = commodity_sources != commodity_destinations
+    commodity_sources, commodity_destinations, demands = commodity_sources[switched], commodity_destinations[switched], demands[switched]
+    pair_starts, pair_ends = np.divmod(pair_keys, node_count)
+    graph = scipy.sparse.csr_matrix((np.ones(len(pair_keys)), (pair_starts, pair_ends)), shape=(node_count, node_count))
+    unique_sources, source_index = np.unique(commodity_sources, return_inverse=True)
+    for chunk in range(0, len(unique_sources), ShortestPathChunkSize):
+        _, predecessors = scipy.sparse.csgraph.shortest_path(graph, unweighted=True, indices=unique_sources[chunk:chunk + ShortestPathChunkSize], return_predecessors=True)
+        selected = (source_index >= chunk) & (source_index < chunk + ShortestPathChunkSize)
+        rows, current, load = source_index[selected] - chunk, commodity_destinations[selected], demands[selected]
+        if np.any(predecessors[rows, current] < 0):
+            return 0.0
+        sources_of_rows = unique_sources[chunk:chunk + ShortestPathChunkSize][rows]
+        while len(rows) > 0:
+            previous = predecessors[rows, current].astype(np.int64)
+            pair_loads += np.bincount(np.searchsorted(pair_keys, previous * node_count + current), weights=load, minlength=len(pair_keys))
+            active = previous != sources_of_rows
+            rows, current, load, sources_of_rows = rows[active], previous[active], load[active], sources_of_rows[active]
+    loaded = pair_loads > 0
+    return float(np.min(pair_capacities[loaded] / pair_loads[loaded]))
+
+
+def rate_bounds(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, partitions: typing.Mapping[str, typing.Iterable[np.ndarray]] | None = None) -> RateBounds:
+    """
+    bound the largest feasible inject rate, the rates above the upper bound are infeasible, the rates up to the lower bound are feasible
+    the upper bound is the tightest cut of every single node, which covers the tor links, and of every partition given
+    :param partitions: the named families of node partitions to cut, every partition given by the part of every node
+    """
+    upper, upper_cut = cut_upper_bound(network, traffic_pattern, np.arange(network.node_count())), "node"
+    for name, labels_list in (partitions or {}).items():
+        for labels in labels_list:
+            bound = cut_upper_bound(network, traffic_pattern, labels)
+            if bound < upper:
+                upper, upper_cut = bound, name
+    lower = min(minimal_routing_lower_bound(network, traffic_pattern), upper)
+    return RateBounds(lower, upper, upper_cut)
+
+
+def dragonfly_partitions(group_count: int, p: int, a: int) -> dict[str, list[np.ndarray]]:
+    """
+    the groups, and the bisections into two halves of consecutive groups starting at every group, for the node layout of topology.dragonfly.dragonfly
+    """
+    groups = topology.dragonfly.node_groups(group_count, p, a)
+    bisections = [((groups - offset) % group_count < group_count // 2).astype(np.int64) for offset in range(group_count)] if group_count > 1 else []
+    return {"group": [groups], "bisection": bisections}
+
+
+def dragonfly_rate_bounds(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, group_count: int, p: int, a: int) -> RateBounds:
+    return rate_bounds(network, traffic_pattern, dragonfly_partitions(group_count, p, a))
+
+
+def torus_partitions(degree: int, dimension: int, p: int) -> dict[str, list[np.ndarray]]:
+    """
+    the bisections into two halves along every dimension, for the node layout of topology.torus.torus, the endpoints are on the side of their router
+    """
+    coordinates = topology.torus.node_coordinates(degree, dimension)
+    router_labels = [(coordinates[:, axis] < degree // 2).astype(np.int64) for axis in range(dimension)] if degree > 1 else []
+    return {"bisection": [np.concatenate((labels, np.repeat(labels, p))) for labels in router_labels]}
+
+
+def torus_rate_bounds(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, degree: int, dimension: int, p: int) -> RateBounds:
+    return rate_bounds(network, traffic_pattern, torus_partitions(degree, dimension, p))
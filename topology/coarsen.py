@@ -0,0 +1,112 @@
+import math
+import typing
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse
+
+import topology.network
+
+
+class CoarseNetwork:
+    """
+    the switch fabric of a network whose endpoints are linked to exactly one switch by one tor edge each way, such as topology.dragonfly.dragonfly, with the traffic between endpoints merged into traffic between switches
+    every flow between two endpoints leaves its source by the tor edge out of it and reaches its destination by the tor edge into it, so the loads of the tor edges are known without solving,
+    they bound the inject rate by their capacity, and every unit of traffic takes two tor hops on top of its hops in the fabric
+    the fabric keeps the switches with the same ids, and the other edges in the same order with their names and their conflict and synchronous sets, see edge_ids
+    the flows of the traffic are the flows between endpoints in the order of topology.network.traffic_arrays, the flows between the endpoints of the same switch never enter the fabric
+    """
+
+    def __init__(self, network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, switch_count: int) -> None:
+        starts, ends, capacities = network.edge_arrays()
+        endpoint_count = network.node_count() - switch_count
+        out_edges = np.flatnonzero(starts >= switch_count)
+        in_edges = np.flatnonzero(ends >= switch_count)
+        if not (np.array_equal(np.bincount(starts[out_edges] - switch_count, minlength=endpoint_count), np.ones(endpoint_count)) and
+                np.array_equal(np.bincount(ends[in_edges] - switch_count, minlength=endpoint_count), np.ones(endpoint_count))):
+            raise ValueError("every endpoint must be linked to a switch by exactly one edge each way")
+        self.endpoint_out_edges = np.empty(endpoint_count, dtype=np.int64)
+        self.endpoint_out_edges[starts[out_edges] - switch_count] = out_edges
+        self.endpoint_in_edges = np.empty(endpoint_count, dtype=np.int64)
+        self.endpoint_in_edges[ends[in_edges] - switch_count] = in_edges
+        self.endpoint_switches = ends[self.endpoint_out_edges]
+        if np.any(self.endpoint_switches >= switch_count) or not np.array_equal(starts[self.endpoint_in_edges], self.endpoint_switches):
+            raise ValueError("every endpoint must be linked to the same switch both ways")
+        self.capacities = capacities
+        sources, destinations, self.rates = topology.network.traffic_arrays(traffic_pattern)
+        if np.any(sources < switch_count) or np.any(destinations < switch_count):
+            raise ValueError("the flows must be between endpoints")
+        self.source_endpoints, self.destination_endpoints = sources - switch_count, destinations - switch_count
+        self.moving = self.source_endpoints != self.destination_endpoints
+        self.tor_loads = np.zeros(len(starts))
+        np.add.at(self.tor_loads, self.endpoint_out_edges[self.source_endpoints[self.moving]], self.rates[self.moving])
+        np.add.at(self.tor_loads, self.endpoint_in_edges[self.destination_endpoints[self.moving]], self.rates[self.moving])
+        loaded = self.tor_loads > 0
+        self.rate_limit = float(np.min(capacities[loaded] / self.tor_loads[loaded])) if np.any(loaded) else math.inf
+        self.tor_hop_rate = 2.0 * float(self.rates[self.moving].sum())
+        fabric = (starts < switch_count) & (ends < switch_count)
+        self.edge_ids = np.flatnonzero(fabric)
+        self.network = topology.network.Network()
+        self.network.insert_nodes(switch_count, lambda node: network.nodes[node.id].name)
+        fabric_edges = self.network.insert_edges(starts[fabric], ends[fabric], capacities[fabric], lambda edge: network.edges[self.edge_ids[edge.id]].name)
+        fabric_positions = np.full(len(starts), -1)
+        fabric_positions[self.edge_ids] = np.arange(len(self.edge_ids))
+        for name, edges in network.conflict_edges.items():
+            self.network.define_conflict_edges(name, *self.fabric_edges(fabric_edges, fabric_positions, edges))
+        for name, edges in network.synchronous_edges.items():
+            self.network.define_synchronous_edges(name, *self.fabric_edges(fabric_edges, fabric_positions, edges))
+        source_switches, destination_switches = self.endpoint_switches[self.source_endpoints], self.endpoint_switches[self.destination_endpoints]
+        remote = source_switches != destination_switches
+        matrix = scipy.sparse.coo_array((self.rates[remote], (source_switches[remote], destination_switches[remote])), shape=(switch_count, switch_count))
+        self.traffic = topology.network.Traffic.from_matrix(self.network.nodes, matrix)
+        pairs = self.traffic.sources * switch_count + self.traffic.destinations
+        order = np.argsort(pairs)
+        self.flow_pairs = np.full(len(self.rates), -1)
+        self.flow_pairs[remote] = order[np.searchsorted(pairs, source_switches[remote] * switch_count + destination_switches[remote], sorter=order)]
+        self.fractions = np.zeros(len(self.rates))
+        self.fractions[remote] = self.rates[remote] / self.traffic.rates[self.flow_pairs[remote]]
+
+    @staticmethod
+    def fabric_edges(fabric_edges: list[topology.network.Edge], fabric_positions: np.ndarray, edges: typing.Iterable[topology.network.Edge]) -> list[topology.network.Edge]:
+        positions = fabric_positions[[edge.id for edge in edges]]
+        if np.any(positions < 0):
+            raise ValueError("the conflict and synchronous edges must be between switches")
+        return [fabric_edges[position] for position in positions.tolist()]
+
+    def limit_inject_rate(self, compiled_network: topology.network.CompiledNetwork) -> None:
+        """
+        bound the inject rate of the model compiled on the fabric by the capacity of the tor edges, so the rates above it are infeasible as in the full model
+        """
+        if not math.isfinite(self.rate_limit):
+            return
+        model, variables, _ = compiled_network
+        if isinstance(model, gp.Model):
+            variables.inject_rate.setAttr(gp.GRB.Attr.UB, self.rate_limit)
+        else:
+            model.set_bounds(np.asarray([variables.inject_rate]), 0.0, self.rate_limit)
+
+    def expand_edge_loads(self, loads: np.ndarray, rate: float) -> np.ndarray:
+        """
+        :param loads: the loads of the fabric edges, indexed by fabric edge id
+        :param rate: the inject rate of the solution
+        :return: the loads of every edge of the full network, indexed by edge id
+        """
+        expanded = self.tor_loads * rate
+        expanded[self.edge_ids] = loads
+        return expanded
+
+    def expand_flow_rates(self, flow_rates: 'np.ndarray | scipy.sparse.sparray', rate: float) -> scipy.sparse.csr_array:
+        """
+        split the rate of every switch flow at every fabric edge between the endpoint flows it merges in proportion to their rates, and add the tor edges of the endpoint flows
+        :param flow_rates: the rate of every flow of the traffic at every fabric edge, not aggregated, indexed by fabric edge id and flow
+        :param rate: the inject rate of the solution
+        :return: the rate of every endpoint flow at every edge of the full network, indexed by edge id and flow
+        """
+        remote = np.flatnonzero(self.flow_pairs >= 0)
+        split = scipy.sparse.csr_array((self.fractions[remote], (self.flow_pairs[remote], remote)), shape=(len(self.traffic), len(self.rates)))
+        fabric = (scipy.sparse.csr_array(flow_rates) @ split).tocoo()
+        moving = np.flatnonzero(self.moving)
+        rows = np.concatenate((self.edge_ids[fabric.row], self.endpoint_out_edges[self.source_endpoints[moving]], self.endpoint_in_edges[self.destination_endpoints[moving]]))
+        columns = np.concatenate((fabric.col, moving, moving))
+        values = np.concatenate((fabric.data, self.rates[moving] * rate, self.rates[moving] * rate))
+        return scipy.sparse.csr_array((values, (rows, columns)), shape=(len(self.capacities), len(self.rates)))
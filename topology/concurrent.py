@@ -0,0 +1,230 @@
+import math
+import typing
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+import instrumentation
+import topology.bounds
+import topology.network
+import topology.path
+
+ConcurrentFlow = typing.NamedTuple("ConcurrentFlow", lower=float, upper=float, loads=np.ndarray, hop_count=float, phase_count=int, tree_count=int)
+DefaultEpsilon = 0.1
+SourceBatchEntries = 1 << 22
+LengthRescale = 1e100
+RemainingTolerance = 1e-12
+
+
+class ConcurrentFlowApproximation:
+    """
+    approximate the largest inject rate at which the traffic can be routed, the maximum concurrent flow, by the garg and konemann multiplicative weights scheme without a linear solver
+    every edge has a length growing exponentially with its load, and in every phase the demand of every source switch is routed over its shortest path tree under the current lengths,
+    the trees of a batch of sources are found by one call to scipy.sparse.csgraph.dijkstra, and a tree saturating one of its edges routes only the part of the demand its capacity allows
+    the result is certified both ways: the flow routed so far, scaled down by its congestion, is feasible and gives the lower bound,
+    and the lengths give the dual upper bound, the total capacity weighted by the lengths over the demands weighted by their shortest distances
+    the phases stop when the bounds, capped by the terminal bound, are within 1 + epsilon, or when the lengths grow past the garg and konemann threshold, which gives a 1 - epsilon approximation up to constants
+    the flows through the terminals (see topology.path.terminal_attachments) are merged into the traffic between the switches they hang on, their forced hops bound the rate analytically
+    the reconfigurable edges are routed over as configured, such as by topology.ocs.dragonfly_ocs_configuration, the fixed ocs layers are ordinary edges
+    """
+
+    def __init__(self, network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, configuration: np.ndarray | None = None) -> None:
+        """
+        :param configuration: whether every edge is enabled, indexed by edge id, required when the network has reconfigurable edges
+        """
+        starts, ends, capacities = network.edge_arrays()
+        node_count = network.node_count()
+        sources, destinations, rates = topology.network.traffic_arrays(traffic_pattern)
+        routed = (rates != 0) & (sources != destinations)
+        sources, destinations, rates = sources[routed], destinations[routed], rates[routed]
+        self.edge_count = len(starts)
+        self.total_traffic = float(rates.sum())
+        terminals, attachments = topology.path.terminal_attachments(network)
+        terminal_edges = terminals[starts] | terminals[ends]
+        uplinks = np.full(node_count, -1)
+        uplinks[starts[terminal_edges & terminals[starts]]] = np.flatnonzero(terminal_edges & terminals[starts])
+        downlinks = np.full(node_count, -1)
+        downlinks[ends[terminal_edges & terminals[ends]]] = np.flatnonzero(terminal_edges & terminals[ends])
+        self.fixed_loads = np.bincount(uplinks[sources[terminals[sources]]], weights=rates[terminals[sources]], minlength=self.edge_count) + \
+            np.bincount(downlinks[destinations[terminals[destinations]]], weights=rates[terminals[destinations]], minlength=self.edge_count)
+        self.fixed_cost = float(np.dot(terminals[sources].astype(np.float64) + terminals[destinations], rates))
+        loaded = self.fixed_loads > 0
+        self.terminal_limit = float(np.min(capacities[loaded] / self.fixed_loads[loaded])) if np.any(loaded) else math.inf
+
+        usable = ~terminal_edges & (capacities > 0)
+        reconfigurable = topology.bounds.reconfigurable_edges(network)
+        if np.any(reconfigurable):
+            if configuration is None:
+                raise ValueError("the reconfigurable edges must be configured, such as by topology.ocs.dragonfly_ocs_configuration")
+            usable &= ~reconfigurable | (np.asarray(configuration) > 0.5)
+        core_nodes = np.flatnonzero(~terminals)
+        core_index = np.full(node_count, -1)
+        core_index[core_nodes] = np.arange(len(core_nodes))
+        self.node_count = len(core_nodes)
+        edges = np.flatnonzero(usable)
+        edge_starts, edge_ends = core_index[starts[edges]], core_index[ends[edges]]
+        order = np.lexsort((edge_ends, edge_starts))
+        self.edges, self.edge_starts, self.edge_ends, self.capacities = edges[order], edge_starts[order], edge_ends[order], capacities[edges[order]]
+        keys = self.edge_starts * self.node_count + self.edge_ends
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        self.group_starts = np.flatnonzero(first)
+        self.group_sizes = np.diff(np.append(self.group_starts, len(keys)))
+        self.pair_keys = keys[first]
+        pair_starts = self.pair_keys // self.node_count
+        self.indptr = np.searchsorted(pair_starts, np.arange(self.node_count + 1))
+        self.indices = self.pair_keys % self.node_count
+
+        pairs, inverse = np.unique(attachments[sources] * node_count + attachments[destinations], return_inverse=True)
+        demands = np.bincount(inverse, weights=rates, minlength=len(pairs))
+        commodity_sources, commodity_destinations = np.divmod(pairs, node_count)
+        switched = commodity_sources != commodity_destinations
+        commodity_sources, commodity_destinations, demands = core_index[commodity_sources[switched]], core_index[commodity_destinations[switched]], demands[switched]
+        self.sources, source_rows = np.unique(commodity_sources, return_inverse=True)
+        self.demands = scipy.sparse.csr_array((demands, (source_rows, commodity_destinations)), shape=(len(self.sources), self.node_count))
+        self.source_demands = np.asarray(self.demands.sum(axis=1)).ravel()
+
+    def graph(self, lengths: np.ndarray) -> typing.Tuple[scipy.sparse.csr_array, np.ndarray]:
+        """
+        :return: the graph of the core nodes weighted by the shortest of the parallel edges, and the position of the edge chosen for every pair of nodes
+        """
+        pair_lengths = np.minimum.reduceat(lengths, self.group_starts)
+        if len(self.pair_keys) == len(lengths):
+            chosen = np.arange(len(lengths))
+        else:
+            hits = np.flatnonzero(lengths == np.repeat(pair_lengths, self.group_sizes))
+            _, first = np.unique(np.repeat(np.arange(len(self.pair_keys)), self.group_sizes)[hits], return_index=True)
+            chosen = hits[first]
+        return scipy.sparse.csr_array((pair_lengths, self.indices, self.indptr), shape=(self.node_count, self.node_count)), chosen
+
+    def shortest_paths(self, lengths: np.ndarray, rows: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: the distances and the predecessors from the sources of the rows, and the edges chosen between every pair of nodes
+        """
+        graph, chosen = self.graph(lengths)
+        distances, predecessors = scipy.sparse.csgraph.dijkstra(graph, directed=True, indices=self.sources[rows], return_predecessors=True)
+        return distances, predecessors, chosen
+
+    def tree_loads(self, predecessors: np.ndarray, source: int, demand: np.ndarray, chosen: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        :param demand: the demand from the source to every core node
+        :return: the positions of the edges of the shortest path tree carrying demand, and the demand through them, the demand of the subtree under every edge
+        """
+        if np.any((predecessors < 0) & (demand > 0) & (np.arange(self.node_count) != source)):
+            raise ValueError("some traffic has no path over the enabled edges")
+        levels = []
+        frontier = np.asarray([source])
+        while len(frontier) > 0:
+            frontier = np.flatnonzero(np.isin(predecessors, frontier))
+            levels.append(frontier)
+        subtree = demand.copy()
+        for nodes in reversed(levels):
+            np.add.at(subtree, predecessors[nodes], subtree[nodes])
+        nodes = np.flatnonzero((predecessors >= 0) & (subtree > 0))
+        pairs = np.searchsorted(self.pair_keys, predecessors[nodes].astype(np.int64) * self.node_count + nodes)
+        return chosen[pairs], subtree[nodes]
+
+    def upper_bound(self, lengths: np.ndarray) -> float:
+        """
+        the dual bound, every routing of the demands at rate r takes r times the demands weighted by their shortest distances out of the capacity weighted by the lengths
+        """
+        weighted_distance = 0.0
+        for rows in self.source_batches():
+            distances, _, _ = self.shortest_paths(lengths, rows)
+            demands = self.demands[rows].tocoo()
+            weighted_distance += float(np.dot(demands.data, distances[demands.row, demands.col]))
+        return float(np.dot(self.capacities, lengths)) / weighted_distance if weighted_distance > 0 else math.inf
+
+    def source_batches(self) -> typing.Iterator[np.ndarray]:
+        batch_size = max(1, SourceBatchEntries // max(1, self.node_count))
+        for batch in range(0, len(self.sources), batch_size):
+            yield np.arange(batch, min(batch + batch_size, len(self.sources)))
+
+    def expand_loads(self, core_loads: np.ndarray, rate: float) -> np.ndarray:
+        """
+        :return: the loads of every edge of the network, indexed by edge id, the terminal edges carry their forced loads at the rate
+        """
+        loads = self.fixed_loads * rate
+        loads[self.edges] += core_loads
+        return loads
+
+    def solve(self, epsilon: float = DefaultEpsilon, max_phase_count: int | None = None) -> ConcurrentFlow:
+        """
+        :param epsilon: the accuracy, the bounds are within 1 + epsilon when the phases stop early, the lengths grow by a factor of 1 + epsilon for every saturated edge
+        :param max_phase_count: stop after as many phases, the bounds stay certified
+        :return: the certified lower and upper bounds of the largest feasible inject rate, the loads of every edge in a routing of the lower bound, and its average hop count per unit of traffic
+        """
+        if len(self.sources) == 0:
+            return ConcurrentFlow(self.terminal_limit, self.terminal_limit, self.fixed_loads * (self.terminal_limit if math.isfinite(self.terminal_limit) else 0.0),
+                                  self.fixed_cost / self.total_traffic if self.total_traffic > 0 else 0.0, 0, 0)
+        edge_count = len(self.capacities)
+        log_threshold = math.log(edge_count / (1 - epsilon)) / epsilon
+        doubling_phase_count = math.ceil(2 * log_threshold / math.log1p(epsilon))
+        lengths = 1.0 / self.capacities
+        log_scale = 0.0
+        tree_count = 0
+        with instrumentation.phase("concurrent_flow_start", "routing the demands over shortest paths"):
+            flow = np.zeros(edge_count)
+            for rows in self.source_batches():
+                _, predecessors, chosen = self.shortest_paths(lengths, rows)
+                for i, row in enumerate(rows.tolist()):
+                    positions, loads = self.tree_loads(predecessors[i], int(self.sources[row]), self.demands[[row]].toarray().ravel(), chosen)
+                    np.add.at(flow, positions, loads)
+                    tree_count += 1
+            congestion = float(np.max(flow / self.capacities))
+            lower, core_loads = 1.0 / congestion, flow / congestion
+            hop_count = float(flow.sum()) / self.source_demands.sum()
+            upper = self.upper_bound(lengths)
+        scale = lower
+        flow = np.zeros(edge_count)
+        routed = np.zeros(len(self.sources))
+        phase_count = 0
+        phases_since_doubling = 0
+        exhausted = False
+        while not exhausted and min(upper, self.terminal_limit) > (1 + epsilon) * min(lower, self.terminal_limit) and (max_phase_count is None or phase_count < max_phase_count):
+            with instrumentation.phase("concurrent_flow_phase", phase=phase_count, scale=scale) as record:
+                for rows in self.source_batches():
+                    _, predecessors, batch_chosen = self.shortest_paths(lengths, rows)
+                    for i, row in enumerate(rows.tolist()):
+                        source = int(self.sources[row])
+                        demand = self.demands[[row]].toarray().ravel() * scale
+                        tree, chosen, fraction = predecessors[i], batch_chosen, 1.0
+                        while fraction > RemainingTolerance and not exhausted:
+                            if tree is None:
+                                _, tree, chosen = self.shortest_paths(lengths, np.asarray([row]))
+                                tree = tree[0]
+                            positions, loads = self.tree_loads(tree, source, demand * fraction, chosen)
+                            tree_count += 1
+                            step = min(1.0, float(np.min(self.capacities[positions] / loads))) if len(loads) > 0 else 1.0
+                            np.add.at(flow, positions, step * loads)
+                            np.multiply.at(lengths, positions, 1 + epsilon * step * loads / self.capacities[positions])
+                            routed[row] += step * fraction * scale
+                            fraction *= 1 - step
+                            tree = None
+                            largest = float(lengths.max())
+                            if largest > LengthRescale:
+                                lengths /= largest
+                                log_scale += math.log(largest)
+                            exhausted = log_scale + math.log(float(np.dot(self.capacities, lengths))) >= log_threshold
+                        if exhausted:
+                            break
+                    if exhausted:
+                        break
+                phase_count += 1
+                phases_since_doubling += 1
+                congestion = float(np.max(flow / self.capacities))
+                phase_lower = float(np.min(routed)) / congestion if congestion > 0 else 0.0
+                if phase_lower > lower:
+                    lower, core_loads = phase_lower, flow / congestion
+                    hop_count = float(flow.sum()) / float(np.dot(routed, self.source_demands))
+                upper = min(upper, self.upper_bound(lengths))
+                if phases_since_doubling >= doubling_phase_count:
+                    scale *= 2
+                    phases_since_doubling = 0
+                record.update(lower=lower, upper=upper, tree_count=tree_count)
+            print(f"concurrent flow phase {phase_count}: lower bound: {lower}, upper bound: {upper}")
+        rate = min(lower, self.terminal_limit)
+        switched_traffic = float(self.source_demands.sum())
+        average_hop_count = (hop_count * switched_traffic + self.fixed_cost) / self.total_traffic
+        return ConcurrentFlow(rate, min(upper, self.terminal_limit), self.expand_loads(core_loads * (rate / lower), rate), average_hop_count, phase_count, tree_count)
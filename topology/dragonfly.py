@@ -1,7 +1,7 @@
 import random
 
-import deprecated
 import numpy as np
+import scipy.sparse
 
 import topology.network
 
@@ -42,52 +42,68 @@ def conflict_links_name(ocs_layer: int, group_index: int) -> str:
     return f"conflict ocs links for group {group_index} on layer {ocs_layer}"
 
 
+def switch_index(a: int, group_id: int, switch_id: int) -> int:
+    return group_id * a + switch_id
+
+
+def node_index(group_count: int, p: int, a: int, group_id: int, switch_id: int, node_id: int) -> int:
+    return group_count * a + (group_id * a + switch_id) * p + node_id
+
+
+def ocs_link_name_factory(ocs_layer: int) -> topology.network.NameFactory:
+    return lambda edge: ocs_link(ocs_layer, edge.start, edge.end)
+
+
 def dragonfly(p: int, a: int, h: int, link_capacity: float, ocs_layer_count: int = 0, background_layer: bool = True, fixed_ocs_layers: bool = False, random_generator: random.Random = None) -> topology.network.Network:
+    """
+    the switches take the node ids before the endpoints, see switch_index and node_index, the names of the nodes and edges are generated lazily
+    """
     group_count = a * h + 1
+    switch_count = group_count * a
     network = topology.network.Network()
-    groups = []
-    for group_id in range(0, group_count):
-        group = []
-        for switch_id in range(0, a):
-            switch = network.insert_node(switch_name(group_id, switch_id))
-            for node_id in range(0, p):
-                node = network.insert_node(node_name(switch, node_id))
-                network.insert_edge(tor_uplink(node), switch, node, link_capacity)
-                network.insert_edge(tor_downlink(node), node, switch, link_capacity)
-            group.append(switch)
-        for x in group:
-            for y in group:
-                if x == y:
-                    continue
-                network.insert_edge(inner_group_link(group_id, x, y), x, y, link_capacity)
-        groups.append(group)
+    switches = network.insert_nodes(switch_count, lambda node: switch_name(*divmod(node.id, a)))
+    network.insert_nodes(switch_count * p, lambda node: node_name(switches[(node.id - switch_count) // p], (node.id - switch_count) % p))
+    endpoints = np.arange(switch_count, switch_count * (p + 1))
+    endpoint_switches = (endpoints - switch_count) // p
+    network.insert_edges(endpoint_switches, endpoints, link_capacity, lambda edge: tor_uplink(edge.end))
+    network.insert_edges(endpoints, endpoint_switches, link_capacity, lambda edge: tor_downlink(edge.start))
+    x, y = np.nonzero(~np.eye(a, dtype=bool))
+    groups = np.arange(group_count)[:, np.newaxis]
+    network.insert_edges((groups * a + x).ravel(), (groups * a + y).ravel(), link_capacity, lambda edge: inner_group_link(edge.start.id // a, edge.start, edge.end))
     if background_layer:
-        for group_id, group in enumerate(groups):
-            for target_id, target in enumerate(groups):
-                if group_id == target_id:
-                    continue
-                current_switch = group[(group_id + group_count - target_id - 1) % group_count // h]
-                target_switch = target[(target_id + group_count - group_id - 1) % group_count // h]
-                network.insert_edge(inter_group_link(group_id, target_id), current_switch, target_switch, link_capacity)
+        group_ids, target_ids = np.nonzero(~np.eye(group_count, dtype=bool))
+        current_switches = group_ids * a + (group_ids + group_count - target_ids - 1) % group_count // h
+        target_switches = target_ids * a + (target_ids + group_count - group_ids - 1) % group_count // h
+        network.insert_edges(current_switches, target_switches, link_capacity, lambda edge: inter_group_link(edge.start.id // a, edge.end.id // a))
     for layer in range(ocs_layer_count):
+        name = ocs_link_name_factory(layer)
         for group in range(group_count):
-            conflict_edges = []
-            for target_group in range(group_count):
-                if group == target_group:
-                    continue
-                switch = network.find_node(switch_name(group, layer % a))
-                target_switch = network.find_node(switch_name(target_group, layer % a))
-                conflict_edges.append((switch, target_switch))
+            target_groups = [target_group for target_group in range(group_count) if target_group != group]
             if fixed_ocs_layers:
                 if random_generator is None:
                     random_generator = random.Random()
-                switch, target_switch = random_generator.choice(conflict_edges)
-                network.insert_edge(ocs_link(layer, switch, target_switch), switch, target_switch, link_capacity)
-            else:
-                network.define_conflict_edges(conflict_links_name(layer, group), *[network.insert_edge(ocs_link(layer, s, t), s, t, link_capacity) for (s, t) in conflict_edges])
+                target_groups = [random_generator.choice(target_groups)]
+            edges = network.insert_edges(np.full(len(target_groups), switch_index(a, group, layer % a)), np.asarray(target_groups) * a + layer % a, link_capacity, name)
+            if not fixed_ocs_layers:
+                network.define_conflict_edges(conflict_links_name(layer, group), *edges)
     return network
 
 
+def node_groups(group_count: int, p: int, a: int) -> np.ndarray:
+    """
+    the group of every node, indexed by node id
+    """
+    switch_count = group_count * a
+    return np.concatenate((np.arange(switch_count) // a, np.arange(switch_count * p) // (a * p)))
+
+
+def endpoint_nodes(network: topology.network.Network, group_count: int, p: int, a: int) -> list[topology.network.Node]:
+    """
+    the endpoints in the order of the rows and columns of a traffic matrix, the endpoint of node node_id under switch switch_id in group group_id is at (group_id * a + switch_id) * p + node_id
+    """
+    return network.nodes[node_index(group_count, p, a, 0, 0, 0):node_index(group_count, p, a, group_count, 0, 0)]
+
+
 def group_neighbor_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
     """
     group neighbor traffic, each node send to the node of the same position in the next group
@@ -98,17 +114,9 @@ def group_neighbor_traffic(network: topology.network.Network, group_count: int,
     :param link_capacity:
     :return:
     """
-    traffic_pattern = set()
-    for group_id in range(group_count):
-        target_group_id = (group_id + 1) % group_count
-        for switch_id in range(a):
-            switch = network.find_node(topology.dragonfly.switch_name(group_id, switch_id))
-            target_switch = network.find_node(topology.dragonfly.switch_name(target_group_id, switch_id))
-            for node_id in range(p):
-                node = network.find_node(topology.dragonfly.node_name(switch, node_id))
-                target_node = network.find_node(topology.dragonfly.node_name(target_switch, node_id))
-                traffic_pattern.add(topology.network.Flow(node, target_node, link_capacity))
-    return traffic_pattern
+    node_count = group_count * a * p
+    sources = np.arange(node_count)
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), sources, (sources + a * p) % node_count, link_capacity)
 
 
 def nearest_neighbor_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
@@ -121,25 +129,9 @@ def nearest_neighbor_traffic(network: topology.network.Network, group_count: int
     :param link_capacity:
     :return:
     """
-    traffic_pattern = set()
-    for group_id in range(group_count):
-        next_group_id = (group_id + 1) % group_count
-        for switch_id in range(a):
-            switch = network.find_node(topology.dragonfly.switch_name(group_id, switch_id))
-            next_switch_id = (switch_id + 1) % a
-            if next_switch_id <= switch_id:
-                next_switch = network.find_node(topology.dragonfly.switch_name(next_group_id, next_switch_id))
-            else:
-                next_switch = network.find_node(topology.dragonfly.switch_name(group_id, next_switch_id))
-            for node_id in range(p):
-                node = network.find_node(topology.dragonfly.node_name(switch, node_id))
-                next_node_id = (node_id + 1) % p
-                if next_node_id <= node_id:
-                    next_node = network.find_node(topology.dragonfly.node_name(next_switch, next_node_id))
-                else:
-                    next_node = network.find_node(topology.dragonfly.node_name(switch, next_node_id))
-                traffic_pattern.add(topology.network.Flow(node, next_node, link_capacity))
-    return traffic_pattern
+    node_count = group_count * a * p
+    sources = np.arange(node_count)
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), sources, (sources + 1) % node_count, link_capacity)
 
 
 def all_to_all_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
@@ -152,21 +144,9 @@ def all_to_all_traffic(network: topology.network.Network, group_count: int, p: i
     :param link_capacity:
     :return:
     """
-    traffic_pattern = set()
-    for group_id in range(group_count):
-        for switch_id in range(a):
-            switch = network.find_node(switch_name(group_id, switch_id))
-            for node_id in range(p):
-                node = network.find_node(node_name(switch, node_id))
-                for target_group_id in range(group_count):
-                    if group_id == target_group_id:
-                        continue
-                    for target_switch_id in range(a):
-                        target_switch = network.find_node(switch_name(target_group_id, target_switch_id))
-                        for target_node_id in range(p):
-                            target_node = network.find_node(node_name(target_switch, target_node_id))
-                            traffic_pattern.add(topology.network.Flow(node, target_node, link_capacity / ((group_count - 1) * p * a)))
-    return traffic_pattern
+    groups = np.arange(group_count * a * p) // (a * p)
+    sources, destinations = np.nonzero(groups[:, np.newaxis] != groups[np.newaxis, :])
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), sources, destinations, link_capacity / ((group_count - 1) * p * a))
 
 
 def adversarial_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
@@ -179,20 +159,9 @@ def adversarial_traffic(network: topology.network.Network, group_count: int, p:
     :param link_capacity:
     :return:
     """
-    traffic_pattern = set()
-    for group_id in range(0, group_count, 2):
-        opposite_group_id = group_id + 1
-        if opposite_group_id >= group_count:
-            continue
-        for switch_id in range(a):
-            switch = network.find_node(topology.dragonfly.switch_name(group_id, switch_id))
-            opposite_switch = network.find_node(topology.dragonfly.switch_name(opposite_group_id, switch_id))
-            for node_id in range(p):
-                node = network.find_node(topology.dragonfly.node_name(switch, node_id))
-                opposite_node = network.find_node(topology.dragonfly.node_name(opposite_switch, node_id))
-                traffic_pattern.add(topology.network.Flow(node, opposite_node, link_capacity))
-                traffic_pattern.add(topology.network.Flow(opposite_node, node, link_capacity))
-    return traffic_pattern
+    sources = np.arange(group_count // 2 * 2 * a * p)
+    groups = sources // (a * p)
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), sources, sources + ((groups ^ 1) - groups) * a * p, link_capacity)
 
 
 def adversarial_traffic_remaining_all_to_all(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
@@ -208,103 +177,66 @@ def adversarial_traffic_remaining_all_to_all(network: topology.network.Network,
     traffic_pattern = adversarial_traffic(network, group_count, p, a, link_capacity)
     node_count_per_group = p * a
     if group_count % 2 != 0:
-        group_id = group_count - 1
-        for switch_id_i in range(a):
-            for node_id_i in range(p):
-                for switch_id_j in range(a):
-                    for node_id_j in range(p):
-                        if switch_id_i == switch_id_j and node_id_i == node_id_j:
-                            continue
-                        switch_i = network.find_node(topology.dragonfly.switch_name(group_id, switch_id_i))
-                        switch_j = network.find_node(topology.dragonfly.switch_name(group_id, switch_id_j))
-                        node_i = network.find_node(topology.dragonfly.node_name(switch_i, node_id_i))
-                        node_j = network.find_node(topology.dragonfly.node_name(switch_j, node_id_j))
-                        traffic_pattern.add(topology.network.Flow(node_i, node_j, link_capacity / (node_count_per_group - 1)))
+        first_node = (group_count - 1) * node_count_per_group
+        sources, destinations = np.nonzero(~np.eye(node_count_per_group, dtype=bool))
+        traffic_pattern = traffic_pattern.concatenate(topology.network.Traffic(traffic_pattern.nodes, first_node + sources, first_node + destinations, link_capacity / (node_count_per_group - 1)))
     return traffic_pattern
 
 
 def random_group_to_group_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float, random_generator: random.Random = None) -> topology.network.TrafficPattern:
-    traffic_pattern = set()
-    income_flow_count = {}
-    outcome_flow_count = {}
-    pairs = set()
     if random_generator is None:
         random_generator = random.Random()
+    target_group_ids = np.empty(group_count, dtype=np.int64)
     for group_id in range(group_count):
         while True:
             target_group_id = random_generator.randrange(group_count)
             if target_group_id != group_id:
                 break
-        if group_id not in outcome_flow_count:
-            outcome_flow_count[group_id] = 0
-        if target_group_id not in income_flow_count:
-            income_flow_count[target_group_id] = 0
-        outcome_flow_count[group_id] += 1
-        income_flow_count[target_group_id] += 1
-        pairs.add((group_id, target_group_id))
-    for group_id, target_group_id in pairs:
-        for switch_id in range(a):
-            switch = network.find_node(topology.dragonfly.switch_name(group_id, switch_id))
-            target_switch = network.find_node(topology.dragonfly.switch_name(target_group_id, switch_id))
-            for node_id in range(p):
-                node = network.find_node(topology.dragonfly.node_name(switch, node_id))
-                target_node = network.find_node(topology.dragonfly.node_name(target_switch, node_id))
-                traffic_pattern.add(topology.network.Flow(node, target_node, link_capacity / max(income_flow_count[target_group_id], outcome_flow_count[group_id])))
-    return traffic_pattern
+        target_group_ids[group_id] = target_group_id
+    income_flow_count = np.bincount(target_group_ids, minlength=group_count)
+    node_count_per_group = a * p
+    sources = np.arange(group_count * node_count_per_group)
+    groups = sources // node_count_per_group
+    destinations = target_group_ids[groups] * node_count_per_group + sources % node_count_per_group
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), sources, destinations, link_capacity / income_flow_count[target_group_ids[groups]])
 
 
 def random_node_to_node_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float, random_generator: random.Random = None) -> topology.network.TrafficPattern:
+    if random_generator is None:
+        random_generator = random.Random()
     node_count = group_count * p * a
-    traffic_matrix = np.zeros((node_count, node_count))
-    income_flow_count = {}
-    outcome_flow_count = {}
-    pairs = set()
+    destinations = np.empty(node_count, dtype=np.int64)
     for i in range(node_count):
         while True:
             j = random_generator.randrange(0, node_count)
             if i != j:
                 break
-        if i not in outcome_flow_count:
-            outcome_flow_count[i] = 0
-        if j not in income_flow_count:
-            income_flow_count[j] = 0
-        outcome_flow_count[i] += 1
-        income_flow_count[j] += 1
-        pairs.add((i, j))
-    for (i, j) in pairs:
-        traffic_matrix[i, j] = 1 / max(income_flow_count[j], outcome_flow_count[i])
-    return convert_traffic_matrix(traffic_matrix, network, group_count, p, a, link_capacity)
-
-
-@deprecated.deprecated("wrong traffic, needs correction")
+        destinations[i] = j
+    income_flow_count = np.bincount(destinations, minlength=node_count)
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), np.arange(node_count), destinations, link_capacity / income_flow_count[destinations])
+
+
 def bit_complementary_traffic(network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
+    """
+    bit complementary traffic, each node send to the node at the complementary position, i.e. node_count - 1 - i, which is the bitwise complement when the node count is a power of two
+    :param network:
+    :param group_count:
+    :param p:
+    :param a:
+    :param link_capacity:
+    :return:
+    """
     node_count = group_count * p * a
-    traffic = np.zeros((node_count, node_count))
-    for i in range(node_count):
-        j = (~i) & (node_count - 1)
-        if i == j:
-            continue
-        traffic[i, j] = 1
-    return convert_traffic_matrix(traffic, network, group_count, p, a, link_capacity)
+    sources = np.arange(node_count)
+    destinations = node_count - 1 - sources
+    different = sources != destinations
+    return topology.network.Traffic(endpoint_nodes(network, group_count, p, a), sources[different], destinations[different], link_capacity)
 
 
-def convert_traffic_matrix(traffic: np.ndarray, network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
+def convert_traffic_matrix(traffic: 'np.ndarray | scipy.sparse.sparray', network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float) -> topology.network.TrafficPattern:
     assert traffic.ndim == 2
-    node_map = {}
-    traffic_pattern = set()
-    for group_id in range(group_count):
-        for switch_id in range(a):
-            switch = network.find_node(topology.dragonfly.switch_name(group_id, switch_id))
-            for node_id in range(p):
-                node = network.find_node(topology.dragonfly.node_name(switch, node_id))
-                node_map[len(node_map)] = node
-    node_count = len(node_map)
-    assert traffic.shape[0] <= node_count and traffic.shape[1] <= node_count
-    traffic = np.pad(traffic, ((0, node_count - traffic.shape[0]), (0, node_count - traffic.shape[0])))
-    traffic *= link_capacity
-    for i in range(traffic.shape[0]):
-        for j in range(traffic.shape[1]):
-            if traffic[i, j] == 0:
-                continue
-            traffic_pattern.add(topology.network.Flow(node_map[i], node_map[j], traffic[i, j]))
+    nodes = endpoint_nodes(network, group_count, p, a)
+    assert traffic.shape[0] <= len(nodes) and traffic.shape[1] <= len(nodes)
+    traffic_pattern = topology.network.Traffic.from_matrix(nodes, traffic)
+    traffic_pattern.rates = traffic_pattern.rates * link_capacity
     return traffic_pattern
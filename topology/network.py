@@ -1,8 +1,15 @@
+import collections.abc
 import typing
 from typing import Any
 
 import deprecated
 import gurobipy as gp
+import numpy as np
+import scipy.sparse
+
+import backend.base
+import backend.gurobi
+import instrumentation
 
 InjectRateName = "inject_rate"
 InjectRateConstraintName = "inject_rate_constraint"
@@ -10,42 +17,74 @@ Variables = typing.NamedTuple("Variables", flow_status=typing.Dict['Edge', typin
 Constraints = typing.NamedTuple("Constraints",
                                 inject_rate_constraint=gp.Constr, edge_capacity_constraints=typing.Dict['Edge', gp.Constr], net_flow_rate_at_each_node_constraints=typing.Dict['Node', typing.Dict['Flow', gp.Constr]],
                                 enabled_edges_constraints=typing.Dict['Edge', gp.Constr] | None, conflict_edges_constraints=typing.Dict[str, gp.Constr] | None, synchronous_edges_constraints=typing.Dict[str, gp.Constr] | None)
-TrafficPattern = typing.Set['Flow']
+TrafficPattern = typing.AbstractSet['Flow']
+AggregateBySource = "source"
+AggregateByDestination = "destination"
+NamingReadable = "readable"
+NamingShort = "short"
+NamingNone = "none"
 CompiledNetwork = typing.Tuple[gp.Model, Variables, Constraints]
 
 
+NameFactory = typing.Callable[[Any], str]
+
+
 class Node:
-    def __init__(self, name: str) -> None:
-        self.name = name
+    """
+    a node is identified by its dense integer id in the network, the name is generated lazily when the name is a factory
+    """
+    __slots__ = ("id", "_name")
+
+    def __init__(self, name: str | NameFactory, id: int = 0) -> None:
+        self.id = id
+        self._name = name
+
+    @property
+    def name(self) -> str:
+        if not isinstance(self._name, str):
+            self._name = self._name(self)
+        return self._name
 
     def __eq__(self, other: Any) -> bool:
         if isinstance(other, self.__class__):
-            return self.name == other.name
+            return self.id == other.id
         else:
             return False
 
     def __hash__(self) -> int:
-        return hash(self.name)
+        return self.id
 
     def __str__(self) -> str:
         return self.name
 
 
 class Edge:
-    def __init__(self, name: str, start: Node, end: Node, capacity: float) -> None:
-        self.name = name
+    """
+    an edge is identified by its dense integer id in the network, the name is generated lazily when the name is a factory
+    """
+    __slots__ = ("id", "_name", "start", "end", "capacity")
+
+    def __init__(self, name: str | NameFactory, start: Node, end: Node, capacity: float, id: int = 0) -> None:
+        self.id = id
+        self._name = name
         self.start = start
         self.end = end
         self.capacity = capacity
 
+    @property
+    def name(self) -> str:
+        if not isinstance(self._name, str):
+            self._name = self._name(self)
+        return self._name
+
     def __eq__(self, other: Any) -> bool:
         if isinstance(other, self.__class__):
-            return self.name == other.name and self.start == other.start and self.end == other.end
+            return self.id == other.id
         else:
             return False
 
     def __hash__(self) -> int:
-        return hash((self.name, self.start, self.end))
+        return self.id
 
     def __str__(self) -> str:
         return self.name
@@ -62,6 +101,8 @@ class Edge:
 
 
 class Flow:
+    __slots__ = ("start", "end", "rate")
+
     def __init__(self, start: Node, end: Node, rate: float) -> None:
         self.start = start
         self.end = end
@@ -74,7 +115,7 @@ class Flow:
             return False
 
     def __hash__(self) -> int:
-        return hash((self.start, self.end))
+        return hash((self.start.id, self.end.id))
 
     def __str__(self) -> str:
         return f"flow from {self.start} to {self.end}"
@@ -86,14 +127,190 @@ class Flow:
             0.0
         )
 
+    def net_rates(self) -> dict[Node, float]:
+        return {self.start: -self.rate, self.end: self.rate} if self.start != self.end else {}
+
+
+class Traffic(collections.abc.Set):
+    """
+    traffic pattern stored as arrays of sources, destinations and rates, the sources and destinations are positions in the given nodes, the flows are made on demand while iterating
+    """
+
+    def __init__(self, nodes: typing.Sequence[Node], sources: np.ndarray, destinations: np.ndarray, rates: float | np.ndarray) -> None:
+        self.nodes = nodes
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.destinations = np.asarray(destinations, dtype=np.int64)
+        self.rates = np.broadcast_to(np.asarray(rates, dtype=np.float64), self.sources.shape)
+        self.index: dict[typing.Tuple[int, int], int] | None = None
+
+    @classmethod
+    def from_matrix(cls, nodes: typing.Sequence[Node], matrix: 'np.ndarray | scipy.sparse.sparray') -> 'Traffic':
+        """
+        :param nodes: the node of every row and column of the matrix
+        :param matrix: dense or sparse traffic matrix, the rate from the node of the row to the node of the column
+        """
+        matrix = scipy.sparse.coo_array(matrix)
+        matrix.sum_duplicates()
+        nonzero = matrix.data != 0
+        return cls(nodes, matrix.row[nonzero], matrix.col[nonzero], matrix.data[nonzero])
+
+    @classmethod
+    def _from_iterable(cls, iterable: typing.Iterable[Flow]) -> set[Flow]:
+        return set(iterable)
+
+    def concatenate(self, other: 'Traffic') -> 'Traffic':
+        assert self.nodes is other.nodes
+        return Traffic(self.nodes, np.concatenate((self.sources, other.sources)), np.concatenate((self.destinations, other.destinations)), np.concatenate((self.rates, other.rates)))
+
+    def __iter__(self) -> typing.Iterator[Flow]:
+        nodes = self.nodes
+        for source, destination, rate in zip(self.sources.tolist(), self.destinations.tolist(), self.rates.tolist()):
+            yield Flow(nodes[source], nodes[destination], rate)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def __contains__(self, flow: Any) -> bool:
+        if not isinstance(flow, Flow):
+            return False
+        if self.index is None:
+            nodes = self.nodes
+            self.index = {(nodes[source].id, nodes[destination].id): i for i, (source, destination) in enumerate(zip(self.sources.tolist(), self.destinations.tolist()))}
+        return (flow.start.id, flow.end.id) in self.index
+
+    def total_rate(self) -> float:
+        return float(self.rates.sum())
+
+
+def traffic_arrays(traffic_pattern: TrafficPattern) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: the source node ids, the destination node ids and the rates of the flows
+    """
+    if isinstance(traffic_pattern, Traffic):
+        node_ids = np.fromiter((node.id for node in traffic_pattern.nodes), dtype=np.int64, count=len(traffic_pattern.nodes))
+        return node_ids[traffic_pattern.sources], node_ids[traffic_pattern.destinations], np.array(traffic_pattern.rates)
+    flows = list(traffic_pattern)
+    return (
+        np.fromiter((flow.start.id for flow in flows), dtype=np.int64, count=len(flows)),
+        np.fromiter((flow.end.id for flow in flows), dtype=np.int64, count=len(flows)),
+        np.fromiter((flow.rate for flow in flows), dtype=np.float64, count=len(flows))
+    )
+
+
+class Commodity:
+    """
+    flows sharing the same source (or the same destination) merged into one commodity with a demand at every destination (or source)
+    """
+    __slots__ = ("node", "aggregate", "rate", "demands", "balances")
+
+    def __init__(self, node: Node, aggregate: str) -> None:
+        self.node = node
+        self.aggregate = aggregate
+        self.rate = 0.0
+        self.demands: dict[Node, float] = {}
+        self.balances: dict[Node, float] = {}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, self.__class__):
+            return self.node == other.node and self.aggregate == other.aggregate
+        else:
+            return False
+
+    def __hash__(self) -> int:
+        return hash((self.node.id, self.aggregate))
+
+    def __str__(self) -> str:
+        return f"commodity {'from' if self.aggregate == AggregateBySource else 'to'} {self.node}"
+
+    def add(self, flow: Flow) -> None:
+        node = flow.end if self.aggregate == AggregateBySource else flow.start
+        sign = 1.0 if self.aggregate == AggregateBySource else -1.0
+        self.demands[node] = self.demands.get(node, 0.0) + flow.rate
+        self.rate += flow.rate
+        self.balances[node] = self.balances.get(node, 0.0) + sign * flow.rate
+        self.balances[self.node] = self.balances.get(self.node, 0.0) - sign * flow.rate
+
+    def net_rate_at(self, node: Node) -> float:
+        return self.balances.get(node, 0.0)
+
+    def net_rates(self) -> dict[Node, float]:
+        return self.balances
+
+
+def aggregate_traffic(traffic_pattern: TrafficPattern, aggregate: str | None) -> typing.Iterable[Flow | Commodity]:
+    """
+    merge the flows into commodities, the optimal throughput and total flow rate stay the same since a single source (or destination) flow can always be decomposed into per destination (or source) flows
+    :param traffic_pattern:
+    :param aggregate: None to keep every flow as a commodity, AggregateBySource or AggregateByDestination
+    :return:
+    """
+    if aggregate is None:
+        return traffic_pattern
+    if aggregate not in (AggregateBySource, AggregateByDestination):
+        raise ValueError(f"unknown aggregation {aggregate}")
+    commodities: dict[Node, Commodity] = {}
+    for flow in traffic_pattern:
+        node = flow.start if aggregate == AggregateBySource else flow.end
+        if node not in commodities:
+            commodities[node] = Commodity(node, aggregate)
+        commodities[node].add(flow)
+    return commodities.values()
+
+
+class IndexedMapping(collections.abc.Mapping):
+    """
+    read only mapping from keys to a flat sequence of values through an index, used to expose matrix compiled variables and constraints by edge, node and flow
+    """
+
+    def __init__(self, index: dict[Any, int], values: typing.Sequence[Any]) -> None:
+        self.index = index
+        self.sequence = values
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.sequence[self.index[key]]
+
+    def __iter__(self) -> typing.Iterator[Any]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class IdMapping(collections.abc.Mapping):
+    """
+    read only mapping from the nodes or edges of a network to a sequence of values indexed by their ids
+    """
+
+    def __init__(self, keys: typing.Sequence[Node | Edge], values: typing.Sequence[Any]) -> None:
+        self.keys_ = keys
+        self.sequence = values
+
+    def __getitem__(self, key: Node | Edge) -> Any:
+        if key.id >= len(self.keys_) or self.keys_[key.id] is not key:
+            raise KeyError(key)
+        return self.sequence[key.id]
+
+    def __iter__(self) -> typing.Iterator[Node | Edge]:
+        return iter(self.keys_)
+
+    def __len__(self) -> int:
+        return len(self.keys_)
+
 
 class Network:
 
     def __init__(self) -> None:
-        self.nodes: dict[str, Node] = {}
-        self.edges: dict[str, Edge] = {}
+        self.nodes: list[Node] = []
+        self.edges: list[Edge] = []
         self.conflict_edges: dict[str, set[Edge]] = {}
         self.synchronous_edges: dict[str, set[Edge]] = {}
+        self.edge_starts: list[int] = []
+        self.edge_ends: list[int] = []
+        self.edge_capacities: list[float] = []
+        self.node_names: dict[str, Node] | None = None
+        self.edge_names: dict[str, Edge] | None = None
+        self.topology_arrays: typing.Tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+        self.incidence: scipy.sparse.csr_array | None = None
 
     @deprecated.deprecated("not implemented correctly yet")
     def merge(self, network: 'Network') -> None:
@@ -104,38 +321,101 @@ class Network:
         # self.synchronous_edges.union(network.synchronous_edges)
 
     def merge_nodes(self, network: 'Network') -> None:
-        for key, value in network.nodes.items():
-            if key in self.nodes:
-                raise ValueError(f"node {key} already exist in network")
-            self.nodes[key] = value
+        for node in network.nodes:
+            if self.node_names_index().get(node.name) is not None:
+                raise ValueError(f"node {node.name} already exist in network")
+            self.insert_node(node.name)
 
     def merge_edges(self, network: 'Network') -> None:
-        for key, value in network.edges.items():
-            if key in self.edges:
-                raise ValueError(f"edge {key} already exist in network")
-            self.edges[key] = value
-
-    def insert_node(self, name: str) -> Node:
-        node = Node(name)
-        self.nodes[name] = node
+        for edge in network.edges:
+            if self.edge_names_index().get(edge.name) is not None:
+                raise ValueError(f"edge {edge.name} already exist in network")
+            self.insert_edge(edge.name, self.find_node(edge.start.name), self.find_node(edge.end.name), edge.capacity)
+
+    def topology_changed(self) -> None:
+        self.topology_arrays = None
+        self.incidence = None
+
+    def insert_node(self, name: str | NameFactory) -> Node:
+        node = Node(name, len(self.nodes))
+        self.nodes.append(node)
+        self.node_names = None
+        self.topology_changed()
         return node
 
-    def insert_edge(self, name: str, start: Node, end: Node, capacity: float) -> Edge:
-        edge = Edge(name, start, end, capacity)
-        self.edges[name] = edge
+    def insert_nodes(self, count: int, name: NameFactory) -> list[Node]:
+        """
+        insert nodes in bulk, the names are generated lazily by the factory from the node
+        """
+        nodes = [Node(name, i) for i in range(len(self.nodes), len(self.nodes) + count)]
+        self.nodes.extend(nodes)
+        self.node_names = None
+        self.topology_changed()
+        return nodes
+
+    def insert_edge(self, name: str | NameFactory, start: Node, end: Node, capacity: float) -> Edge:
+        edge = Edge(name, start, end, capacity, len(self.edges))
+        self.edges.append(edge)
+        self.edge_starts.append(start.id)
+        self.edge_ends.append(end.id)
+        self.edge_capacities.append(capacity)
+        self.edge_names = None
+        self.topology_changed()
         return edge
 
+    def insert_edges(self, starts: np.ndarray, ends: np.ndarray, capacities: float | np.ndarray, name: NameFactory) -> list[Edge]:
+        """
+        insert edges in bulk from the ids of their endpoints, the names are generated lazily by the factory from the edge
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        capacities = np.broadcast_to(np.asarray(capacities, dtype=np.float64), starts.shape)
+        edges = [
+            Edge(name, self.nodes[start], self.nodes[end], capacity, i)
+            for i, start, end, capacity in zip(range(len(self.edges), len(self.edges) + len(starts)), starts.tolist(), ends.tolist(), capacities.tolist())
+        ]
+        self.edges.extend(edges)
+        self.edge_starts.extend(starts.tolist())
+        self.edge_ends.extend(ends.tolist())
+        self.edge_capacities.extend(capacities.tolist())
+        self.edge_names = None
+        self.topology_changed()
+        return edges
+
+    def node_names_index(self) -> dict[str, Node]:
+        if self.node_names is None:
+            self.node_names = {node.name: node for node in self.nodes}
+        return self.node_names
+
+    def edge_names_index(self) -> dict[str, Edge]:
+        if self.edge_names is None:
+            self.edge_names = {edge.name: edge for edge in self.edges}
+        return self.edge_names
+
     def find_node(self, name: str) -> Node:
-        return self.nodes[name]
+        return self.node_names_index()[name]
 
     def find_edge(self, name: str) -> Edge:
-        return self.edges[name]
+        return self.edge_names_index()[name]
 
     def delete_node(self, node: Node) -> None:
-        del self.nodes[node.name]
+        del self.nodes[node.id]
+        for i in range(node.id, len(self.nodes)):
+            self.nodes[i].id = i
+        self.edge_starts = [edge.start.id for edge in self.edges]
+        self.edge_ends = [edge.end.id for edge in self.edges]
+        self.node_names = None
+        self.topology_changed()
 
     def delete_edge(self, edge: Edge) -> None:
-        del self.edges[edge.name]
+        del self.edges[edge.id]
+        del self.edge_starts[edge.id]
+        del self.edge_ends[edge.id]
+        del self.edge_capacities[edge.id]
+        for i in range(edge.id, len(self.edges)):
+            self.edges[i].id = i
+        self.edge_names = None
+        self.topology_changed()
 
     def define_conflict_edges(self, name: str, *edges: Edge) -> None:
         if len(edges) <= 1:
@@ -153,98 +433,237 @@ class Network:
     def edge_count(self) -> int:
         return len(self.edges)
 
-    def compile(self, traffic_pattern: TrafficPattern, initial_inject_rate=1.0, optimize_empty_flows: bool = True) -> CompiledNetwork:
-        print("compiling model")
-        model = gp.Model()
-        print("compiling topology information")
-        directly_connected_edges: dict[Node, set[Edge]] = {}
-        for edge in self.edges.values():
-            if edge.start not in directly_connected_edges:
-                directly_connected_edges[edge.start] = set()
-            if edge.end not in directly_connected_edges:
-                directly_connected_edges[edge.end] = set()
-            directly_connected_edges[edge.start].add(edge)
-            directly_connected_edges[edge.end].add(edge)
-        print("compiling flow rates at every edge")
-        flow_status: dict[Edge, dict[Flow, gp.Var]] = {
-            edge: {
-                flow: model.addVar(lb=0.0, ub=gp.GRB.INFINITY, obj=0.0, vtype=gp.GRB.CONTINUOUS, name=flow_status_name(edge, flow), column=None)
-                for flow in traffic_pattern
-                if not optimize_empty_flows or flow.rate != 0
+    def edge_arrays(self) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: the start node ids, the end node ids and the capacities of the edges, indexed by edge id
+        """
+        if self.topology_arrays is None:
+            self.topology_arrays = np.asarray(self.edge_starts, dtype=np.int64), np.asarray(self.edge_ends, dtype=np.int64), np.asarray(self.edge_capacities, dtype=np.float64)
+        return self.topology_arrays
+
+    def incidence_matrix(self) -> scipy.sparse.csr_array:
+        """
+        node-edge incidence matrix, -1 at the start node and 1 at the end node of every edge, same to Edge.net_coefficient_at
+        the rows are indexed by node id and the columns by edge id, every row is the csr adjacency of a node
+        """
+        if self.incidence is None:
+            starts, ends, _ = self.edge_arrays()
+            columns = np.arange(len(starts))
+            self.incidence = scipy.sparse.coo_array(
+                (np.concatenate((np.full(len(starts), -1.0), np.full(len(ends), 1.0))), (np.concatenate((starts, ends)), np.concatenate((columns, columns)))),
+                shape=(len(self.nodes), len(starts))
+            ).tocsr()
+        return self.incidence
+
+    def compile(self, traffic_pattern: TrafficPattern, initial_inject_rate=1.0, optimize_empty_flows: bool = True, matrix: bool = False, aggregate: str | None = None, solver: backend.base.Backend | None = None,
+                naming: str | None = None) -> CompiledNetwork:
+        """
+        :param naming: NamingReadable to name the variables and constraints after their edges, nodes and flows, NamingShort for the kind and the integer ids, NamingNone to leave them unnamed,
+        readable by default for the scalar compile and short for the matrix compile, see model_cache.save_index for the map from the ids back to the edges and flows
+        """
+        with instrumentation.phase("compile", "compiling model", matrix=matrix or solver is not None, aggregate=aggregate, naming=naming):
+            if matrix or solver is not None:
+                return self.compile_matrix(traffic_pattern, initial_inject_rate, optimize_empty_flows, aggregate, solver, naming or NamingShort)
+            return self.compile_scalar(traffic_pattern, initial_inject_rate, optimize_empty_flows, aggregate, naming or NamingReadable)
+
+    def compile_scalar(self, traffic_pattern: TrafficPattern, initial_inject_rate=1.0, optimize_empty_flows: bool = True, aggregate: str | None = None, naming: str = NamingReadable) -> CompiledNetwork:
+        """
+        compile the model variable by variable and constraint by constraint through gurobi, every variable and constraint is named after its edge, node and flow unless the naming says otherwise
+        """
+        with instrumentation.phase("topology", "compiling topology information") as record:
+            traffic_pattern = aggregate_traffic(traffic_pattern, aggregate)
+            model = gp.Model()
+            incidence = self.incidence_matrix()
+            flows = [flow for flow in traffic_pattern if not optimize_empty_flows or flow.rate != 0]
+            record.update(node_count=len(self.nodes), edge_count=len(self.edges), flow_count=len(flows))
+        with instrumentation.phase("flow_variables", "compiling flow rates at every edge") as record:
+            flow_status: dict[Edge, dict[Flow, gp.Var]] = {
+                edge: {
+                    flow: model.addVar(lb=0.0, ub=gp.GRB.INFINITY, obj=0.0, vtype=gp.GRB.CONTINUOUS, name=compile_name(naming, lambda: flow_status_name(edge, flow), "flow_rate", edge.id, f), column=None)
+                    for f, flow in enumerate(flows)
+                }
+                for edge in self.edges
+            }
+            record["variable_count"] = len(self.edges) * len(flows)
+        with instrumentation.phase("inject_rate", "compiling inject rate", variable_count=1):
+            inject_rate: gp.Var = model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=gp.GRB.CONTINUOUS, name=InjectRateName, column=None)
+        with instrumentation.phase("inject_rate_constraint", "compiling inject rate constraint", constraint_count=1):
+            inject_rate_constraint: gp.Constr = model.addConstr(inject_rate == initial_inject_rate, name=InjectRateConstraintName)
+        with instrumentation.phase("capacity_constraints", "compiling edge capacity constraints", constraint_count=len(self.edges)):
+            edge_capacity_constraints: dict[Edge, gp.Constr] = {
+                edge: model.addConstr(gp.quicksum(flow_status[edge].values()) <= edge.capacity, name=compile_name(naming, lambda: capacity_constraint_name(edge), "capacity_constraint", edge.id))
+                for edge in self.edges
             }
-            for edge in self.edges.values()
-        }
-        print("compiling inject rate")
-        inject_rate: gp.Var = model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=gp.GRB.CONTINUOUS, name=InjectRateName, column=None)
-        print("compiling inject rate constraint")
-        inject_rate_constraint: gp.Constr = model.addConstr(inject_rate == initial_inject_rate, name=InjectRateConstraintName)
-        print("compiling edge capacity constraints")
-        edge_capacity_constraints: dict[Edge, gp.Constr] = {
-            edge: model.addConstr(gp.quicksum(flow_status[edge].values()) <= edge.capacity, name=capacity_constraint_name(edge))
-            for edge in self.edges.values()
-        }
-        print("compiling net flow rate constraints")
-        net_flow_rate_at_each_node_constraints: dict[Node, dict[Flow, gp.Constr]] = {
-            node: {
-                flow: model.addConstr(
-                    gp.quicksum((
-                        edge.net_coefficient_at(node) * flow_status[edge][flow]
-                        for edge in directly_connected_edges[node]
-                    )) == flow.net_rate_at(node) * inject_rate,
-                    name=net_rate_constraint_name(node, flow)
-                )
-                for flow in traffic_pattern
-                if not optimize_empty_flows or flow.rate != 0
+        with instrumentation.phase("net_flow_constraints", "compiling net flow rate constraints", constraint_count=len(self.nodes) * len(flows)):
+            net_flow_rate_at_each_node_constraints: dict[Node, dict[Flow, gp.Constr]] = {
+                node: {
+                    flow: model.addConstr(
+                        gp.LinExpr(
+                            incidence.data[incidence.indptr[node.id]:incidence.indptr[node.id + 1]].tolist(),
+                            [flow_status[self.edges[e]][flow] for e in incidence.indices[incidence.indptr[node.id]:incidence.indptr[node.id + 1]]]
+                        ) == flow.net_rate_at(node) * inject_rate,
+                        name=compile_name(naming, lambda: net_rate_constraint_name(node, flow), "net_rate_constraint", node.id, f)
+                    )
+                    for f, flow in enumerate(flows)
+                }
+                for node in self.nodes
             }
-            for node in self.nodes.values()
-        }
+        enabled_edges, enabled_edges_constraints, conflict_edges_constraints, synchronous_edges_constraints = self.compile_reconfigurable_constraints(model, flow_status, naming)
+        variables = Variables(flow_status, inject_rate, enabled_edges)
+        constraints = Constraints(inject_rate_constraint, edge_capacity_constraints, net_flow_rate_at_each_node_constraints, enabled_edges_constraints, conflict_edges_constraints, synchronous_edges_constraints)
+        return model, variables, constraints
+
+    def compile_matrix(self, traffic_pattern: TrafficPattern, initial_inject_rate=1.0, optimize_empty_flows: bool = True, aggregate: str | None = None, solver: backend.base.Backend | None = None,
+                       naming: str = NamingShort) -> CompiledNetwork:
+        """
+        same model to compile, but every part of the model is emitted in bulk as sparse matrices through a solver backend, gurobi by default
+        the flow variables are laid out edge major, the variable of edge e and flow f is at e * flow_count + f
+        the short names are the name of the block and the position in it, such as flow_rate[e * flow_count + f], the readable names are set afterward one by one
+        the compiled network exposes the model, variables and constraints of the backend, see backend.base.Model.native and backend.base.Model.variable_handles
+        """
+
+        def block_name(name: str) -> str:
+            return "" if naming == NamingNone else name
+
+        with instrumentation.phase("topology", "compiling topology information") as record:
+            model = (solver if solver is not None else backend.gurobi.GurobiBackend()).create_model()
+            incidence = self.incidence_matrix()
+            flows = [flow for flow in aggregate_traffic(traffic_pattern, aggregate) if not optimize_empty_flows or flow.rate != 0]
+            flow_index = {flow: i for i, flow in enumerate(flows)}
+            node_count, edge_count, flow_count = len(self.nodes), len(self.edges), len(flows)
+            record.update(node_count=node_count, edge_count=edge_count, flow_count=flow_count)
+        with instrumentation.phase("flow_variables", "compiling flow rates at every edge", variable_count=edge_count * flow_count):
+            flow_rate_columns = model.add_variables(edge_count * flow_count, lb=0.0, ub=np.inf, name=block_name("flow_rate"))
+            flow_rate_list = model.variable_handles(flow_rate_columns)
+            flow_status: IdMapping = IdMapping(self.edges, [IndexedMapping(flow_index, flow_rate_list[e * flow_count:(e + 1) * flow_count]) for e in range(edge_count)])
+        with instrumentation.phase("inject_rate", "compiling inject rate", variable_count=1):
+            inject_rate_column = model.add_variables(1, lb=0.0, ub=1.0, name=InjectRateName)
+            inject_rate = model.variable_handles(inject_rate_column)[0]
+        with instrumentation.phase("inject_rate_constraint", "compiling inject rate constraint", constraint_count=1):
+            inject_rate_matrix = scipy.sparse.csr_array((np.ones(1), (np.zeros(1, dtype=np.int64), inject_rate_column)), shape=(1, model.column_count))
+            inject_rate_constraint = model.constraint_handles(model.add_constraints(inject_rate_matrix, backend.base.Equal, initial_inject_rate, name=InjectRateConstraintName))[0]
+        with instrumentation.phase("capacity_constraints", "compiling edge capacity constraints", constraint_count=edge_count) as record:
+            capacity_matrix = scipy.sparse.kron(scipy.sparse.identity(edge_count), np.ones((1, flow_count)), format="csr")
+            _, _, capacities = self.edge_arrays()
+            capacity_rows = model.add_constraints(capacity_matrix, backend.base.LessEqual, capacities, name=block_name("capacity_constraint"))
+            edge_capacity_constraint_list = model.constraint_handles(capacity_rows)
+            edge_capacity_constraints: IdMapping = IdMapping(self.edges, edge_capacity_constraint_list)
+            record["nonzero_count"] = capacity_matrix.nnz
+        with instrumentation.phase("net_flow_constraints", "compiling net flow rate constraints", constraint_count=node_count * flow_count) as record:
+            demand_rows, demand_values = [], []
+            for f, flow in enumerate(flows):
+                for node, net_rate in flow.net_rates().items():
+                    demand_rows.append(node.id * flow_count + f)
+                    demand_values.append(-net_rate)
+            demands = scipy.sparse.coo_array((demand_values, (demand_rows, np.zeros(len(demand_rows), dtype=np.int64))), shape=(node_count * flow_count, 1))
+            net_flow_matrix = scipy.sparse.hstack((scipy.sparse.kron(incidence, scipy.sparse.identity(flow_count)), demands), format="csr")
+            net_flow_rows = model.add_constraints(net_flow_matrix, backend.base.Equal, 0.0, name=block_name("net_rate_constraint"))
+            net_flow_rate_constraint_list = model.constraint_handles(net_flow_rows)
+            net_flow_rate_at_each_node_constraints: IdMapping = IdMapping(self.nodes, [IndexedMapping(flow_index, net_flow_rate_constraint_list[n * flow_count:(n + 1) * flow_count]) for n in range(node_count)])
+            record["nonzero_count"] = net_flow_matrix.nnz
+        enabled_edges = None
+        enabled_edges_constraints = None
+        conflict_edges_constraints = None
+        synchronous_edges_constraints = None
+        reconfigurable_names: list[typing.Tuple[np.ndarray, list[str], bool]] = []
+        if len(self.conflict_edges) > 0 or len(self.synchronous_edges) > 0:
+            with instrumentation.phase("reconfigurable_constraints", "compiling reconfigurable constraints", variable_count=edge_count, constraint_count=edge_count):
+                enabled_edge_columns = model.add_variables(edge_count, lb=0.0, ub=1.0, integer=True, name=block_name("enabled"))
+                enabled_edges = IdMapping(self.edges, model.variable_handles(enabled_edge_columns))
+                enabled_rows = model.add_indicator_constraints(enabled_edge_columns, capacity_matrix, capacities, name=block_name("enabled_constraint"))
+                enabled_edges_constraints = IdMapping(self.edges, model.constraint_handles(enabled_rows))
+                reconfigurable_names.append((enabled_edge_columns, [enabled_edges_name(edge) for edge in self.edges], False))
+                reconfigurable_names.append((enabled_rows, [enabled_edges_name(edge) for edge in self.edges], True))
+                if len(self.conflict_edges) > 0:
+                    with instrumentation.phase("conflict_constraints", "compiling conflict edges constraints", constraint_count=len(self.conflict_edges)):
+                        rows, columns = [], []
+                        for i, conflict_edges in enumerate(self.conflict_edges.values()):
+                            for edge in conflict_edges:
+                                rows.append(i)
+                                columns.append(enabled_edge_columns[edge.id])
+                        conflict_matrix = scipy.sparse.csr_array((np.ones(len(rows)), (rows, columns)), shape=(len(self.conflict_edges), model.column_count))
+                        conflict_rows = model.add_constraints(conflict_matrix, backend.base.LessEqual, 1.0, name=block_name("conflict_constraint"))
+                        conflict_edges_constraints = dict(zip(self.conflict_edges.keys(), model.constraint_handles(conflict_rows)))
+                        reconfigurable_names.append((conflict_rows, [conflict_edges_constraint_name(name) for name in self.conflict_edges.keys()], True))
+                if len(self.synchronous_edges) > 0:
+                    with instrumentation.phase("synchronous_constraints", "compiling synchronous edges constraints") as record:
+                        synchronous_edges_constraints = {}
+                        for synchronous_edges_name, synchronous_edges in self.synchronous_edges.items():
+                            columns = [enabled_edge_columns[edge.id] for edge in synchronous_edges]
+                            pairs = np.arange(len(columns) - 1)
+                            synchronous_matrix = scipy.sparse.csr_array((np.concatenate((np.ones(len(pairs)), -np.ones(len(pairs)))), (np.concatenate((pairs, pairs)), np.concatenate((columns[:-1], columns[1:])))), shape=(len(pairs), model.column_count))
+                            synchronous_rows = model.add_constraints(synchronous_matrix, backend.base.Equal, 0.0, name=block_name("synchronous_constraint"))
+                            synchronous_edges_constraints[synchronous_edges_name] = model.constraint_handles(synchronous_rows)
+                            reconfigurable_names.append((synchronous_rows, [synchronous_edges_constraint_name(synchronous_edges_name)] * len(synchronous_rows), True))
+                        record["constraint_count"] = sum(len(rows) for rows in synchronous_edges_constraints.values())
+        if naming == NamingReadable:
+            with instrumentation.phase("names", "naming variables and constraints"):
+                model.set_variable_names(flow_rate_columns, [flow_status_name(edge, flow) for edge in self.edges for flow in flows])
+                model.set_constraint_names(capacity_rows, [capacity_constraint_name(edge) for edge in self.edges])
+                model.set_constraint_names(net_flow_rows, [net_rate_constraint_name(node, flow) for node in self.nodes for flow in flows])
+                for indices, names, constraint in reconfigurable_names:
+                    (model.set_constraint_names if constraint else model.set_variable_names)(indices, names)
+        variables = Variables(flow_status, inject_rate, enabled_edges)
+        constraints = Constraints(inject_rate_constraint, edge_capacity_constraints, net_flow_rate_at_each_node_constraints, enabled_edges_constraints, conflict_edges_constraints, synchronous_edges_constraints)
+        return model.native(), variables, constraints
+
+    def compile_reconfigurable_constraints(self, model: gp.Model, flow_status: typing.Mapping[Edge, typing.Mapping[Any, gp.Var]], naming: str = NamingReadable) -> typing.Tuple[dict[Edge, gp.Var] | None, dict[Edge, gp.Constr] | None, dict[str, gp.Constr] | None, dict[str, gp.Constr] | None]:
         enabled_edges: dict[Edge, gp.Var] | None = None
         enabled_edges_constraints: dict[Edge, gp.Constr] | None = None
         conflict_edges_constraints: dict[set[Edge], gp.Constr] | None = None
         synchronous_edges_constraints: dict[set[Edge], gp.Var] | None = None
         if len(self.conflict_edges) > 0 or len(self.synchronous_edges) > 0:
-            print("compiling reconfigurable constraints")
-            enabled_edges: dict[Edge, gp.Var] = {
-                edge: model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=gp.GRB.BINARY, name=enabled_edges_name(edge), column=None)
-                for edge in self.edges.values()
-            }
-            enabled_edges_constraints: dict[Edge, gp.Constr] = {
-                edge: model.addConstr(
-                    (enabled == 0) >>
-                    (gp.quicksum(flow_status[edge].values()) == 0),
-                    name=enabled_edges_name(edge))
-                for edge, enabled in enabled_edges.items()
-            }
-            if len(self.conflict_edges) > 0:
-                print("compiling conflict edges constraints")
-                conflict_edges_constraints: dict[str, gp.Constr] = {
-                    conflict_edges_name: model.addConstr(
-                        gp.quicksum((
-                            enabled_edges[edge]
-                            for edge in conflict_edges
-                        )) <= 1, name=conflict_edges_constraint_name(conflict_edges_name))
-                    for conflict_edges_name, conflict_edges in self.conflict_edges.items()
+            with instrumentation.phase("reconfigurable_constraints", "compiling reconfigurable constraints", variable_count=len(self.edges), constraint_count=len(self.edges)):
+                enabled_edges: dict[Edge, gp.Var] = {
+                    edge: model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=gp.GRB.BINARY, name=compile_name(naming, lambda: enabled_edges_name(edge), "enabled", edge.id), column=None)
+                    for edge in self.edges
                 }
-            if len(self.synchronous_edges) > 0:
-                print("compiling synchronous edges constraints")
-                synchronous_edges_constraints: dict[str, gp.Constr] = {
-                    synchronous_edges_name: model.addConstr(
-                        gp.or_(
-                            gp.quicksum((
-                                enabled_edges[edge]
-                                for edge in synchronous_edges
-                            )) == 0,
-                            gp.quicksum((
-                                enabled_edges[edge]
-                                for edge in synchronous_edges
-                            )) == len(synchronous_edges)
-                        ),
-                        name=synchronous_edges_constraint_name(synchronous_edges_name))
-                    for synchronous_edges_name, synchronous_edges in self.synchronous_edges.items()
+                enabled_edges_constraints: dict[Edge, gp.Constr] = {
+                    edge: model.addConstr(
+                        (enabled == 0) >>
+                        (gp.quicksum(flow_status[edge].values()) == 0),
+                        name=compile_name(naming, lambda: enabled_edges_name(edge), "enabled_constraint", edge.id))
+                    for edge, enabled in enabled_edges.items()
                 }
-        variables = Variables(flow_status, inject_rate, enabled_edges)
-        constraints = Constraints(inject_rate_constraint, edge_capacity_constraints, net_flow_rate_at_each_node_constraints, enabled_edges_constraints, conflict_edges_constraints, synchronous_edges_constraints)
-        return model, variables, constraints
+                if len(self.conflict_edges) > 0:
+                    with instrumentation.phase("conflict_constraints", "compiling conflict edges constraints", constraint_count=len(self.conflict_edges)):
+                        conflict_edges_constraints: dict[str, gp.Constr] = {
+                            conflict_edges_name: model.addConstr(
+                                gp.quicksum((
+                                    enabled_edges[edge]
+                                    for edge in conflict_edges
+                                )) <= 1, name=compile_name(naming, lambda: conflict_edges_constraint_name(conflict_edges_name), "conflict_constraint", i))
+                            for i, (conflict_edges_name, conflict_edges) in enumerate(self.conflict_edges.items())
+                        }
+                if len(self.synchronous_edges) > 0:
+                    with instrumentation.phase("synchronous_constraints", "compiling synchronous edges constraints", constraint_count=len(self.synchronous_edges)):
+                        synchronous_edges_constraints: dict[str, gp.Constr] = {
+                            synchronous_edges_name: model.addConstr(
+                                gp.or_(
+                                    gp.quicksum((
+                                        enabled_edges[edge]
+                                        for edge in synchronous_edges
+                                    )) == 0,
+                                    gp.quicksum((
+                                        enabled_edges[edge]
+                                        for edge in synchronous_edges
+                                    )) == len(synchronous_edges)
+                                ),
+                                name=compile_name(naming, lambda: synchronous_edges_constraint_name(synchronous_edges_name), "synchronous_constraint", i))
+                            for i, (synchronous_edges_name, synchronous_edges) in enumerate(self.synchronous_edges.items())
+                        }
+        return enabled_edges, enabled_edges_constraints, conflict_edges_constraints, synchronous_edges_constraints
+
+
+def compile_name(naming: str, readable: typing.Callable[[], str], kind: str, *ids: int) -> str:
+    """
+    the name of a variable or constraint in the naming mode, the readable name is only formatted when asked for, an empty name leaves it unnamed
+    """
+    if naming == NamingReadable:
+        return readable()
+    if naming == NamingShort:
+        return f"{kind}[{','.join(map(str, ids))}]"
+    return ""
 
 
 def flow_status_name(edge: Edge, flow: Flow) -> str:
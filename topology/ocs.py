@@ -0,0 +1,137 @@
+import typing
+
+import numpy as np
+
+import topology.bounds
+import topology.dragonfly
+import topology.network
+
+MaxSwapRoundCount = 100
+
+
+def group_demands(traffic_pattern: topology.network.TrafficPattern, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    :return: the traffic from every group to every other group at inject rate 1, the traffic within a group is left out
+    """
+    sources, destinations, rates = topology.network.traffic_arrays(traffic_pattern)
+    source_groups, destination_groups = groups[sources], groups[destinations]
+    crossing = source_groups != destination_groups
+    return np.bincount(source_groups[crossing] * group_count + destination_groups[crossing], weights=rates[crossing], minlength=group_count * group_count).reshape(group_count, group_count)
+
+
+def static_group_capacities(network: topology.network.Network, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    :return: the capacity of the edges always enabled from every group to every other group
+    """
+    starts, ends, capacities = network.edge_arrays()
+    crossing = (groups[starts] != groups[ends]) & ~topology.bounds.reconfigurable_edges(network)
+    return np.bincount(groups[starts][crossing] * group_count + groups[ends][crossing], weights=capacities[crossing], minlength=group_count * group_count).reshape(group_count, group_count)
+
+
+def covered_demand(demands: np.ndarray, capacities: np.ndarray) -> float:
+    """
+    the score of a configuration, the group to group traffic that the direct links can carry
+    """
+    return float(np.minimum(demands, capacities).sum())
+
+
+def greedy_matching(demands: np.ndarray, capacities: np.ndarray, link_capacity: float) -> np.ndarray:
+    """
+    match every group to a target group for one layer, taking the pairs by the demand a new link would cover, then by the demand, in decreasing order
+    every group sends and receives at most one link of the layer, same to a physical circuit switch
+    :return: the target group of every group, -1 when no target is left
+    """
+    group_count = len(demands)
+    gains = np.minimum(np.maximum(demands - capacities, 0.0), link_capacity)
+    order = np.lexsort((-demands.ravel(), -gains.ravel()))
+    targets = np.full(group_count, -1)
+    sending = np.zeros(group_count, dtype=bool)
+    receiving = np.zeros(group_count, dtype=bool)
+    for source, target in zip(*np.divmod(order, group_count)):
+        if source == target or sending[source] or receiving[target]:
+            continue
+        targets[source] = target
+        sending[source] = receiving[target] = True
+    return targets
+
+
+def improve_by_swaps(demands: np.ndarray, capacities: np.ndarray, targets: np.ndarray, link_capacity: float) -> np.ndarray:
+    """
+    exchange the targets of two groups of a layer while it increases the covered demand, the capacities include the links of the layer and are updated in place
+    :return: the improved targets
+    """
+    targets = targets.copy()
+    groups = np.arange(len(targets))
+
+    def covered(rows: np.ndarray, columns: np.ndarray, change: float) -> np.ndarray:
+        return np.minimum(demands[rows, columns], capacities[rows, columns] + change) - np.minimum(demands[rows, columns], capacities[rows, columns])
+
+    for _ in range(MaxSwapRoundCount):
+        improved = False
+        for first in range(len(targets)):
+            first_target = targets[first]
+            if first_target < 0:
+                continue
+            others = groups[(targets >= 0) & (groups != first_target) & (targets != first)]
+            others = others[others != first]
+            if len(others) == 0:
+                continue
+            other_targets = targets[others]
+            firsts = np.full(len(others), first)
+            first_targets = np.full(len(others), first_target)
+            gains = covered(firsts, other_targets, link_capacity) + covered(others, first_targets, link_capacity) + \
+                covered(firsts, first_targets, -link_capacity) + covered(others, other_targets, -link_capacity)
+            best = int(np.argmax(gains))
+            if gains[best] <= 1e-12 * max(1.0, float(demands.max())):
+                continue
+            second, second_target = others[best], other_targets[best]
+            capacities[first, first_target] -= link_capacity
+            capacities[second, second_target] -= link_capacity
+            capacities[first, second_target] += link_capacity
+            capacities[second, first_target] += link_capacity
+            targets[first], targets[second] = second_target, first_target
+            improved = True
+        if not improved:
+            break
+    return targets
+
+
+def ocs_targets(demands: np.ndarray, capacities: np.ndarray, layer_count: int, link_capacity: float) -> np.ndarray:
+    """
+    configure the layers one after another, every layer by a greedy matching on the demand not yet covered then improved by swaps
+    :return: the target group of every group on every layer, -1 when none
+    """
+    capacities = capacities.astype(np.float64, copy=True)
+    targets = np.full((layer_count, len(demands)), -1)
+    for layer in range(layer_count):
+        matching = greedy_matching(demands, capacities, link_capacity)
+        matched = np.flatnonzero(matching >= 0)
+        capacities[matched, matching[matched]] += link_capacity
+        targets[layer] = improve_by_swaps(demands, capacities, matching, link_capacity)
+    return targets
+
+
+def dragonfly_ocs_configuration(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, group_count: int, p: int, a: int, ocs_layer_count: int,
+                                link_capacity: float) -> np.ndarray | None:
+    """
+    a configuration of the ocs links of a dragonfly built by topology.dragonfly.dragonfly, every ocs port of a group on a layer links to the target group chosen by ocs_targets
+    :return: whether every edge is enabled, indexed by edge id, the edges outside the conflict sets are always enabled, or None when the network has no conflict sets
+    """
+    if len(network.conflict_edges) == 0:
+        return None
+    groups = topology.dragonfly.node_groups(group_count, p, a)
+    demands = group_demands(traffic_pattern, groups, group_count)
+    targets = ocs_targets(demands, static_group_capacities(network, groups, group_count), ocs_layer_count, link_capacity)
+    enabled = ~topology.bounds.reconfigurable_edges(network)
+    for layer in range(ocs_layer_count):
+        for group in range(group_count):
+            edges = network.conflict_edges.get(topology.dragonfly.conflict_links_name(layer, group), ())
+            enabled[[edge.id for edge in edges if groups[edge.end.id] == targets[layer, group]]] = True
+    return enabled.astype(np.float64)
+
+
+def enabled_edge_values(enabled_edges: typing.Mapping[topology.network.Edge, typing.Any], configuration: np.ndarray) -> typing.Tuple[list[typing.Any], list[float]]:
+    """
+    :return: the enabled edge variables of a compiled network and their values in the configuration
+    """
+    return list(enabled_edges.values()), [float(configuration[edge.id]) for edge in enabled_edges.keys()]
@@ -0,0 +1,287 @@
+import math
+import typing
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+import backend.gurobi
+import instrumentation
+import topology.bounds
+import topology.network
+
+Path = typing.Tuple[int, typing.Tuple[int, ...]]
+ReducedCostTolerance = 1e-9
+ArtificialTolerance = 1e-7
+
+
+def terminal_attachments(network: topology.network.Network) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    find the terminals, the nodes with a single outgoing and a single incoming edge both to the same non-terminal node, such as the endpoints under a tor switch
+    the route of a flow through a terminal is forced, so only the switches it hangs on take part in the routing
+    :return: whether every node is a terminal, and the node every node is attached to, itself for a non-terminal
+    """
+    starts, ends, _ = network.edge_arrays()
+    node_count = network.node_count()
+    nodes = np.arange(node_count)
+    out_neighbors = np.full(node_count, -1)
+    out_neighbors[starts] = ends
+    in_neighbors = np.full(node_count, -1)
+    in_neighbors[ends] = starts
+    candidates = (np.bincount(starts, minlength=node_count) == 1) & (np.bincount(ends, minlength=node_count) == 1) & (out_neighbors == in_neighbors) & (out_neighbors != nodes)
+    terminals = candidates & ~candidates[np.maximum(out_neighbors, 0)]
+    return terminals, np.where(terminals, out_neighbors, nodes)
+
+
+class PathModel:
+    """
+    path based formulation of the same model as Network.compile, every commodity is the traffic between a pair of switches and is routed over a set of paths
+    the tor hops of the terminals are forced and enter the model as constant loads proportional to the inject rate
+    the paths start from the minimal path and valiant paths through random intermediate switches
+    more paths are generated by pricing with the duals of the capacity and demand constraints until no path has a negative reduced cost, which makes the linear model exact
+    a rate that the current paths cannot route is detected by a phase one over artificial demand slacks
+    the reconfigurable edges are routed over as configured, such as by topology.ocs.dragonfly_ocs_configuration, so the model is the arc model with the configuration fixed,
+    choosing the configuration is left to topology.benders.BendersModel, since pricing only the linear relaxation does not solve the mixed integer model exactly
+    """
+
+    def __init__(self, network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, initial_inject_rate: float = 1.0, valiant_path_count: int = 1, random_seed: int = 0,
+                 max_round_count: int = 1000, env: gp.Env | None = None, configuration: np.ndarray | None = None) -> None:
+        """
+        :param configuration: whether every edge is enabled, indexed by edge id, required when the network has reconfigurable edges
+        """
+        self.network = network
+        self.max_round_count = max_round_count
+        starts, ends, capacities = network.edge_arrays()
+        sources, destinations, rates = topology.network.traffic_arrays(traffic_pattern)
+        self.total_traffic = float(rates.sum())
+        routed = (rates != 0) & (sources != destinations)
+        sources, destinations, rates = sources[routed], destinations[routed], rates[routed]
+
+        with instrumentation.phase("terminal_loads", "compiling terminal loads"):
+            terminals, attachments = terminal_attachments(network)
+            self.terminals = terminals
+            edge_count = network.edge_count()
+            terminal_edges = terminals[starts] | terminals[ends]
+            uplinks = np.full(network.node_count(), -1)
+            uplinks[starts[terminal_edges & terminals[starts]]] = np.flatnonzero(terminal_edges & terminals[starts])
+            downlinks = np.full(network.node_count(), -1)
+            downlinks[ends[terminal_edges & terminals[ends]]] = np.flatnonzero(terminal_edges & terminals[ends])
+            self.fixed_loads = np.bincount(uplinks[sources[terminals[sources]]], weights=rates[terminals[sources]], minlength=edge_count) + \
+                np.bincount(downlinks[destinations[terminals[destinations]]], weights=rates[terminals[destinations]], minlength=edge_count)
+            self.fixed_cost = float(np.dot(terminals[sources].astype(np.float64) + terminals[destinations], rates))
+
+        with instrumentation.phase("commodities", "compiling commodities"):
+            pairs, inverse = np.unique(attachments[sources] * network.node_count() + attachments[destinations], return_inverse=True)
+            demands = np.bincount(inverse, weights=rates, minlength=len(pairs))
+            commodity_sources, commodity_destinations = np.divmod(pairs, network.node_count())
+            switched = commodity_sources != commodity_destinations
+            self.commodity_sources, self.commodity_destinations, self.demands = commodity_sources[switched], commodity_destinations[switched], demands[switched]
+
+        with instrumentation.phase("core_graph", "compiling core graph"):
+            usable = ~terminal_edges
+            reconfigurable = topology.bounds.reconfigurable_edges(network)
+            if np.any(reconfigurable):
+                if configuration is None:
+                    raise ValueError("the reconfigurable edges must be configured, such as by topology.ocs.dragonfly_ocs_configuration")
+                usable &= ~reconfigurable | (np.asarray(configuration) > 0.5)
+            self.core_edges = np.flatnonzero(usable)
+            self.core_nodes = np.flatnonzero(~terminals)
+            self.core_node_index = np.full(network.node_count(), -1)
+            self.core_node_index[self.core_nodes] = np.arange(len(self.core_nodes))
+            self.core_starts = self.core_node_index[starts[self.core_edges]]
+            self.core_ends = self.core_node_index[ends[self.core_edges]]
+            core_rows = np.full(edge_count, -1)
+            core_rows[self.core_edges] = np.arange(len(self.core_edges))
+
+        with instrumentation.phase("model", "compiling model"):
+            self.model = gp.Model(env=env) if env is not None else gp.Model()
+            self.inject_rate = self.model.addVar(lb=0.0, ub=1.0, name=topology.network.InjectRateName)
+            self.inject_rate_constraint = self.model.addConstr(self.inject_rate == initial_inject_rate, name=topology.network.InjectRateConstraintName)
+            self.artificials = self.model.addMVar(len(self.demands), lb=0.0, ub=0.0, name="artificial").tolist()
+            loaded = np.flatnonzero(terminal_edges & (self.fixed_loads > 0))
+            if len(loaded) > 0:
+                self.model.addMConstr(scipy.sparse.csr_matrix(self.fixed_loads[loaded][:, np.newaxis]), [self.inject_rate], gp.GRB.LESS_EQUAL, capacities[loaded], name="terminal_capacity_constraint")
+            capacity_matrix = scipy.sparse.csr_matrix((len(self.core_edges), 1))
+            self.capacity_constraints = self.model.addMConstr(capacity_matrix, [self.inject_rate], gp.GRB.LESS_EQUAL, capacities[self.core_edges], name="capacity_constraint").tolist()
+            demand_matrix = scipy.sparse.hstack((scipy.sparse.csr_matrix(-self.demands[:, np.newaxis]), scipy.sparse.identity(len(self.demands))), format="csr")
+            self.demand_constraints = self.model.addMConstr(demand_matrix, [self.inject_rate] + self.artificials, gp.GRB.EQUAL, np.zeros(len(self.demands)), name="demand_constraint").tolist()
+            self.core_rows = core_rows
+            self.phase = 2
+            self.paths: list[Path] = []
+            self.path_variables: list[gp.Var] = []
+            self.path_index: set[Path] = set()
+            self.set_phase(2)
+
+        with instrumentation.phase("candidate_paths", "compiling candidate paths") as record:
+            hop_weights = np.ones(len(self.core_edges))
+            self.add_paths(self.shortest_paths(hop_weights, np.arange(len(self.demands))))
+            self.add_paths(self.valiant_paths(hop_weights, valiant_path_count, np.random.default_rng(random_seed)))
+            record.update(path_count=len(self.paths), commodity_count=len(self.demands))
+        print(f"compiled {len(self.paths)} paths for {len(self.demands)} commodities")
+
+    def core_graph(self, weights: np.ndarray) -> typing.Tuple[scipy.sparse.csr_array, dict[typing.Tuple[int, int], int]]:
+        """
+        the graph of the core nodes weighted by the lightest of the parallel edges, and the core edge row chosen for every pair of nodes
+        """
+        usable = np.isfinite(weights)
+        rows = np.flatnonzero(usable)
+        order = rows[np.lexsort((weights[rows], self.core_ends[rows], self.core_starts[rows]))]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (self.core_starts[order][1:] != self.core_starts[order][:-1]) | (self.core_ends[order][1:] != self.core_ends[order][:-1])
+        chosen = order[first]
+        graph = scipy.sparse.csr_array((weights[chosen], (self.core_starts[chosen], self.core_ends[chosen])), shape=(len(self.core_nodes), len(self.core_nodes)))
+        return graph, dict(zip(zip(self.core_starts[chosen].tolist(), self.core_ends[chosen].tolist()), chosen.tolist()))
+
+    @staticmethod
+    def trace(predecessors: np.ndarray, source: int, destination: int, edges: dict[typing.Tuple[int, int], int]) -> typing.List[int] | None:
+        path = []
+        node = destination
+        while node != source:
+            previous = predecessors[node]
+            if previous < 0:
+                return None
+            path.append(edges[(int(previous), int(node))])
+            node = previous
+        path.reverse()
+        return path
+
+    def shortest_paths(self, weights: np.ndarray, commodities: np.ndarray) -> typing.List[Path]:
+        graph, edges = self.core_graph(weights)
+        sources = self.core_node_index[self.commodity_sources[commodities]]
+        destinations = self.core_node_index[self.commodity_destinations[commodities]]
+        unique_sources, positions = np.unique(sources, return_inverse=True)
+        _, predecessors = scipy.sparse.csgraph.dijkstra(graph, directed=True, indices=unique_sources, return_predecessors=True)
+        paths = []
+        for commodity, position, source, destination in zip(commodities.tolist(), positions.tolist(), sources.tolist(), destinations.tolist()):
+            path = self.trace(predecessors[position], source, destination, edges)
+            if path is not None:
+                paths.append((commodity, tuple(path)))
+        return paths
+
+    def valiant_paths(self, weights: np.ndarray, count: int, random_generator: np.random.Generator) -> typing.List[Path]:
+        """
+        non minimal paths, the minimal path to a random intermediate switch then the minimal path to the destination, the paths visiting a node twice are dropped
+        """
+        if count <= 0 or len(self.demands) == 0:
+            return []
+        graph, edges = self.core_graph(weights)
+        _, predecessors = scipy.sparse.csgraph.shortest_path(graph, directed=True, unweighted=True, return_predecessors=True)
+        sources = self.core_node_index[self.commodity_sources].tolist()
+        destinations = self.core_node_index[self.commodity_destinations].tolist()
+        intermediates = random_generator.integers(len(self.core_nodes), size=(len(self.demands), count)).tolist()
+        paths = []
+        for commodity, (source, destination) in enumerate(zip(sources, destinations)):
+            for intermediate in intermediates[commodity]:
+                if intermediate == source or intermediate == destination:
+                    continue
+                first = self.trace(predecessors[source], source, intermediate, edges)
+                second = self.trace(predecessors[intermediate], intermediate, destination, edges)
+                if first is None or second is None:
+                    continue
+                path = first + second
+                visited = self.core_starts[path]
+                if len(np.unique(visited)) == len(visited) and destination not in visited:
+                    paths.append((commodity, tuple(path)))
+        return paths
+
+    def path_cost(self, path: Path) -> float:
+        return len(path[1]) / self.total_traffic if self.phase == 2 else 0.0
+
+    def add_paths(self, paths: typing.Iterable[Path]) -> int:
+        count = 0
+        for path in paths:
+            if path in self.path_index:
+                continue
+            commodity, rows = path
+            column = gp.Column([1.0] * (len(rows) + 1), [self.capacity_constraints[row] for row in rows] + [self.demand_constraints[commodity]])
+            self.path_variables.append(self.model.addVar(lb=0.0, obj=self.path_cost(path), column=column))
+            self.paths.append(path)
+            self.path_index.add(path)
+            count += 1
+        return count
+
+    def set_phase(self, phase: int) -> None:
+        """
+        phase one minimizes the artificial demand slacks to find routable paths, phase two minimizes the hop count with the slacks fixed to zero
+        """
+        self.phase = phase
+        self.model.setAttr(gp.GRB.Attr.Obj, self.path_variables, [self.path_cost(path) for path in self.paths])
+        self.inject_rate.setAttr(gp.GRB.Attr.Obj, self.fixed_cost / self.total_traffic if phase == 2 else 0.0)
+        self.model.setAttr(gp.GRB.Attr.Obj, self.artificials, [0.0 if phase == 2 else 1.0] * len(self.artificials))
+        self.model.setAttr(gp.GRB.Attr.UB, self.artificials, [0.0 if phase == 2 else gp.GRB.INFINITY] * len(self.artificials))
+
+    def price(self) -> int:
+        """
+        add the shortest path of every commodity under the dual weights when its reduced cost is negative
+        the reduced cost of a path is its cost minus the duals of the capacity constraints on its edges minus the dual of the demand constraint of its commodity
+        """
+        capacity_duals = np.asarray(self.model.getAttr(gp.GRB.Attr.Pi, self.capacity_constraints))
+        demand_duals = np.asarray(self.model.getAttr(gp.GRB.Attr.Pi, self.demand_constraints))
+        hop_cost = 1.0 / self.total_traffic if self.phase == 2 else 0.0
+        weights = np.maximum(hop_cost - capacity_duals, 0.0)
+        graph, edges = self.core_graph(weights)
+        sources = self.core_node_index[self.commodity_sources]
+        destinations = self.core_node_index[self.commodity_destinations]
+        unique_sources, positions = np.unique(sources, return_inverse=True)
+        distances, predecessors = scipy.sparse.csgraph.dijkstra(graph, directed=True, indices=unique_sources, return_predecessors=True)
+        reduced_costs = distances[positions, destinations] - demand_duals
+        candidates = np.flatnonzero(reduced_costs < -ReducedCostTolerance * np.maximum(1.0, np.abs(demand_duals)))
+        paths = []
+        for commodity in candidates.tolist():
+            path = self.trace(predecessors[positions[commodity]], sources[commodity], destinations[commodity], edges)
+            if path is not None:
+                paths.append((commodity, tuple(path)))
+        return self.add_paths(paths)
+
+    def generate_columns(self) -> int:
+        """
+        solve and price until no path with a negative reduced cost remains
+        :return: the status of the last solve
+        """
+        for _ in range(self.max_round_count):
+            self.model.optimize()
+            status = self.model.getAttr(gp.GRB.Attr.Status)
+            if status != gp.GRB.OPTIMAL:
+                return status
+            added = self.price()
+            instrumentation.event("column_generation_round", phase=self.phase, added_path_count=added, solver_time=self.model.getAttr(gp.GRB.Attr.Runtime))
+            if added == 0:
+                return status
+        return gp.GRB.ITERATION_LIMIT
+
+    def solve_relaxation(self, rate: float) -> int:
+        self.set_phase(2)
+        status = self.generate_columns()
+        if status == gp.GRB.OPTIMAL:
+            return status
+        self.set_phase(1)
+        status = self.generate_columns()
+        if status != gp.GRB.OPTIMAL:
+            return status
+        if self.model.getAttr(gp.GRB.Attr.ObjVal) > ArtificialTolerance * max(1.0, float(self.demands.sum()) * rate):
+            self.set_phase(2)
+            return gp.GRB.INFEASIBLE
+        self.set_phase(2)
+        return self.generate_columns()
+
+    def step(self, rate: float) -> typing.Tuple[str, float]:
+        with instrumentation.phase("solve", f"solving start: injection rate: {rate}", rate=rate) as record:
+            self.inject_rate_constraint.setAttr(gp.GRB.Attr.RHS, rate)
+            status = self.solve_relaxation(rate)
+            objective = self.model.getAttr(gp.GRB.Attr.ObjVal) / rate if status == gp.GRB.OPTIMAL else math.inf
+            record.update(status=backend.gurobi.Status[status], objective=objective if math.isfinite(objective) else None, path_count=len(self.paths))
+        print(f"solving end: injection rate: {rate}, status: {backend.gurobi.Status[status]}, objective:{objective}, paths: {len(self.paths)}")
+        print()
+        return backend.gurobi.Status[status], objective
+
+    def edge_loads(self) -> np.ndarray:
+        """
+        :return: the load of every edge in the last solution, indexed by edge id
+        """
+        loads = self.fixed_loads * self.inject_rate.getAttr(gp.GRB.Attr.X)
+        values = self.model.getAttr(gp.GRB.Attr.X, self.path_variables)
+        for (_, rows), value in zip(self.paths, values):
+            if value != 0:
+                loads[self.core_edges[list(rows)]] += value
+        return loads
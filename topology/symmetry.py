@@ -0,0 +1,160 @@
+import numpy as np
+import scipy.sparse
+
+import backend.base
+import backend.gurobi
+import instrumentation
+import topology.network
+
+InvarianceTolerance = 1e-9
+
+
+class Symmetry:
+    """
+    an automorphism of a network and its traffic, given by the image of every node and every edge, whose powers act freely on the nodes
+    the orbits of the edges under the powers of the automorphism, and the representative flows, one flow per orbit of the flows, are derived from the permutations
+    """
+
+    def __init__(self, node_permutation: np.ndarray, edge_permutation: np.ndarray, order: int) -> None:
+        self.node_permutation = node_permutation
+        self.edge_permutation = edge_permutation
+        self.order = order
+        self.edge_orbits = np.full(len(edge_permutation), -1)
+        orbit_count = 0
+        for edge in range(len(edge_permutation)):
+            if self.edge_orbits[edge] >= 0:
+                continue
+            while self.edge_orbits[edge] < 0:
+                self.edge_orbits[edge] = orbit_count
+                edge = edge_permutation[edge]
+            orbit_count += 1
+        self.orbit_count = orbit_count
+
+    def expand_edge_loads(self, loads: np.ndarray) -> np.ndarray:
+        """
+        expand the loads of a quotient solution, the loads of the representative flows at every edge, into the loads of all the flows at every edge
+        the load of all the flows at an edge is the load of the representative flows summed over the orbit of the edge
+        """
+        return np.bincount(self.edge_orbits, weights=loads, minlength=self.orbit_count)[self.edge_orbits]
+
+
+def dragonfly_group_rotation(network: topology.network.Network, group_count: int, p: int, a: int) -> np.ndarray:
+    """
+    the node permutation moving every switch and endpoint to the same position in the next group, for the node layout of topology.dragonfly.dragonfly
+    """
+    switch_count = group_count * a
+    switches = np.arange(switch_count)
+    endpoints = np.arange(switch_count * p)
+    permutation = np.concatenate(((switches + a) % switch_count, switch_count + (endpoints + a * p) % (switch_count * p)))
+    if len(permutation) != network.node_count():
+        raise ValueError("the network is not a dragonfly of the given parameters")
+    return permutation
+
+
+def permute_edges(network: topology.network.Network, node_permutation: np.ndarray) -> np.ndarray | None:
+    """
+    :return: the image of every edge under the node permutation, or None if the edges are not mapped onto edges of the same capacity, parallel edges of the same capacity are interchangeable
+    """
+    starts, ends, capacities = network.edge_arrays()
+    order = np.lexsort((capacities, ends, starts))
+    image_starts, image_ends = node_permutation[starts], node_permutation[ends]
+    image_order = np.lexsort((capacities, image_ends, image_starts))
+    if not (np.array_equal(starts[order], image_starts[image_order]) and np.array_equal(ends[order], image_ends[image_order]) and np.array_equal(capacities[order], capacities[image_order])):
+        return None
+    permutation = np.empty(len(starts), dtype=np.int64)
+    permutation[image_order] = order
+    return permutation
+
+
+def is_invariant(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, node_permutation: np.ndarray) -> bool:
+    sources, destinations, rates = topology.network.traffic_arrays(traffic_pattern)
+    shape = (network.node_count(), network.node_count())
+    traffic = scipy.sparse.csr_array((rates, (sources, destinations)), shape=shape)
+    image = scipy.sparse.csr_array((rates, (node_permutation[sources], node_permutation[destinations])), shape=shape)
+    difference = abs(traffic - image)
+    return difference.nnz == 0 or difference.max() <= InvarianceTolerance * max(1.0, abs(traffic).max())
+
+
+def detect_dragonfly_symmetry(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, group_count: int, p: int, a: int) -> Symmetry | None:
+    """
+    check whether the traffic and the network are invariant under rotating the group ids, the reconfigurable edges are not supported
+    :return: the rotation symmetry, or None if there is no such symmetry
+    """
+    if group_count <= 1 or len(network.conflict_edges) > 0 or len(network.synchronous_edges) > 0:
+        return None
+    node_permutation = dragonfly_group_rotation(network, group_count, p, a)
+    edge_permutation = permute_edges(network, node_permutation)
+    if edge_permutation is None or not is_invariant(network, traffic_pattern, node_permutation):
+        return None
+    return Symmetry(node_permutation, edge_permutation, group_count)
+
+
+def representative_flows(traffic_pattern: topology.network.TrafficPattern, symmetry: Symmetry, aggregate: str | None) -> list[topology.network.Flow | topology.network.Commodity]:
+    """
+    the flows anchored at a node of the first group, the source, or the destination when aggregated by destination, every orbit of the flows has exactly one of them
+    the nodes of the first group are taken as the node with the smallest id of every orbit
+    """
+    first_nodes = orbit_minimums(symmetry.node_permutation) == np.arange(len(symmetry.node_permutation))
+    anchor = (lambda flow: flow.end) if aggregate == topology.network.AggregateByDestination else (lambda flow: flow.start)
+    flows = [flow for flow in traffic_pattern if first_nodes[anchor(flow).id]]
+    return list(topology.network.aggregate_traffic(flows, aggregate))
+
+
+def orbit_minimums(permutation: np.ndarray) -> np.ndarray:
+    minimums = np.arange(len(permutation))
+    image = permutation.copy()
+    while True:
+        updated = np.minimum(minimums, image)
+        if np.array_equal(updated, minimums):
+            return minimums
+        minimums = updated
+        image = permutation[image]
+
+
+def compile_quotient(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, symmetry: Symmetry, initial_inject_rate=1.0, optimize_empty_flows: bool = True,
+                     aggregate: str | None = None, solver: backend.base.Backend | None = None) -> topology.network.CompiledNetwork:
+    """
+    compile the model of the symmetric solutions, which contains an optimal solution of the full linear model since the average of the images of an optimal solution is optimal
+    only the representative flows are routed, and the capacity of an edge is shared by the representative flows summed over the orbit of the edge
+    the flow status and net flow rate constraints cover the representative flows, the edge capacity constraints are indexed by edge orbit
+    the objective of the full model is symmetry.order times the objective over the representative flows
+    """
+    with instrumentation.phase("topology", "compiling topology information") as record:
+        model = (solver if solver is not None else backend.gurobi.GurobiBackend()).create_model()
+        incidence = network.incidence_matrix()
+        flows = [flow for flow in representative_flows(traffic_pattern, symmetry, aggregate) if not optimize_empty_flows or flow.rate != 0]
+        flow_index = {flow: i for i, flow in enumerate(flows)}
+        node_count, edge_count, flow_count = network.node_count(), network.edge_count(), len(flows)
+        record.update(node_count=node_count, edge_count=edge_count, flow_count=flow_count, orbit_count=symmetry.orbit_count)
+    with instrumentation.phase("flow_variables", f"compiling flow rates at every edge for {flow_count} representative flows", variable_count=edge_count * flow_count):
+        flow_rate_list = model.variable_handles(model.add_variables(edge_count * flow_count, lb=0.0, ub=np.inf, name="flow_rate"))
+        flow_status = topology.network.IdMapping(network.edges, [topology.network.IndexedMapping(flow_index, flow_rate_list[e * flow_count:(e + 1) * flow_count]) for e in range(edge_count)])
+    with instrumentation.phase("inject_rate", "compiling inject rate", variable_count=1):
+        inject_rate_column = model.add_variables(1, lb=0.0, ub=1.0, name=topology.network.InjectRateName)
+        inject_rate = model.variable_handles(inject_rate_column)[0]
+    with instrumentation.phase("inject_rate_constraint", "compiling inject rate constraint", constraint_count=1):
+        inject_rate_matrix = scipy.sparse.csr_array((np.ones(1), (np.zeros(1, dtype=np.int64), inject_rate_column)), shape=(1, model.column_count))
+        inject_rate_constraint = model.constraint_handles(model.add_constraints(inject_rate_matrix, backend.base.Equal, initial_inject_rate, name=topology.network.InjectRateConstraintName))[0]
+    with instrumentation.phase("capacity_constraints", "compiling edge orbit capacity constraints", constraint_count=symmetry.orbit_count) as record:
+        orbit_matrix = scipy.sparse.csr_array((np.ones(edge_count), (symmetry.edge_orbits, np.arange(edge_count))), shape=(symmetry.orbit_count, edge_count))
+        capacity_matrix = scipy.sparse.kron(orbit_matrix, np.ones((1, flow_count)), format="csr")
+        _, _, capacities = network.edge_arrays()
+        orbit_capacities = np.zeros(symmetry.orbit_count)
+        orbit_capacities[symmetry.edge_orbits] = capacities
+        edge_capacity_constraints = topology.network.IndexedMapping({orbit: orbit for orbit in range(symmetry.orbit_count)},
+                                                                    model.constraint_handles(model.add_constraints(capacity_matrix, backend.base.LessEqual, orbit_capacities, name="capacity_constraint")))
+        record["nonzero_count"] = capacity_matrix.nnz
+    with instrumentation.phase("net_flow_constraints", "compiling net flow rate constraints", constraint_count=node_count * flow_count) as record:
+        demand_rows, demand_values = [], []
+        for f, flow in enumerate(flows):
+            for node, net_rate in flow.net_rates().items():
+                demand_rows.append(node.id * flow_count + f)
+                demand_values.append(-net_rate)
+        demands = scipy.sparse.coo_array((demand_values, (demand_rows, np.zeros(len(demand_rows), dtype=np.int64))), shape=(node_count * flow_count, 1))
+        net_flow_matrix = scipy.sparse.hstack((scipy.sparse.kron(incidence, scipy.sparse.identity(flow_count)), demands), format="csr")
+        net_flow_rate_constraint_list = model.constraint_handles(model.add_constraints(net_flow_matrix, backend.base.Equal, 0.0, name="net_rate_constraint"))
+        net_flow_rate_at_each_node_constraints = topology.network.IdMapping(network.nodes, [topology.network.IndexedMapping(flow_index, net_flow_rate_constraint_list[n * flow_count:(n + 1) * flow_count]) for n in range(node_count)])
+        record["nonzero_count"] = net_flow_matrix.nnz
+    variables = topology.network.Variables(flow_status, inject_rate, None)
+    constraints = topology.network.Constraints(inject_rate_constraint, edge_capacity_constraints, net_flow_rate_at_each_node_constraints, None, None, None)
+    return model.native(), variables, constraints
@@ -1,5 +1,7 @@
-import topology.network
 import numpy as np
+import scipy.sparse
+
+import topology.network
 
 
 def node_name(*args: int) -> str:
@@ -19,31 +21,154 @@ def torus_recursive(degree: int, dimension: int, capacity: float, network: topol
         return
     for i in range(degree):
         torus_recursive(degree, dimension - 1, capacity, network, node_map, *args, i)
-    for node in network.nodes.values():
-        coordinator = node_map[node]
-        left_coordinator = np.copy(coordinator)
-        left_coordinator[-dimension] = (left_coordinator[-dimension] + degree - 1) % degree
-        right_coordinator = np.copy(coordinator)
-        right_coordinator[-dimension] = (right_coordinator[-dimension] + 1) % degree
-        node_left = network.find_node(node_name(*left_coordinator))
-        node_right = network.find_node(node_name(*right_coordinator))
-        network.insert_edge(edge_name(dimension, node, node_left), node, node_left, capacity)
-        network.insert_edge(edge_name(dimension, node, node_right), node, node_right, capacity)
-
-
-def torus(degree: int, dimension: int, capacity: float) -> topology.network.Network:
+
+
+def torus_edges(degree: int, dimension: int, capacity: float, network: topology.network.Network, node_map: dict[topology.network.Node, np.ndarray]) -> None:
+    for current_dimension in range(1, dimension + 1):
+        for node in list(network.nodes):
+            coordinator = node_map[node]
+            left_coordinator = np.copy(coordinator)
+            left_coordinator[-current_dimension] = (left_coordinator[-current_dimension] + degree - 1) % degree
+            right_coordinator = np.copy(coordinator)
+            right_coordinator[-current_dimension] = (right_coordinator[-current_dimension] + 1) % degree
+            node_left = network.find_node(node_name(*left_coordinator))
+            node_right = network.find_node(node_name(*right_coordinator))
+            network.insert_edge(edge_name(current_dimension, node, node_left), node, node_left, capacity)
+            network.insert_edge(edge_name(current_dimension, node, node_right), node, node_right, capacity)
+
+
+def tor_uplink(node: topology.network.Node) -> str:
+    return f"TOR uplink, {node}"
+
+
+def tor_downlink(node: topology.network.Node) -> str:
+    return f"TOR downlink, {node}"
+
+
+def endpoint_name(router: topology.network.Node, node_id: int) -> str:
+    return f"{router}, node {node_id}"
+
+
+def node_coordinates(degree: int, dimension: int) -> np.ndarray:
+    """
+    the coordinates of every router, indexed by node id, the first coordinate is the most significant, same order to torus_recursive
+    """
+    return np.stack(np.unravel_index(np.arange(degree ** dimension), (degree,) * dimension), axis=1) if dimension > 0 else np.zeros((1, 0), dtype=np.int64)
+
+
+def neighbor_indices(degree: int, dimension: int, axis: int, offset: int) -> np.ndarray:
+    """
+    :return: the node id of the router at offset along the axis from every router, wrapping around
+    """
+    ids = np.arange(degree ** dimension).reshape((degree,) * dimension)
+    return np.roll(ids, -offset, axis=axis).ravel()
+
+
+def torus(degree: int, dimension: int, capacity: float, p: int = 0, wrap: bool = True) -> topology.network.Network:
+    """
+    build the torus, or the mesh without wrap, in bulk, the neighbors are found by modular arithmetic on the node ids
+    the routers take the node ids before the endpoints, same to topology.dragonfly.dragonfly, and every router has p endpoints linked by a tor uplink and downlink, none by default
+    every router links to the previous and the next router along every dimension, the dimensions are named from the last coordinate as 1, same to torus_edges
+    with degree 2 the previous and the next router are the same, so the links are doubled, and the mesh leaves out the links wrapping around
+    """
+    if dimension < 0:
+        raise ValueError("negative dimension not allowed")
+    router_count = degree ** dimension
+    coordinates = node_coordinates(degree, dimension)
     network = topology.network.Network()
-    torus_recursive(degree, dimension, capacity, network, {})
-    assert network.node_count() == degree ** dimension
-    assert network.edge_count() == degree ** dimension * 2 * dimension
+    routers = network.insert_nodes(router_count, lambda node: node_name(*coordinates[node.id].tolist()))
+    for current_dimension in range(1, dimension + 1):
+        axis = dimension - current_dimension
+        starts = np.repeat(np.arange(router_count), 2)
+        ends = np.stack((neighbor_indices(degree, dimension, axis, -1), neighbor_indices(degree, dimension, axis, 1)), axis=1).ravel()
+        if not wrap:
+            position = np.repeat(coordinates[:, axis], 2)
+            inner = (np.tile([True, False], router_count) & (position > 0)) | (np.tile([False, True], router_count) & (position < degree - 1))
+            starts, ends = starts[inner], ends[inner]
+        network.insert_edges(starts, ends, capacity, lambda edge, current_dimension=current_dimension: edge_name(current_dimension, edge.start, edge.end))
+    if p > 0:
+        network.insert_nodes(router_count * p, lambda node: endpoint_name(routers[(node.id - router_count) // p], (node.id - router_count) % p))
+        endpoints = np.arange(router_count, router_count * (p + 1))
+        endpoint_routers = (endpoints - router_count) // p
+        network.insert_edges(endpoint_routers, endpoints, capacity, lambda edge: tor_uplink(edge.end))
+        network.insert_edges(endpoints, endpoint_routers, capacity, lambda edge: tor_downlink(edge.start))
+    if wrap:
+        assert network.edge_count() == router_count * 2 * dimension + router_count * p * 2
     return network
 
 
+def mesh(degree: int, dimension: int, capacity: float, p: int = 0) -> topology.network.Network:
+    return torus(degree, dimension, capacity, p, wrap=False)
+
+
+def endpoint_nodes(network: topology.network.Network, degree: int, dimension: int, p: int) -> list[topology.network.Node]:
+    """
+    the endpoints in the order of the rows and columns of a traffic matrix, the endpoint node_id of the router of id router is at router * p + node_id, the routers themselves without endpoints
+    """
+    router_count = degree ** dimension
+    return network.nodes[router_count:router_count * (p + 1)] if p > 0 else network.nodes[:router_count]
+
+
+def router_traffic(network: topology.network.Network, degree: int, dimension: int, p: int, destinations: np.ndarray, rate: float) -> topology.network.TrafficPattern:
+    """
+    every endpoint sends to the endpoint at the same position under the destination routers of its router, the flows to itself are left out and the duplicate flows are merged
+    :param destinations: the destination routers of every router, one column per destination
+    """
+    per_router = max(p, 1)
+    destinations = np.asarray(destinations).reshape(degree ** dimension, -1)
+    sources = np.arange(degree ** dimension * per_router)
+    routers, positions = np.divmod(sources, per_router)
+    targets = destinations[routers] * per_router + positions[:, np.newaxis]
+    matrix = scipy.sparse.coo_array((np.full(targets.size, rate), (np.repeat(sources, targets.shape[1]), targets.ravel())), shape=(len(sources), len(sources))).tocsr()
+    matrix.setdiag(0.0)
+    return topology.network.Traffic.from_matrix(endpoint_nodes(network, degree, dimension, p), matrix)
+
+
 def uniform_traffic(network: topology.network.Network, capacity: float) -> topology.network.TrafficPattern:
-    traffic_pattern = set()
-    for i in network.nodes.values():
-        for j in network.nodes.values():
-            if i == j:
-                continue
-            traffic_pattern.add(topology.network.Flow(i, j, capacity))
+    """
+    every node sends to every other node at the capacity
+    """
+    sources, destinations = np.nonzero(~np.eye(network.node_count(), dtype=bool))
+    return topology.network.Traffic(network.nodes, sources, destinations, capacity)
+
+
+def all_to_all_traffic(network: topology.network.Network, degree: int, dimension: int, p: int, link_capacity: float) -> topology.network.TrafficPattern:
+    """
+    uniform traffic, every endpoint sends to every other endpoint, the link capacity is split evenly
+    """
+    nodes = endpoint_nodes(network, degree, dimension, p)
+    sources, destinations = np.nonzero(~np.eye(len(nodes), dtype=bool))
+    return topology.network.Traffic(nodes, sources, destinations, link_capacity / max(len(nodes) - 1, 1))
+
+
+def transpose_traffic(network: topology.network.Network, degree: int, dimension: int, p: int, link_capacity: float) -> topology.network.TrafficPattern:
+    """
+    transpose traffic, every router sends to the router of the reversed coordinates, (x, y) to (y, x) in two dimensions, the routers on the diagonal send nothing
+    """
+    coordinates = node_coordinates(degree, dimension)
+    return router_traffic(network, degree, dimension, p, np.ravel_multi_index(tuple(coordinates[:, ::-1].T), (degree,) * dimension), link_capacity)
+
+
+def tornado_traffic(network: topology.network.Network, degree: int, dimension: int, p: int, link_capacity: float) -> topology.network.TrafficPattern:
+    """
+    tornado traffic, every router sends to the router ceil(degree / 2) - 1 hops away along every dimension, nothing for degree 2 or less
+    """
+    coordinates = (node_coordinates(degree, dimension) + (degree + 1) // 2 - 1) % degree
+    return router_traffic(network, degree, dimension, p, np.ravel_multi_index(tuple(coordinates.T), (degree,) * dimension), link_capacity)
+
+
+def nearest_neighbor_traffic(network: topology.network.Network, degree: int, dimension: int, p: int, link_capacity: float) -> topology.network.TrafficPattern:
+    """
+    nearest neighbor traffic, every router sends to the previous and the next router along every dimension, the link capacity is split evenly
+    """
+    destinations = np.stack([neighbor_indices(degree, dimension, axis, offset) for axis in range(dimension) for offset in (-1, 1)], axis=1)
+    return router_traffic(network, degree, dimension, p, destinations, link_capacity / (2 * dimension))
+
+
+def convert_traffic_matrix(traffic: 'np.ndarray | scipy.sparse.sparray', network: topology.network.Network, degree: int, dimension: int, p: int, link_capacity: float) -> topology.network.TrafficPattern:
+    assert traffic.ndim == 2
+    nodes = endpoint_nodes(network, degree, dimension, p)
+    assert traffic.shape[0] <= len(nodes) and traffic.shape[1] <= len(nodes)
+    traffic_pattern = topology.network.Traffic.from_matrix(nodes, traffic)
+    traffic_pattern.rates = traffic_pattern.rates * link_capacity
     return traffic_pattern
@@ -0,0 +1,67 @@
+import sys
+
+import instrumentation
+import model_cache
+import results
+import solution
+import topology.network
+import util
+
+
+def main():
+    arguments, options = util.split_options(sys.argv)
+    if "trace" in options:
+        instrumentation.configure(options["trace"], options.get("trace-memory", instrumentation.MemoryRss))
+    parameter_reader = util.parameter_reader(arguments)
+    next(parameter_reader)
+    dataset_name = next(parameter_reader)
+    degree = int(next(parameter_reader))
+    dimension = int(next(parameter_reader))
+    p = int(t) if (t := next(parameter_reader)) is not None else 1
+    wrap = t.lower() == 'true' if (t := next(parameter_reader)) is not None else True
+    mip_gap = float(t) if (t := next(parameter_reader)) is not None else 0.0001
+    parameters = util.torus_parameters(degree, dimension, p)
+    start = 0.0
+    stop = 1.0
+    precision = 0.01
+    naming = options.get("naming")
+    if naming not in (None, topology.network.NamingReadable, topology.network.NamingShort, topology.network.NamingNone):
+        raise ValueError("the naming is not one of readable, short and none")
+    sink = results.ResultSink(options["results"], options.get("resume", "false").lower() == "true") if "results" in options else None
+    network, traffic_pattern = util.build_torus(dataset_name, parameters, wrap)
+    bounds = util.torus_rate_bounds(network, traffic_pattern, parameters) if options.get("bounds", "true").lower() == "true" else None
+    solver = util.Backends[options["backend"]]() if options.get("backend", "gurobi") != "gurobi" else None
+    model, variables, constraints = util.compile_torus_model(network, traffic_pattern, mip_gap, options.get("aggregate"), solver, naming)
+    if "index" in options and solver is None:
+        model_cache.save_index(options["index"], (model, variables, constraints))
+    if solver is not None:
+        step = lambda rate: util.step_backend_model(model, constraints.inject_rate_constraint, rate)
+        details = None
+        saturation = None
+    else:
+        warm_start = util.WarmStart(model, variables, enabled=options.get("warm-start", "true").lower() == "true")
+        step = lambda rate: util.step_model(model, constraints.inject_rate_constraint, rate, warm_start)
+        if "solutions" in options:
+            step = solution.SolutionExport(options["solutions"], (model, variables, constraints), options.get("solution-flows", "false").lower() == "true").wrap(step)
+        details = lambda: util.step_details(model)
+        saturation = lambda: util.find_saturation_rate(model, variables.inject_rate, constraints.inject_rate_constraint)
+    if sink is not None:
+        step = sink.wrap(step, details)
+    print("begin model solving")
+    match options.get("sweep", "step"):
+        case "step":
+            status_history, objective_history = util.solve_models_by_step(start, stop, precision, step, bounds=bounds)
+        case "adaptive":
+            status_history, objective_history = util.solve_models_by_bisection(start, stop, precision, step, saturation=saturation, bounds=bounds)
+        case "bisection":
+            status_history, objective_history = util.solve_models_by_bisection(start, stop, precision, step, bounds=bounds)
+        case "parametric" if solver is None:
+            status_history, objective_history = util.solve_models_parametrically(start, stop, precision, model, constraints.inject_rate_constraint, bounds, sink)
+        case _:
+            raise ValueError("the sweep strategy is not one of step, adaptive, bisection and parametric (with gurobi)")
+    print(status_history)
+    print(objective_history)
+
+
+if __name__ == '__main__':
+    main()
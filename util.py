@@ -1,3 +1,5 @@
+import copy
+import math
 import os
 import random
 import typing
@@ -5,33 +7,103 @@ import typing
 import gurobipy as gp
 import numpy as np
 
+import backend.base
+import backend.gurobi
+import backend.highs
+import dataset_cache
+import instrumentation
+import model_cache
+import results
+import topology.benders
+import topology.bounds
+import topology.coarsen
+import topology.concurrent
 import topology.dragonfly
 import topology.network
+import topology.ocs
+import topology.path
+import topology.symmetry
+import topology.torus
 
 ParameterReader = typing.Generator[str, None, None]
+Options = typing.Dict[str, str]
 DragonflyParameters = typing.Tuple[int, int, int, int, bool, bool, random.Random, float, int]
+TorusParameters = typing.Tuple[int, int, int, float]
+Topologies = typing.Dict[typing.Tuple, typing.Tuple[topology.network.Network, typing.Any]]
 ModelStep = typing.Callable[[float], tuple[str | typing.Iterable[str], float | typing.Iterable[float]]]
 ModelHistory = typing.Tuple[typing.List[str | typing.Iterable[str]], typing.List[float | typing.Iterable[float]]]
+SaturationSearch = typing.Callable[[], float | None]
+StepStatistics = typing.NamedTuple("StepStatistics", rate=float, status=str, iteration_count=float, node_count=float, runtime=float)
+ObjectiveSegment = typing.NamedTuple("ObjectiveSegment", low=float, high=float, intercept=float, slope=float)
+ObjectiveCurve = typing.NamedTuple("ObjectiveCurve", segments=typing.List[ObjectiveSegment], saturation=float | None, saturation_status=str, solve_count=int)
 
-Status = {
-    gp.GRB.LOADED: "loaded",
-    gp.GRB.OPTIMAL: "optimal",
-    gp.GRB.INFEASIBLE: "infeasible",
-    gp.GRB.INF_OR_UNBD: "infeasible/unbounded",
-    gp.GRB.UNBOUNDED: "unbounded",
-    gp.GRB.CUTOFF: "cutoff",
-    gp.GRB.ITERATION_LIMIT: "iteration limit",
-    gp.GRB.NODE_LIMIT: "node limit",
-    gp.GRB.TIME_LIMIT: "time limit",
-    gp.GRB.SOLUTION_LIMIT: "solution limit",
-    gp.GRB.INTERRUPTED: "interrupted",
-    gp.GRB.NUMERIC: "numeric",
-    gp.GRB.SUBOPTIMAL: "suboptimal",
-    gp.GRB.INPROGRESS: "in progress",
-    gp.GRB.USER_OBJ_LIMIT: "user objective limit",
+Status = backend.gurobi.Status
+InterpolatedStatus = "interpolated"
+BoundStatus = "infeasible (bound)"
+BoundTolerance = 1e-9
+ParametricMinimumStep = 1e-6
+OcsOptimize = "optimize"
+OcsStart = "start"
+OcsHeuristic = "heuristic"
+Backends: dict[str, typing.Callable[[], backend.base.Backend]] = {
+    "gurobi": backend.gurobi.GurobiBackend,
+    "highs": backend.highs.HighsBackend,
 }
 
 
+class WarmStart:
+    """
+    carry the solver state from one injection rate to the next, only the rhs of the inject rate constraint changes between the solves
+    a linear model is solved with dual simplex, which keeps the basis dual feasible after a rhs change, gurobi keeps the basis of the last solve in the model
+    so the last optimal basis is restored only when the last solve did not end optimal and the rate moves back down, such as during a bisection
+    a mixed integer model starts from the last solution, with the enabled edges kept and the flow rates scaled to the new rate
+    the statistics of every solve are recorded whether enabled or not, so the gain can be compared
+    """
+
+    def __init__(self, model: gp.Model, variables: topology.network.Variables, enabled: bool = True) -> None:
+        self.model = model
+        self.enabled = enabled
+        self.flow_rates = [flow_rate for flow_rates_at_edge in variables.flow_status.values() for flow_rate in flow_rates_at_edge.values()]
+        self.enabled_edges = list(variables.enabled_edges.values()) if variables.enabled_edges is not None else []
+        self.inject_rate = variables.inject_rate
+        self.rate: float | None = None
+        self.variable_basis: list[int] | None = None
+        self.constraint_basis: list[int] | None = None
+        self.flow_rate_start: list[float] | None = None
+        self.enabled_edges_start: list[float] | None = None
+        self.statistics: list[StepStatistics] = []
+
+    def apply(self, rate: float) -> None:
+        if not self.enabled or self.rate is None:
+            return
+        if self.model.getAttr(gp.GRB.Attr.IsMIP):
+            scale = rate / self.rate
+            self.model.setAttr(gp.GRB.Attr.Start, self.flow_rates, [flow_rate * scale for flow_rate in self.flow_rate_start])
+            self.model.setAttr(gp.GRB.Attr.Start, self.enabled_edges, self.enabled_edges_start)
+            self.inject_rate.setAttr(gp.GRB.Attr.Start, rate)
+        else:
+            if self.model.getParamInfo(gp.GRB.Param.Method)[2] != 1:
+                self.model.setParam(gp.GRB.Param.Method, 1)
+            if self.model.getAttr(gp.GRB.Attr.Status) != gp.GRB.OPTIMAL and rate < self.statistics[-1].rate:
+                self.model.setAttr(gp.GRB.Attr.VBasis, self.model.getVars(), self.variable_basis)
+                self.model.setAttr(gp.GRB.Attr.CBasis, self.model.getConstrs(), self.constraint_basis)
+
+    def record(self, rate: float) -> StepStatistics:
+        status = self.model.getAttr(gp.GRB.Attr.Status)
+        is_mip = self.model.getAttr(gp.GRB.Attr.IsMIP)
+        statistics = StepStatistics(rate, Status[status], self.model.getAttr(gp.GRB.Attr.IterCount), self.model.getAttr(gp.GRB.Attr.NodeCount) if is_mip else 0.0, self.model.getAttr(gp.GRB.Attr.Runtime))
+        self.statistics.append(statistics)
+        if self.enabled and status == gp.GRB.OPTIMAL:
+            self.rate = rate
+            if is_mip:
+                self.flow_rate_start = self.model.getAttr(gp.GRB.Attr.X, self.flow_rates)
+                self.enabled_edges_start = self.model.getAttr(gp.GRB.Attr.X, self.enabled_edges)
+            else:
+                self.variable_basis = self.model.getAttr(gp.GRB.Attr.VBasis, self.model.getVars())
+                self.constraint_basis = self.model.getAttr(gp.GRB.Attr.CBasis, self.model.getConstrs())
+        return statistics
+
+
 def parameter_reader(arguments: list[str]) -> ParameterReader:
     i = 0
     while True:
@@ -42,6 +114,23 @@ def parameter_reader(arguments: list[str]) -> ParameterReader:
             yield None
 
 
+def split_options(arguments: list[str]) -> typing.Tuple[list[str], Options]:
+    """
+    separate the optional --name=value (or --name, meaning true) arguments from the positional arguments
+    :param arguments:
+    :return: the positional arguments and the options
+    """
+    positional_arguments = []
+    options = {}
+    for argument in arguments:
+        if argument.startswith("--"):
+            name, separator, value = argument[2:].partition("=")
+            options[name] = value if separator else "true"
+        else:
+            positional_arguments.append(argument)
+    return positional_arguments, options
+
+
 def parse_dragonfly_parameter(reader: ParameterReader) -> DragonflyParameters:
     p = int(next(reader))
     a = int(next(reader))
@@ -50,15 +139,18 @@ def parse_dragonfly_parameter(reader: ParameterReader) -> DragonflyParameters:
     background_layer = t.lower() == 'true' if (t := next(reader)) is not None else True
     fixed_ocs_layer = t.lower() == 'true' if (t := next(reader)) is not None else False
     random_seed = int(t) if (t := next(reader)) is not None else 0
-    random_generator = random.Random(random_seed)
+    return dragonfly_parameters(p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_seed)
+
+
+def dragonfly_parameters(p: int, a: int, h: int, ocs_layer_count: int = 0, background_layer: bool = True, fixed_ocs_layer: bool = False, random_seed: int = 0) -> DragonflyParameters:
     link_capacity = 100.0
     group_count = a * h + 1
-    return p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count
+    return p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random.Random(random_seed), link_capacity, group_count
 
 
 def load_dragonfly_dataset(dataset_name: str, network: topology.network.Network, group_count: int, p: int, a: int, link_capacity: float, random_generator: random.Random = None) -> topology.network.TrafficPattern:
     if os.path.isfile(dataset_name):
-        traffic = np.loadtxt(dataset_name)
+        traffic = dataset_cache.load_dataset(dataset_name)
         traffic_pattern = topology.dragonfly.convert_traffic_matrix(traffic, network, group_count, p, a, link_capacity)
     else:
         match dataset_name:
@@ -79,11 +171,543 @@ def load_dragonfly_dataset(dataset_name: str, network: topology.network.Network,
     return traffic_pattern
 
 
-def solve_models_by_step(start: float, stop: float, precision: float, model: ModelStep) -> ModelHistory:
+def build_dragonfly(dataset_name: str, parameters: DragonflyParameters, topologies: Topologies | None = None) -> typing.Tuple[topology.network.Network, topology.network.TrafficPattern]:
+    """
+    :param topologies: the networks built earlier, reused when the topology parameters and the random state are the same, the random generator is then restored to the state after the build, so the traffic is the same as with a new build
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    with instrumentation.phase("build", p=p, a=a, h=h, ocs_layer_count=ocs_layer_count, background_layer=background_layer) as record:
+        key = (p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, link_capacity, model_cache.random_state_fingerprint(random_generator)) if topologies is not None else None
+        reused = key is not None and key in topologies
+        if reused:
+            network, random_state = topologies[key]
+            random_generator.setstate(random_state)
+        else:
+            network = topology.dragonfly.dragonfly(p, a, h, link_capacity, ocs_layer_count=ocs_layer_count,
+                                                   background_layer=background_layer, fixed_ocs_layers=fixed_ocs_layer,
+                                                   random_generator=random_generator)
+            if key is not None:
+                topologies[key] = network, random_generator.getstate()
+        record.update(node_count=network.node_count(), edge_count=network.edge_count(), reused=reused)
+    with instrumentation.phase("traffic", dataset=dataset_name) as record:
+        traffic_pattern = load_dragonfly_dataset(dataset_name, network, group_count, p, a, link_capacity, random_generator)
+        record["flow_count"] = len(traffic_pattern)
+    return network, traffic_pattern
+
+
+def dragonfly_rate_bounds(dataset_name: str, parameters: DragonflyParameters, topologies: Topologies | None = None) -> topology.bounds.RateBounds:
+    """
+    bound the feasible inject rates of the dragonfly model, the network and the traffic are built from a copy of the random generator, so the model compiled afterward is not changed
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    network, traffic_pattern = build_dragonfly(dataset_name, (p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, copy.deepcopy(random_generator), link_capacity, group_count), topologies)
+    with instrumentation.phase("bounds") as record:
+        bounds = topology.bounds.dragonfly_rate_bounds(network, traffic_pattern, group_count, p, a)
+        record.update(bounds._asdict())
+    print(f"inject rate bounds: lower: {bounds.lower}, upper: {bounds.upper} ({bounds.upper_cut} cut)")
+    return bounds
+
+
+def set_dragonfly_objective(compiled_network: topology.network.CompiledNetwork, total_traffic: float, mip_gap: float = 0.0001, external_hop_rate: float = 0.0) -> None:
+    """
+    set the objective of the average hop count per unit of traffic, and the mip gap
+    :param external_hop_rate: the hops taken outside the model per unit of inject rate, such as the tor hops of topology.coarsen.CoarseNetwork
+    """
+    model, variables, _ = compiled_network
+    if not isinstance(model, gp.Model):
+        model.set_mip_gap(mip_gap)
+        columns = np.asarray([flow_rate for flow_rates_at_edge in variables.flow_status.values() for flow_rate in flow_rates_at_edge.values()])
+        coefficients = np.full(len(columns), 1.0 / total_traffic)
+        if external_hop_rate != 0.0:
+            columns, coefficients = np.append(columns, variables.inject_rate), np.append(coefficients, external_hop_rate / total_traffic)
+        model.set_objective(columns, coefficients)
+        return
+    model.setParam(gp.GRB.Param.MIPGap, mip_gap)
+    model.setObjective(
+        (gp.quicksum((
+            flow_rate
+            for flow_rates_at_edge in variables.flow_status.values()
+            for flow_rate in flow_rates_at_edge.values()
+        )) + external_hop_rate * variables.inject_rate) / total_traffic,
+        gp.GRB.MINIMIZE)
+
+
+def apply_ocs_configuration(compiled_network: topology.network.CompiledNetwork, network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, parameters: DragonflyParameters,
+                            ocs: str = OcsStart, edge_ids: np.ndarray | None = None) -> None:
+    """
+    configure the ocs links by the greedy heuristic of topology.ocs, as the start of the mixed integer solve, or fixed so only the routing is solved
+    :param ocs: OcsOptimize to leave the model as is, OcsStart for the mip start, only with gurobi, or OcsHeuristic to fix the configuration
+    :param edge_ids: the id in the network of every edge of the compiled model, when it is compiled on a part of the network, see topology.coarsen.CoarseNetwork
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    model, variables, constraints = compiled_network
+    if ocs == OcsOptimize or variables.enabled_edges is None or (ocs == OcsStart and not isinstance(model, gp.Model)):
+        return
+    with instrumentation.phase("ocs_heuristic", f"configuring ocs links by heuristic as {'the mip start' if ocs == OcsStart else 'fixed'}") as record:
+        configuration = topology.ocs.dragonfly_ocs_configuration(network, traffic_pattern, group_count, p, a, ocs_layer_count, link_capacity)
+        if configuration is None:
+            return
+        if edge_ids is not None:
+            configuration = configuration[edge_ids]
+        enabled_edges, values = topology.ocs.enabled_edge_values(variables.enabled_edges, configuration)
+        record["enabled_count"] = int(sum(values))
+    if ocs == OcsStart:
+        model.setAttr(gp.GRB.Attr.Start, enabled_edges, values)
+    elif isinstance(model, gp.Model):
+        model.setAttr(gp.GRB.Attr.LB, enabled_edges, values)
+        model.setAttr(gp.GRB.Attr.UB, enabled_edges, values)
+    else:
+        model.set_bounds(np.asarray(enabled_edges), values, values)
+
+
+def compile_dragonfly_model(dataset_name: str, parameters: DragonflyParameters, mip_gap: float = 0.0001, aggregate: str | None = None, solver: backend.base.Backend | None = None,
+                            symmetry: bool = False, cache: bool = False, ocs: str = OcsStart, topologies: Topologies | None = None, naming: str | None = None) -> topology.network.CompiledNetwork:
+    """
+    build the dragonfly network and the traffic, and compile the model with the objective of the average hop count per unit of traffic, see compile_dragonfly_symmetric_model
+    """
+    return compile_dragonfly_symmetric_model(dataset_name, parameters, mip_gap, aggregate, solver, symmetry, cache, ocs, topologies, naming)[1]
+
+
+def compile_dragonfly_symmetric_model(dataset_name: str, parameters: DragonflyParameters, mip_gap: float = 0.0001, aggregate: str | None = None, solver: backend.base.Backend | None = None,
+                                      symmetry: bool = False, cache: bool = False, ocs: str = OcsStart, topologies: Topologies | None = None,
+                                      naming: str | None = None) -> typing.Tuple[topology.symmetry.Symmetry | None, topology.network.CompiledNetwork]:
+    """
+    build the dragonfly network and the traffic, and compile the model with the objective of the average hop count per unit of traffic
+    :param dataset_name:
+    :param parameters:
+    :param mip_gap:
+    :param aggregate:
+    :param solver: the solver backend, gurobi by default, the model is a gurobi model only with the gurobi backend
+    :param symmetry: compile the quotient model when the traffic is invariant under rotating the groups, see topology.symmetry.compile_quotient
+    :param cache: reuse the model compiled by an earlier run from the model cache, only with the gurobi backend and not with readable names, which the cached mps file cannot store, see model_cache
+    :param ocs: how the ocs links are configured, see apply_ocs_configuration, applied after the model is stored in the cache
+    :param topologies: the networks built earlier, see build_dragonfly
+    :param naming: the names of the variables and constraints, see Network.compile
+    :return: the rotation symmetry when the model is the quotient model, to map its solution back onto all the flows, see topology.symmetry.Symmetry.expand_edge_loads, and the compiled model
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    cache = cache and (solver is None or isinstance(solver, backend.gurobi.GurobiBackend)) and naming != topology.network.NamingReadable
+    if cache:
+        key = model_cache.fingerprint(dataset=model_cache.dataset_fingerprint(dataset_name), p=p, a=a, h=h, ocs_layer_count=ocs_layer_count, background_layer=background_layer, fixed_ocs_layer=fixed_ocs_layer,
+                                      random_state=model_cache.random_state_fingerprint(random_generator), link_capacity=link_capacity, aggregate=aggregate, symmetry=symmetry, formulation="arc", naming=naming)
+    network, traffic_pattern = build_dragonfly(dataset_name, parameters, topologies)
+    rotation = topology.symmetry.detect_dragonfly_symmetry(network, traffic_pattern, group_count, p, a) if symmetry else None
+    compiled_network = None
+    if cache:
+        with instrumentation.phase("model_cache_load", key=key) as record:
+            compiled_network = model_cache.load(key, network, solver.env if solver is not None else None)
+            record["hit"] = compiled_network is not None
+        if compiled_network is not None:
+            print(f"loaded network model {key} from the model cache")
+            compiled_network[0].setParam(gp.GRB.Param.MIPGap, mip_gap)
+    if compiled_network is None:
+        total_traffic = traffic_pattern.total_rate() if isinstance(traffic_pattern, topology.network.Traffic) else sum(flow.rate for flow in traffic_pattern)
+        if rotation is not None:
+            with instrumentation.phase("compile_quotient", f"compiling quotient model of the group rotation symmetry of order {rotation.order}", order=rotation.order, aggregate=aggregate):
+                compiled_network = topology.symmetry.compile_quotient(network, traffic_pattern, rotation, aggregate=aggregate, solver=solver)
+            total_traffic /= rotation.order
+        else:
+            if symmetry:
+                print("the traffic is not invariant under rotating the groups, compiling the full model")
+            compiled_network = network.compile(traffic_pattern, matrix=True, aggregate=aggregate, solver=solver, naming=naming)
+        set_dragonfly_objective(compiled_network, total_traffic, mip_gap)
+        if cache and isinstance(compiled_network[0], gp.Model):
+            with instrumentation.phase("model_cache_save", f"storing network model {key} in the model cache", key=key):
+                model_cache.save(key, compiled_network)
+    apply_ocs_configuration(compiled_network, network, traffic_pattern, parameters, ocs)
+    return rotation, compiled_network
+
+
+def compile_dragonfly_coarse_model(dataset_name: str, parameters: DragonflyParameters, mip_gap: float = 0.0001, aggregate: str | None = None, solver: backend.base.Backend | None = None,
+                                   ocs: str = OcsStart, naming: str | None = None) -> typing.Tuple[topology.coarsen.CoarseNetwork, topology.network.CompiledNetwork]:
+    """
+    build the dragonfly network and the traffic, and compile the model of compile_dragonfly_model on the switch fabric with the traffic merged between switches, see topology.coarsen.CoarseNetwork
+    the tor links bound the inject rate and add their two hops per unit of traffic to the objective, so the objective is the same to compile_dragonfly_model
+    :return: the coarse network, to map the solution back onto the full network, and the compiled model
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    network, traffic_pattern = build_dragonfly(dataset_name, parameters)
+    with instrumentation.phase("coarsen", "merging the traffic between switches") as record:
+        coarse = topology.coarsen.CoarseNetwork(network, traffic_pattern, group_count * a)
+        record.update(flow_count=len(coarse.traffic), edge_count=coarse.network.edge_count(), rate_limit=coarse.rate_limit if math.isfinite(coarse.rate_limit) else None)
+    print(f"coarsened {len(traffic_pattern)} flows into {len(coarse.traffic)} switch flows, the tor links admit inject rates up to {coarse.rate_limit}")
+    compiled_network = coarse.network.compile(coarse.traffic, matrix=True, aggregate=aggregate, solver=solver, naming=naming)
+    coarse.limit_inject_rate(compiled_network)
+    total_traffic = traffic_pattern.total_rate() if isinstance(traffic_pattern, topology.network.Traffic) else sum(flow.rate for flow in traffic_pattern)
+    set_dragonfly_objective(compiled_network, total_traffic, mip_gap, coarse.tor_hop_rate)
+    apply_ocs_configuration(compiled_network, network, traffic_pattern, parameters, ocs, coarse.edge_ids)
+    return coarse, compiled_network
+
+
+def approximate_dragonfly_throughput(dataset_name: str, parameters: DragonflyParameters, epsilon: float = topology.concurrent.DefaultEpsilon) -> topology.concurrent.ConcurrentFlow:
+    """
+    bound the saturation rate of the dragonfly without a solver, see topology.concurrent.ConcurrentFlowApproximation
+    the ocs links are configured by the greedy heuristic of topology.ocs, so the bounds hold for that configuration, the lower bound also holds for the best configuration
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    network, traffic_pattern = build_dragonfly(dataset_name, parameters)
+    configuration = topology.ocs.dragonfly_ocs_configuration(network, traffic_pattern, group_count, p, a, ocs_layer_count, link_capacity)
+    with instrumentation.phase("concurrent_flow", f"approximating the maximum concurrent flow with epsilon {epsilon}", epsilon=epsilon) as record:
+        flow = topology.concurrent.ConcurrentFlowApproximation(network, traffic_pattern, configuration).solve(epsilon)
+        record.update(lower=flow.lower, upper=flow.upper if math.isfinite(flow.upper) else None, phase_count=flow.phase_count, tree_count=flow.tree_count)
+    return flow
+
+
+def compile_dragonfly_path_model(dataset_name: str, parameters: DragonflyParameters, mip_gap: float = 0.0001, ocs: str = OcsHeuristic) -> topology.path.PathModel:
+    """
+    build the dragonfly network and the traffic, and compile the path based model with the same objective to compile_dragonfly_model
+    :param ocs: only OcsHeuristic is supported with ocs layers, the ocs links are configured by the greedy heuristic of topology.ocs and the paths are priced over that configuration,
+    so the objective is the same to compile_dragonfly_model with OcsHeuristic
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    network, traffic_pattern = build_dragonfly(dataset_name, parameters)
+    configuration = topology.ocs.dragonfly_ocs_configuration(network, traffic_pattern, group_count, p, a, ocs_layer_count, link_capacity)
+    if configuration is not None and ocs != OcsHeuristic:
+        raise ValueError("the path formulation routes over the ocs configuration of the heuristic, use --ocs=heuristic, or the arc or benders formulation to optimize the configuration")
+    with instrumentation.phase("compile_path", "compiling path model"):
+        model = topology.path.PathModel(network, traffic_pattern, configuration=configuration)
+    model.model.setParam(gp.GRB.Param.MIPGap, mip_gap)
+    return model
+
+
+def compile_dragonfly_benders_model(dataset_name: str, parameters: DragonflyParameters, mip_gap: float = 0.0001, aggregate: str | None = None, ocs: str = OcsStart) -> topology.benders.BendersModel:
+    """
+    build the dragonfly network and the traffic, and compile the benders decomposition with the same objective to compile_dragonfly_model
+    :param ocs: OcsStart to start the master problem from the configuration of the heuristic of topology.ocs, any other value starts it from nothing
+    """
+    p, a, h, ocs_layer_count, background_layer, fixed_ocs_layer, random_generator, link_capacity, group_count = parameters
+    network, traffic_pattern = build_dragonfly(dataset_name, parameters)
+    total_traffic = traffic_pattern.total_rate() if isinstance(traffic_pattern, topology.network.Traffic) else sum(flow.rate for flow in traffic_pattern)
+    with instrumentation.phase("compile_benders", "compiling benders decomposition", aggregate=aggregate):
+        model = topology.benders.BendersModel(network, traffic_pattern, total_traffic, aggregate=aggregate)
+    model.master.setParam(gp.GRB.Param.MIPGap, mip_gap)
+    if ocs == OcsStart and (configuration := topology.ocs.dragonfly_ocs_configuration(network, traffic_pattern, group_count, p, a, ocs_layer_count, link_capacity)) is not None:
+        model.set_start(configuration)
+    return model
+
+
+def step_model(model: gp.Model, inject_rate_constraint: gp.Constr, rate: float, warm_start: WarmStart | None = None) -> typing.Tuple[str, float]:
+    with instrumentation.phase("solve", f"solving start: injection rate: {rate}", rate=rate) as record:
+        inject_rate_constraint.setAttr(gp.GRB.Attr.RHS, rate)
+        model.update()
+        if warm_start is not None:
+            warm_start.apply(rate)
+        model.optimize()
+        status = model.getAttr(gp.GRB.Attr.Status)
+        objective = model.getObjective().getValue() / rate if status == gp.GRB.OPTIMAL else math.inf
+        record.update(status=Status[status], objective=objective if math.isfinite(objective) else None, solver_time=model.getAttr(gp.GRB.Attr.Runtime), iteration_count=model.getAttr(gp.GRB.Attr.IterCount))
+    print(f"solving end: injection rate: {rate}, status: {Status[status]}, objective:{objective}")
+    if warm_start is not None:
+        statistics = warm_start.record(rate)
+        print(f"solving statistics: iterations: {statistics.iteration_count}, nodes: {statistics.node_count}, runtime: {statistics.runtime}")
+    print()
+    return Status[status], objective
+
+
+def torus_parameters(degree: int, dimension: int, p: int = 1) -> TorusParameters:
+    link_capacity = 100.0
+    return degree, dimension, p, link_capacity
+
+
+def load_torus_dataset(dataset_name: str, network: topology.network.Network, degree: int, dimension: int, p: int, link_capacity: float) -> topology.network.TrafficPattern:
+    if os.path.isfile(dataset_name):
+        traffic = dataset_cache.load_dataset(dataset_name)
+        return topology.torus.convert_traffic_matrix(traffic, network, degree, dimension, p, link_capacity)
+    match dataset_name:
+        case "uniform":
+            return topology.torus.all_to_all_traffic(network, degree, dimension, p, link_capacity)
+        case "transpose":
+            return topology.torus.transpose_traffic(network, degree, dimension, p, link_capacity)
+        case "tornado":
+            return topology.torus.tornado_traffic(network, degree, dimension, p, link_capacity)
+        case "nearest-neighbor":
+            return topology.torus.nearest_neighbor_traffic(network, degree, dimension, p, link_capacity)
+        case _:
+            raise ValueError("the traffic pattern is not a valid file or a known torus pattern")
+
+
+def build_torus(dataset_name: str, parameters: TorusParameters, wrap: bool = True) -> typing.Tuple[topology.network.Network, topology.network.TrafficPattern]:
+    degree, dimension, p, link_capacity = parameters
+    with instrumentation.phase("build", degree=degree, dimension=dimension, p=p, wrap=wrap) as record:
+        network = topology.torus.torus(degree, dimension, link_capacity, p, wrap)
+        record.update(node_count=network.node_count(), edge_count=network.edge_count())
+    with instrumentation.phase("traffic", dataset=dataset_name) as record:
+        traffic_pattern = load_torus_dataset(dataset_name, network, degree, dimension, p, link_capacity)
+        record["flow_count"] = len(traffic_pattern)
+    return network, traffic_pattern
+
+
+def torus_rate_bounds(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, parameters: TorusParameters) -> topology.bounds.RateBounds:
+    degree, dimension, p, link_capacity = parameters
+    with instrumentation.phase("bounds") as record:
+        bounds = topology.bounds.torus_rate_bounds(network, traffic_pattern, degree, dimension, p)
+        record.update(bounds._asdict())
+    print(f"inject rate bounds: lower: {bounds.lower}, upper: {bounds.upper} ({bounds.upper_cut} cut)")
+    return bounds
+
+
+def compile_torus_model(network: topology.network.Network, traffic_pattern: topology.network.TrafficPattern, mip_gap: float = 0.0001, aggregate: str | None = None,
+                        solver: backend.base.Backend | None = None, naming: str | None = None) -> topology.network.CompiledNetwork:
+    """
+    compile the model of a torus built by build_torus with the objective of compile_dragonfly_model, the torus has no reconfigurable links so the model is linear
+    """
+    compiled_network = network.compile(traffic_pattern, matrix=True, aggregate=aggregate, solver=solver, naming=naming)
+    set_dragonfly_objective(compiled_network, traffic_pattern.total_rate() if isinstance(traffic_pattern, topology.network.Traffic) else sum(flow.rate for flow in traffic_pattern), mip_gap)
+    return compiled_network
+
+
+def ocs_enabled_edges(compiled_network: topology.network.CompiledNetwork) -> dict[topology.network.Edge, gp.Var] | None:
+    """
+    :return: the enabled variables of the edges in a conflict set of a compiled gurobi model, the enabled variables of the other edges are free
+    """
+    model, variables, constraints = compiled_network
+    if variables.enabled_edges is None or constraints.conflict_edges_constraints is None:
+        return None
+    model.update()
+    rows = [model.getRow(constraint) for constraint in constraints.conflict_edges_constraints.values()]
+    columns = {row.getVar(i).index for row in rows for i in range(row.size())}
+    return {edge: enabled for edge, enabled in variables.enabled_edges.items() if enabled.index in columns}
+
+
+def step_details(model: gp.Model, enabled_edges: typing.Mapping[topology.network.Edge, gp.Var] | None = None) -> results.Record:
+    """
+    the details of the last solve recorded by results.ResultSink
+    :param enabled_edges: the enabled variables of the edges to report, the configuration is the names of the edges enabled in the solution
+    """
+    has_solution = model.getAttr(gp.GRB.Attr.SolCount) > 0
+    details = {"solve_time": model.getAttr(gp.GRB.Attr.Runtime), "mip_gap": model.getAttr(gp.GRB.Attr.MIPGap) if model.getAttr(gp.GRB.Attr.IsMIP) and has_solution else None}
+    if enabled_edges is not None and has_solution:
+        values = model.getAttr(gp.GRB.Attr.X, list(enabled_edges.values()))
+        details["configuration"] = [edge.name for edge, value in zip(enabled_edges.keys(), values) if value > 0.5]
+    return details
+
+
+def step_backend_model(model: backend.base.Model, inject_rate_constraint: int, rate: float) -> typing.Tuple[str, float]:
+    with instrumentation.phase("solve", f"solving start: injection rate: {rate}", rate=rate) as record:
+        model.set_rhs(inject_rate_constraint, rate)
+        status = model.optimize()
+        objective = model.objective_value() / rate if status == Status[gp.GRB.OPTIMAL] else math.inf
+        record.update(status=status, objective=objective if math.isfinite(objective) else None, iteration_count=model.iteration_count())
+    print(f"solving end: injection rate: {rate}, status: {status}, objective:{objective}")
+    print()
+    return status, objective
+
+
+def sweep_rates(start: float, stop: float, precision: float) -> np.ndarray:
+    return np.linspace(start + precision, stop, round((stop - start) / precision))
+
+
+def exceeds_bound(rate: float, bounds: topology.bounds.RateBounds | None) -> bool:
+    return bounds is not None and rate > bounds.upper * (1 + BoundTolerance)
+
+
+def solve_models_by_step(start: float, stop: float, precision: float, model: ModelStep, bounds: topology.bounds.RateBounds | None = None) -> ModelHistory:
+    """
+    solve every rate, the rates above the upper bound are reported with the bound status without solving
+    """
     status_history = []
     objective_history = []
-    for step in np.linspace(start + precision, stop, round((stop - start) / precision)):
-        status, objective = model(step)
+    for step in sweep_rates(start, stop, precision):
+        status, objective = (BoundStatus, math.inf) if exceeds_bound(step, bounds) else model(step)
+        status_history.append(status)
+        objective_history.append(objective)
+    return status_history, objective_history
+
+
+def find_saturation_rate(model: gp.Model, inject_rate: gp.Var, inject_rate_constraint: gp.Constr) -> float | None:
+    """
+    find the saturation injection rate by maximizing the inject rate in a single solve, the objective and the inject rate constraint are restored afterward
+    :param model:
+    :param inject_rate:
+    :param inject_rate_constraint:
+    :return: the saturation rate, or None if the solve does not finish with an optimal status
+    """
+    model.update()
+    objective = model.getObjective()
+    objective_sense = model.getAttr(gp.GRB.Attr.ModelSense)
+    rhs = inject_rate_constraint.getAttr(gp.GRB.Attr.RHS)
+    inject_rate_constraint.setAttr(gp.GRB.Attr.Sense, gp.GRB.GREATER_EQUAL)
+    inject_rate_constraint.setAttr(gp.GRB.Attr.RHS, 0.0)
+    model.setObjective(inject_rate, gp.GRB.MAXIMIZE)
+    model.optimize()
+    saturation_rate = inject_rate.getAttr(gp.GRB.Attr.X) if model.getAttr(gp.GRB.Attr.Status) == gp.GRB.OPTIMAL else None
+    inject_rate_constraint.setAttr(gp.GRB.Attr.Sense, gp.GRB.EQUAL)
+    inject_rate_constraint.setAttr(gp.GRB.Attr.RHS, rhs)
+    model.setObjective(objective, objective_sense)
+    model.update()
+    return saturation_rate
+
+
+def trace_objective_curve(model: gp.Model, inject_rate_constraint: gp.Constr, lower: float, upper: float, minimum_step: float = ParametricMinimumStep) -> ObjectiveCurve:
+    """
+    trace the optimal objective value of a linear model, before dividing by the rate, as a function of the inject rate between lower and upper with a handful of solves
+    the value is piecewise linear in the rate, and linear with the dual of the inject rate constraint as the slope over the rhs range reported for the optimal basis,
+    so every solve gives a whole segment, and the next solve is just above its upper end, at least minimum_step (relative to the rate above 1) further, until upper or an infeasible rate
+    the value is convex in the rate, so a gap of less than minimum_step left between two segments is covered by extending the next segment down to the end of the previous one
+    :return: the segments in increasing rates, and the saturation rate, the upper end of the last segment, when a rate below upper is infeasible
+    """
+    model.update()
+    if model.getAttr(gp.GRB.Attr.IsMIP):
+        raise ValueError("the parametric sweep needs a linear model, such as a model without ocs layers")
+    segments = []
+    saturation = None
+    saturation_status = Status[gp.GRB.OPTIMAL]
+    rate = lower
+    solve_count = 0
+    while True:
+        with instrumentation.phase("solve", f"solving start: injection rate: {rate}", rate=rate, parametric=True) as record:
+            inject_rate_constraint.setAttr(gp.GRB.Attr.RHS, rate)
+            model.optimize()
+            solve_count += 1
+            status = model.getAttr(gp.GRB.Attr.Status)
+            record["status"] = Status[status]
+            if status == gp.GRB.OPTIMAL:
+                value = model.getAttr(gp.GRB.Attr.ObjVal)
+                slope = inject_rate_constraint.getAttr(gp.GRB.Attr.Pi)
+                low = min(inject_rate_constraint.getAttr(gp.GRB.Attr.SARHSLow), segments[-1].high if len(segments) > 0 else rate)
+                high = max(inject_rate_constraint.getAttr(gp.GRB.Attr.SARHSUp), rate)
+                segments.append(ObjectiveSegment(low, high, value - slope * rate, slope))
+                record.update(low=low, high=high if high < gp.GRB.INFINITY else None, slope=slope)
+        print(f"solving end: injection rate: {rate}, status: {Status[status]}" + (f", basis range: [{segments[-1].low}, {segments[-1].high}], slope: {segments[-1].slope}" if status == gp.GRB.OPTIMAL else ""))
+        if status != gp.GRB.OPTIMAL:
+            saturation = segments[-1].high if len(segments) > 0 else None
+            saturation_status = Status[status]
+            break
+        if segments[-1].high >= upper:
+            break
+        rate = segments[-1].high + minimum_step * max(1.0, segments[-1].high)
+    print(f"traced the objective curve in {solve_count} solves, breakpoints: {objective_curve_breakpoints(ObjectiveCurve(segments, saturation, saturation_status, solve_count)).tolist()}")
+    return ObjectiveCurve(segments, saturation, saturation_status, solve_count)
+
+
+def objective_curve_breakpoints(curve: ObjectiveCurve) -> np.ndarray:
+    """
+    :return: the rates where the slope of the curve changes
+    """
+    return np.asarray([segment.high for segment in curve.segments[:-1]])
+
+
+def sample_objective_curve(curve: ObjectiveCurve, start: float, stop: float, precision: float, bounds: topology.bounds.RateBounds | None = None) -> ModelHistory:
+    """
+    the same history to solve_models_by_step, read from the curve without solving, the objective is the value of the curve divided by the rate
+    the rates below the first segment are reported as the rates of the first segment, which the curve covers when it is traced from the first rate
+    """
+    highs = np.asarray([segment.high for segment in curve.segments])
+    status_history = []
+    objective_history = []
+    for rate in sweep_rates(start, stop, precision):
+        if exceeds_bound(rate, bounds):
+            status, objective = BoundStatus, math.inf
+        elif len(curve.segments) == 0 or (curve.saturation is not None and rate > curve.saturation * (1 + BoundTolerance)):
+            status, objective = curve.saturation_status, math.inf
+        else:
+            segment = curve.segments[min(int(np.searchsorted(highs, rate)), len(curve.segments) - 1)]
+            status, objective = Status[gp.GRB.OPTIMAL], (segment.intercept + segment.slope * rate) / rate
+        status_history.append(status)
+        objective_history.append(objective)
+    return status_history, objective_history
+
+
+def solve_models_parametrically(start: float, stop: float, precision: float, model: gp.Model, inject_rate_constraint: gp.Constr, bounds: topology.bounds.RateBounds | None = None,
+                                sink: results.ResultSink | None = None) -> ModelHistory:
+    """
+    same sweep to solve_models_by_step, read from the objective curve traced by trace_objective_curve, the model must be linear
+    :param sink: records the rates of the sweep, the curve is not traced again when an earlier run recorded every rate
+    """
+    rates = sweep_rates(start, stop, precision).tolist()
+    completed = sink.completed() if sink is not None else {}
+    if len(rates) > 0 and all(results.rate_key(rate) in completed for rate in rates):
+        print("skipping the parametric sweep, every rate is completed")
+        recorded = [completed[results.rate_key(rate)] for rate in rates]
+        return [status for status, _ in recorded], [objective for _, objective in recorded]
+    curve = trace_objective_curve(model, inject_rate_constraint, rates[0], min(stop, bounds.upper) if bounds is not None else stop)
+    history = sample_objective_curve(curve, start, stop, precision, bounds)
+    return sink.record_history(rates, *history) if sink is not None else history
+
+
+def solve_models_by_bisection(start: float, stop: float, precision: float, model: ModelStep, saturation: SaturationSearch = None, coarse_step_count: int = 10, tolerance: float = 1e-4,
+                              bounds: topology.bounds.RateBounds | None = None) -> ModelHistory:
+    """
+    same sweep to solve_models_by_step, but solves only a part of the rates
+    first the saturation rate is found by the saturation search or by bisecting on feasibility, the rates above are infeasible since any feasible routing can be scaled down
+    then the rates below are sampled coarsely, and the intervals where the objective curve bends are refined until it is linear within the tolerance
+    the objective reported by the model is per unit of rate, so the curve checked and interpolated is objective * rate, which is piecewise linear for a linear model
+    the rates not solved are interpolated and reported with the interpolated status
+    :param start:
+    :param stop:
+    :param precision:
+    :param model:
+    :param saturation: the saturation search, such as find_saturation_rate, bisect on feasibility if absent or failed
+    :param coarse_step_count: the count of rates sampled below the saturation rate before refinement
+    :param tolerance: the relative deviation from a linear curve accepted without refinement
+    :param bounds: the bisection only searches between the bounds, the rates above the upper bound are reported with the bound status
+    :return:
+    """
+    rates = sweep_rates(start, stop, precision)
+    bounded = len(rates) if bounds is None else int(np.searchsorted(rates, bounds.upper * (1 + BoundTolerance), side="right"))
+    step_results: dict[int, typing.Tuple[str, float]] = {}
+
+    def solve(index: int) -> bool:
+        if index not in step_results:
+            step_results[index] = model(rates[index])
+        return math.isfinite(step_results[index][1])
+
+    saturation_rate = saturation() if saturation is not None else None
+    if saturation_rate is not None:
+        last_feasible = min(int(np.searchsorted(rates, saturation_rate * (1 + 1e-9), side="right")) - 1, bounded - 1)
+    else:
+        last_feasible, first_infeasible = -1, bounded
+        if bounds is not None:
+            last_feasible = min(int(np.searchsorted(rates, bounds.lower, side="right")) - 1, bounded - 1)
+        while first_infeasible - last_feasible > 1:
+            middle = (last_feasible + first_infeasible) // 2
+            if solve(middle):
+                last_feasible = middle
+            else:
+                first_infeasible = middle
+    if last_feasible >= 0:
+        for index in np.unique(np.linspace(0, last_feasible, min(coarse_step_count, last_feasible) + 1).round().astype(int)):
+            solve(int(index))
+
+    def total(index: int) -> float:
+        return step_results[index][1] * rates[index]
+
+    def bends(left: int, middle: int, right: int) -> bool:
+        slope_left = (total(middle) - total(left)) / (rates[middle] - rates[left])
+        slope_right = (total(right) - total(middle)) / (rates[right] - rates[middle])
+        return abs(slope_right - slope_left) * (rates[right] - rates[left]) > tolerance * max(1.0, abs(total(middle)))
+
+    while True:
+        solved = [index for index in sorted(step_results) if index <= last_feasible]
+        refinements = []
+        for i in range(len(solved) - 1):
+            left, right = solved[i], solved[i + 1]
+            if right - left <= 1:
+                continue
+            if not (math.isfinite(step_results[left][1]) and math.isfinite(step_results[right][1])) or \
+                    (i > 0 and math.isfinite(step_results[solved[i - 1]][1]) and bends(solved[i - 1], left, right)) or \
+                    (i + 2 < len(solved) and math.isfinite(step_results[solved[i + 2]][1]) and bends(left, right, solved[i + 2])):
+                refinements.append((left + right) // 2)
+        if len(refinements) == 0:
+            break
+        for index in refinements:
+            solve(index)
+
+    status_history = []
+    objective_history = []
+    solved = np.asarray(sorted(index for index in step_results if index <= last_feasible))
+    for index in range(len(rates)):
+        if index in step_results:
+            status, objective = step_results[index]
+        elif index >= bounded:
+            status, objective = BoundStatus, math.inf
+        elif index > last_feasible:
+            status, objective = Status[gp.GRB.INFEASIBLE], math.inf
+        else:
+            position = np.searchsorted(solved, index)
+            left, right = solved[position - 1], solved[position]
+            weight = (rates[index] - rates[left]) / (rates[right] - rates[left])
+            status, objective = InterpolatedStatus, ((1 - weight) * total(left) + weight * total(right)) / rates[index]
         status_history.append(status)
         objective_history.append(objective)
     return status_history, objective_history